@@ -0,0 +1,336 @@
+# ========================================================================================
+# File: emotion_arc.py
+# Purpose: Per-user emotional arcs from materialized daily rollups. Instead of scanning
+# EmotionLog (or parsing symbolic_log.json) on every request, a background refresher
+# folds new rows into EmotionArcDaily (user_id, day, kind, label → entries):
+#   kind "emotion" ← EmotionLog.emotion      kind "virtue" ← SymbolicTrigger.symbol
+#
+# Refresh (every ARC_REFRESH_SECONDS, default 60):
+# - each source keeps a watermark (last id folded) in rollup_watermark; new rows are read
+#   by id in batches of ARC_REFRESH_BATCH and counted with one vectorized pandas group-by
+#   per batch. All reading and counting happens before any write, so the write
+#   transaction (on SQLite, the single writer) is held only for the upserts. It locks the
+#   watermark row, re-checks it and then upserts the counts and advances the watermark
+#   together; a refresher that finds the watermark moved discards its batch and rereads,
+#   so concurrent workers never double-count.
+# - rows younger than SETTLE_SECONDS may belong to transactions that have not committed
+#   yet; the batch stops at the first such row and picks it up on the next pass.
+# - rows already moved to the Parquet archive (src/utils/history_archive.py) are folded
+#   from there, so a first refresh after archiving still covers the full history.
+#
+# Reads: `arc()` turns the user's rollup rows into dense per-label series with NumPy
+# (day, week or month buckets); a multi-year arc is a single primary-key range scan.
+# The requested range is clamped to the user's first rollup day and today, and a range
+# still longer than ARC_MAX_DAYS (default ten years) is rejected, since the dense
+# series cost labels × days.
+#
+# Usage:
+#   from core.emotion_arc import EMOTION_ARCS
+#   EMOTION_ARCS.start()                       # background refresher (main.py)
+#   EMOTION_ARCS.arc(conn, user_id=2, granularity="week")
+#
+# Refresh once from the command line:
+#   python -m core.emotion_arc --refresh
+# ========================================================================================
+
+import time
+import threading
+from datetime import datetime, timedelta
+from src.utils.config import get_setting
+from src.utils.metrics import DB_QUERY_SECONDS
+from src.utils.schema import POSTGRESQL, dialect_of
+
+GRANULARITIES = ("day", "week", "month")
+
+# Rows logged this close to "now" may still be in flight from another transaction
+SETTLE_SECONDS = 5
+
+
+class ArcSource:
+    __slots__ = ("key", "table", "id_column", "label_column", "kind")
+
+    def __init__(self, key, table, id_column, label_column, kind):
+        self.key = key
+        self.table = table
+        self.id_column = id_column
+        self.label_column = label_column
+        self.kind = kind
+
+    @property
+    def watermark(self):
+        return f"emotion_arc:{self.key}"
+
+
+SOURCES = (
+    ArcSource("emotionlog", "EmotionLog", "log_id", "emotion", "emotion"),
+    ArcSource("symbolictrigger", "SymbolicTrigger", "trigger_id", "symbol", "virtue"),
+)
+
+UPSERT_SQL = """
+    INSERT INTO EmotionArcDaily (user_id, day, kind, label, entries)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (user_id, day, kind, label)
+    DO UPDATE SET entries = EmotionArcDaily.entries + EXCLUDED.entries
+"""
+
+
+def _pd():
+    import pandas
+    return pandas
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+def daily_counts(frame):
+    """
+    [(user_id, "YYYY-MM-DD", label, entries), ...] from a frame of
+    user_id / label / timestamp rows (one vectorized group-by).
+    """
+    np = _np()
+    days = frame["timestamp"].to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    counts = (frame.assign(day=days)
+              .groupby(["user_id", "day", "label"], sort=False).size()
+              .reset_index(name="entries"))
+    return list(zip(
+        counts["user_id"].astype("int64").tolist(),
+        np.datetime_as_string(counts["day"].to_numpy(dtype="datetime64[D]"), unit="D").tolist(),
+        counts["label"].tolist(),
+        counts["entries"].astype("int64").tolist()))
+
+
+def _executemany(cur, dialect, sql, rows):
+    if dialect == POSTGRESQL:
+        from psycopg2.extras import execute_batch
+        execute_batch(cur, sql, rows, page_size=500)
+    else:
+        cur.executemany(sql, rows)
+
+
+class EmotionArcs:
+    """
+    Incremental daily rollups plus the arc read path.
+    """
+
+    def __init__(self, refresh_seconds=None, batch_rows=None, connect=None, archive=None):
+        self.refresh_seconds = float(refresh_seconds or get_setting("ARC_REFRESH_SECONDS", "60"))
+        self.batch_rows = int(batch_rows or get_setting("ARC_REFRESH_BATCH", "100000"))
+        self.max_days = int(get_setting("ARC_MAX_DAYS", "3653"))
+        self._connect = connect
+        self._archive = archive
+        self._thread = None
+        self._wakeup = threading.Event()
+
+    def _connection(self):
+        if self._connect is not None:
+            return self._connect()
+        import database  # Resolved at call time so stand-ins can replace get_connection
+        return database.get_connection()
+
+    def _history_archive(self):
+        if self._archive is None:
+            from src.utils.history_archive import HISTORY_ARCHIVE
+            self._archive = HISTORY_ARCHIVE
+        return self._archive
+
+    # -------------------------------------------------------------------
+    # Refresh
+    # -------------------------------------------------------------------
+    def refresh(self, conn=None, now=None):
+        """
+        Fold every settled row past the watermarks into the rollups; returns rows folded.
+        """
+        own = conn is None
+        conn = conn or self._connection()
+        settle_before = (now or datetime.utcnow()) - timedelta(seconds=SETTLE_SECONDS)
+        folded = 0
+        try:
+            for source in SOURCES:
+                while True:
+                    rows, full_batch = self._refresh_batch(conn, source, settle_before)
+                    folded += rows
+                    if not full_batch:
+                        break
+        finally:
+            if own:
+                conn.close()
+        return folded
+
+    def _refresh_batch(self, conn, source, settle_before):
+        pd = _pd()
+        dialect = dialect_of(conn)
+        lock = " FOR UPDATE" if dialect == POSTGRESQL else ""
+        columns = [source.id_column, "user_id", source.label_column, "timestamp"]
+        cur = conn.cursor()
+        try:
+            # Read and count first; the write transaction below only upserts
+            cur.execute("SELECT last_id FROM rollup_watermark WHERE source = %s",
+                        (source.watermark,))
+            row = cur.fetchone()
+            after_id = int(row[0]) if row else 0
+
+            frames = []
+            archived = self._history_archive().read_after_id(source.key, after_id, columns)
+            if archived is not None and len(archived):
+                frames.append(archived)
+            with DB_QUERY_SECONDS.time(query="emotion_arc_new_rows"):
+                cur.execute(
+                    f"SELECT {', '.join(columns)} FROM {source.table} "
+                    f"WHERE {source.id_column} > %s ORDER BY {source.id_column} LIMIT %s",
+                    (after_id, self.batch_rows))
+                rows = cur.fetchall()
+            full_batch = len(rows) == self.batch_rows
+            recent = pd.DataFrame.from_records(rows, columns=columns)
+            recent["timestamp"] = pd.to_datetime(recent["timestamp"], format="ISO8601")
+            unsettled = (recent["timestamp"] >= pd.Timestamp(settle_before)).to_numpy().nonzero()[0]
+            if len(unsettled):
+                recent = recent.iloc[:unsettled[0]]
+                full_batch = False
+            frames.append(recent)
+
+            frame = pd.concat([f for f in frames if len(f)] or frames, ignore_index=True)
+            frame = frame.drop_duplicates(source.id_column)
+            conn.rollback()
+            if not len(frame):
+                return 0, False
+
+            last_id = int(frame[source.id_column].max())
+            frame = frame.rename(columns={source.label_column: "label"})
+            frame = frame[frame["label"].notna()]
+            counts = [(user_id, day, source.kind, label, entries)
+                      for user_id, day, label, entries in daily_counts(frame)]
+
+            # The watermark row lock serializes refreshers across workers
+            cur.execute("INSERT INTO rollup_watermark (source, last_id) VALUES (%s, 0) "
+                        "ON CONFLICT (source) DO NOTHING", (source.watermark,))
+            cur.execute(f"SELECT last_id FROM rollup_watermark WHERE source = %s{lock}",
+                        (source.watermark,))
+            if int(cur.fetchone()[0]) != after_id:
+                # Another refresher folded these rows meanwhile: reread from its watermark
+                conn.rollback()
+                return 0, True
+            with DB_QUERY_SECONDS.time(query="emotion_arc_upsert"):
+                _executemany(cur, dialect, UPSERT_SQL, counts)
+                cur.execute("UPDATE rollup_watermark SET last_id = %s WHERE source = %s",
+                            (last_id, source.watermark))
+            conn.commit()
+            return len(frame), full_batch
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def start(self):
+        """
+        Refresh in a daemon thread every refresh_seconds (or when request_refresh()).
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="emotion-arc", daemon=True)
+        self._thread.start()
+
+    def request_refresh(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Emotion arc refresh failed: {e}")
+            self._wakeup.wait(self.refresh_seconds)
+            self._wakeup.clear()
+
+    # -------------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------------
+    @staticmethod
+    def version(conn):
+        """
+        Current watermarks; the materialized arcs change only when these do.
+        """
+        with conn.cursor() as cur:
+            cur.execute("SELECT source, last_id FROM rollup_watermark ORDER BY source")
+            rows = cur.fetchall()
+        conn.rollback()
+        return tuple((source, int(last_id)) for source, last_id in rows)
+
+    def arc(self, conn, user_id, since=None, until=None, granularity="day"):
+        """
+        Dense per-label series for one user between `since` (inclusive) and `until`
+        (exclusive) dates, bucketed by day, week (starting Monday) or month. Raises
+        ValueError for a range (after clamping to the user's data and today) longer
+        than max_days.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        np = _np()
+        clauses, params = ["user_id = %s"], [int(user_id)]
+        if since is not None:
+            clauses.append("day >= %s")
+            params.append(since.isoformat())
+        if until is not None:
+            clauses.append("day < %s")
+            params.append(until.isoformat())
+        with DB_QUERY_SECONDS.time(query="emotion_arc_read"), conn.cursor() as cur:
+            cur.execute(f"SELECT day, kind, label, entries FROM EmotionArcDaily "
+                        f"WHERE {' AND '.join(clauses)}", tuple(params))
+            rows = cur.fetchall()
+        conn.rollback()
+
+        result = {"user_id": int(user_id), "granularity": granularity, "periods": [],
+                  "emotions": {}, "virtues": {}}
+        if not rows:
+            return result
+
+        days = np.array([str(day)[:10] for day, _, _, _ in rows], dtype="datetime64[D]")
+        kinds = np.array([kind for _, kind, _, _ in rows])
+        labels = np.array([label for _, _, label, _ in rows])
+        entries = np.array([n for _, _, _, n in rows], dtype=np.int64)
+
+        today = np.datetime64(datetime.utcnow().date(), "D")
+        start = days.min() if since is None else max(np.datetime64(since, "D"), days.min())
+        end = today if until is None else min(np.datetime64(until, "D") - 1, today)
+        end = max(end, days.max())  # rows stamped "tomorrow" by a skewed clock still count
+        if (end - start).astype(np.int64) + 1 > self.max_days:
+            raise ValueError(f"arc spans more than {self.max_days} days; narrow since / until")
+        all_days = np.arange(start, end + 1, dtype="datetime64[D]")
+        if granularity == "month":
+            keys = all_days.astype("datetime64[M]").astype("datetime64[D]")
+        elif granularity == "week":
+            # 1970-01-05 (day 4) was a Monday
+            keys = all_days - ((all_days.astype(np.int64) - 4) % 7).astype("timedelta64[D]")
+        else:
+            keys = all_days
+        boundaries = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        result["periods"] = np.datetime_as_string(keys[boundaries], unit="D").tolist()
+
+        offsets = (days - start).astype(np.int64)
+        for kind, key in (("emotion", "emotions"), ("virtue", "virtues")):
+            mask = kinds == kind
+            if not mask.any():
+                continue
+            names, inverse = np.unique(labels[mask], return_inverse=True)
+            matrix = np.zeros((len(names), len(all_days)), dtype=np.int64)
+            np.add.at(matrix, (inverse, offsets[mask]), entries[mask])
+            matrix = np.add.reduceat(matrix, boundaries, axis=1)
+            result[key] = {name: series for name, series in zip(names.tolist(), matrix.tolist())}
+        return result
+
+
+EMOTION_ARCS = EmotionArcs()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--refresh" not in sys.argv:
+        print("Usage: python -m core.emotion_arc --refresh")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    folded = EMOTION_ARCS.refresh()
+    print(f"✅ Folded {folded} rows into EmotionArcDaily in {time.perf_counter() - started:.1f}s")
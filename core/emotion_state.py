@@ -0,0 +1,271 @@
+# ========================================================================================
+# File: emotion_state.py
+# Purpose: Incremental, time-decayed emotion accumulator per user. Every logged emotion
+# bumps an exponentially decayed counter in O(1); the dominant emotion can then be read
+# without touching EmotionLog. State is persisted periodically to a JSON snapshot and can
+# be rebuilt from EmotionLog in a single streaming pass.
+#
+# Usage:
+#   from core.emotion_state import get_emotion_state
+#   state = get_emotion_state()
+#   state.record(user_id=2, emotion="anger")
+#   state.dominant(2)            → "anger"
+#
+# Rebuild from the database:
+#   python -m core.emotion_state --rebuild
+# ========================================================================================
+
+import os
+import json
+import math
+import time
+import calendar
+import tempfile
+import threading
+from datetime import datetime
+from src.utils.config import get_setting, log_path
+
+# Snapshot location (alongside the other symbolic logs under src/logs/)
+STATE_FILE = log_path("emotion_state.json")
+
+DEFAULT_HALF_LIFE_HOURS = 24.0
+PERSIST_EVERY_UPDATES = 50
+PERSIST_EVERY_SECONDS = 30.0
+
+
+def _to_epoch(ts):
+    """
+    Normalize a DB timestamp (datetime, naive = UTC) or epoch number to epoch seconds.
+    """
+    if ts is None:
+        return time.time()
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if ts.tzinfo is None:
+        return calendar.timegm(ts.timetuple()) + ts.microsecond / 1e6
+    return ts.timestamp()
+
+
+class DecayedEmotionState:
+    """
+    Per-user map of emotion → (score, updated_at). A score decays continuously with the
+    configured half-life, so recent emotions outweigh old ones without a history scan.
+
+    Only the touched (user, emotion) cell is rewritten on each update, and decay for
+    the remaining cells is applied lazily when they are read.
+    """
+
+    def __init__(self, half_life_hours=DEFAULT_HALF_LIFE_HOURS, path=STATE_FILE):
+        self.half_life_hours = float(half_life_hours)
+        self.decay_rate = math.log(2) / (self.half_life_hours * 3600.0)
+        self.path = path
+        self._users = {}  # { user_id: { emotion: [score, updated_at] } }
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()  # one writer at a time, snapshots in order
+        self._dirty = 0
+        self._last_persist = time.time()
+
+    # -------------------------------------------------------------------
+    # Incremental updates
+    # -------------------------------------------------------------------
+    def record(self, user_id, emotion, timestamp=None, weight=1.0):
+        """
+        Fold one logged emotion into the user's decayed counters (O(1)).
+        """
+        now = _to_epoch(timestamp)
+        with self._lock:
+            self._apply(user_id, emotion, now, weight)
+            self._dirty += 1
+        self.maybe_persist()
+
+    def _apply(self, user_id, emotion, now, weight):
+        cells = self._users.setdefault(int(user_id), {})
+        cell = cells.get(emotion)
+        if cell is None:
+            cells[emotion] = [weight, now]
+            return
+        score, updated_at = cell
+        # Out-of-order events decay forward to the newest timestamp we have seen
+        if now >= updated_at:
+            cell[0] = score * math.exp(-self.decay_rate * (now - updated_at)) + weight
+            cell[1] = now
+        else:
+            cell[0] = score + weight * math.exp(-self.decay_rate * (updated_at - now))
+
+    # -------------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------------
+    def scores(self, user_id, now=None):
+        """
+        Return { emotion: decayed_score } for a user as of `now` (default: current time).
+        """
+        now = _to_epoch(now)
+        with self._lock:
+            cells = self._users.get(int(user_id), {})
+            return {
+                emotion: score * math.exp(-self.decay_rate * max(0.0, now - updated_at))
+                for emotion, (score, updated_at) in cells.items()
+            }
+
+    def dominant(self, user_id, now=None):
+        """
+        Return the emotion with the highest decayed score, or None if the user is unknown.
+        """
+        scores = self.scores(user_id, now)
+        if not scores:
+            return None
+        return max(scores, key=scores.get)
+
+    # -------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------
+    def maybe_persist(self):
+        """
+        Persist the snapshot once enough updates or time have accumulated. Called on the
+        request path, so it skips when another thread is already writing and never raises.
+        """
+        if not self._dirty:
+            return
+        if (self._dirty >= PERSIST_EVERY_UPDATES
+                or time.time() - self._last_persist >= PERSIST_EVERY_SECONDS):
+            if not self._persist_lock.acquire(blocking=False):
+                return
+            try:
+                self._write_snapshot()
+            except Exception as e:
+                print(f"⚠️ Could not persist emotion state snapshot: {e}")
+            finally:
+                self._persist_lock.release()
+
+    def persist(self):
+        """
+        Atomically write the current state to disk (unique temp file, then rename).
+        """
+        with self._persist_lock:
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        with self._lock:
+            snapshot = {
+                "half_life_hours": self.half_life_hours,
+                "saved_at": time.time(),
+                "users": {
+                    str(uid): {emotion: list(cell) for emotion, cell in cells.items()}
+                    for uid, cells in self._users.items()
+                },
+            }
+            dirty, self._dirty = self._dirty, 0
+            self._last_persist = time.time()
+
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except BaseException:
+            with self._lock:
+                self._dirty += dirty  # retry on the next update
+            raise
+
+    def load(self):
+        """
+        Load a previously persisted snapshot. Returns False if none exists or the
+        snapshot was written with a different half-life.
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        if float(snapshot.get("half_life_hours", 0)) != self.half_life_hours:
+            return False
+        with self._lock:
+            self._users = {
+                int(uid): {emotion: list(cell) for emotion, cell in cells.items()}
+                for uid, cells in snapshot.get("users", {}).items()
+            }
+            self._dirty = 0
+        return True
+
+    def rebuild_from_db(self, conn, batch_size=5000):
+        """
+        Rebuild all counters from EmotionLog in one streaming pass.
+
+        Uses a server-side (named) cursor when the driver supports it so the full
+        history is never materialized in memory.
+        """
+        try:
+            cur = conn.cursor(name="emotion_state_rebuild")
+            cur.itersize = batch_size
+        except TypeError:
+            cur = conn.cursor()
+
+        fresh = DecayedEmotionState(self.half_life_hours, self.path)
+        try:
+            cur.execute("""
+                SELECT user_id, emotion, timestamp FROM EmotionLog
+                ORDER BY timestamp ASC
+            """)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for user_id, emotion, ts in rows:
+                    fresh._apply(user_id, emotion, _to_epoch(ts), 1.0)
+        finally:
+            cur.close()
+
+        with self._lock:
+            self._users = fresh._users
+            self._dirty = 1
+        self.persist()
+        return len(self._users)
+
+
+# -----------------------------------------------------------
+# Process-wide accumulator (loaded lazily from the snapshot)
+# -----------------------------------------------------------
+_STATE = None
+_STATE_LOCK = threading.Lock()
+
+
+def get_emotion_state():
+    """
+    Return the shared DecayedEmotionState, loading the persisted snapshot on first use.
+    """
+    global _STATE
+    if _STATE is None:
+        with _STATE_LOCK:
+            if _STATE is None:
+                state = DecayedEmotionState(
+                    half_life_hours=get_setting(
+                        "EMOTION_HALF_LIFE_HOURS", DEFAULT_HALF_LIFE_HOURS))
+                try:
+                    state.load()
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Could not load emotion state snapshot: {e}")
+                _STATE = state
+    return _STATE
+
+
+if __name__ == "__main__":
+    import sys
+    from database import get_connection
+
+    if "--rebuild" not in sys.argv:
+        print("Usage: python -m core.emotion_state --rebuild")
+        sys.exit(1)
+
+    conn = get_connection()
+    try:
+        users = get_emotion_state().rebuild_from_db(conn)
+        print(f"✅ Rebuilt decayed emotion state for {users} users → {STATE_FILE}")
+    finally:
+        conn.close()
@@ -3,14 +3,19 @@
 # Location: core/
 # Purpose: Defines Metatron’s Cube-based logic engine using
 #          NetworkX. Nodes = emotions, virtues, and symbolic traits.
+#          NetworkX is imported on first use so importing this module
+#          stays cheap at application startup.
 # ---------------------------------------------------------------
 
-import networkx as nx
+
+def _nx():
+    import networkx
+    return networkx
 
 
 class MetatronGraph:
     def __init__(self):
-        self.graph = nx.Graph()
+        self.graph = _nx().Graph()
         self._build_base_cube()
 
     def _build_base_cube(self):
@@ -58,6 +63,7 @@ class MetatronGraph:
         return [n for n in connected if self.graph.nodes[n]['type'] == 'virtue']
 
     def get_path(self, from_node, to_node):
+        nx = _nx()
         try:
             return nx.shortest_path(
                 self.graph, source=from_node, target=to_node)
@@ -66,6 +72,7 @@ class MetatronGraph:
 
     def visualize(self):
         import matplotlib.pyplot as plt
+        nx = _nx()
         color_map = ['red' if self.graph.nodes[n]['type'] ==
                      'emotion' else 'blue' for n in self.graph.nodes]
         nx.draw(self.graph, with_labels=True, node_color=color_map)
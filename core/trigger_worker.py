@@ -0,0 +1,153 @@
+# ========================================================================================
+# File: trigger_worker.py
+# Purpose: Evaluate symbolic triggers as part of emotion ingestion. log_emotion submits
+# the user here after its insert commits; a background thread runs UniversalEngine once
+# the user's burst of logs settles, so clients no longer follow every log with a
+# /cloelia/analyze-emotion call. New triggers reach clients via the trigger feed and
+# /events (log_symbolic_trigger publishes them).
+#
+# Debounce (per user):
+# - an evaluation runs TRIGGER_DEBOUNCE_SECONDS (default 2) after the user's latest log,
+#   but no later than TRIGGER_MAX_DELAY_SECONDS (default 10) after the first pending one,
+#   so a steady stream of logs is still evaluated regularly
+# - any number of logs inside that window cost one evaluation
+#
+# Duplicate suppression: UniversalEngine only writes a SymbolicTrigger row (and this
+# worker only appends to the symbolic log) when the dominant emotion or virtue differs
+# from the user's latest trigger.
+#
+# Usage:
+#   from core.trigger_worker import TRIGGER_WORKER
+#   TRIGGER_WORKER.start()          # main.py startup
+#   TRIGGER_WORKER.submit(user_id)  # after an EmotionLog insert commits
+# ========================================================================================
+
+import time
+import heapq
+import threading
+from core.universal_engine import UniversalEngine
+from src.utils.config import get_setting
+from src.utils.logger import log_symbolic_trigger
+from src.utils.metrics import TRIGGER_EVALUATIONS, TRIGGER_PENDING_USERS
+
+
+class TriggerWorker:
+    """
+    Per-user debounced trigger evaluation on a daemon thread.
+    """
+
+    def __init__(self, debounce_seconds=None, max_delay_seconds=None, connect=None, policy=None):
+        self.debounce_seconds = float(debounce_seconds or get_setting("TRIGGER_DEBOUNCE_SECONDS", "2"))
+        self.max_delay_seconds = float(max_delay_seconds or get_setting("TRIGGER_MAX_DELAY_SECONDS", "10"))
+        self._connect = connect
+        self._policy = policy
+        self._due = {}    # user_id → (due, first submitted), monotonic
+        self._heap = []   # (due, user_id); stale entries are skipped
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _connection(self):
+        if self._connect is not None:
+            return self._connect()
+        import database  # Resolved at call time so stand-ins can replace get_connection
+        return database.get_connection()
+
+    # -------------------------------------------------------------------
+    # Scheduling
+    # -------------------------------------------------------------------
+    def submit(self, user_id):
+        """
+        Schedule (or push back) the user's evaluation; returns immediately.
+        """
+        user_id = int(user_id)
+        now = time.monotonic()
+        with self._cond:
+            _, first = self._due.get(user_id, (None, now))
+            due = min(now + self.debounce_seconds, first + self.max_delay_seconds)
+            self._due[user_id] = (due, first)
+            heapq.heappush(self._heap, (due, user_id))
+            TRIGGER_PENDING_USERS.set(len(self._due))
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return len(self._due)
+
+    def _take_due(self):
+        """
+        Block until at least one user is due; pop and return every due user.
+        """
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = []
+                while self._heap and self._heap[0][0] <= now:
+                    due, user_id = heapq.heappop(self._heap)
+                    entry = self._due.get(user_id)
+                    if entry is not None and entry[0] == due:
+                        del self._due[user_id]
+                        ready.append(user_id)
+                if ready:
+                    TRIGGER_PENDING_USERS.set(len(self._due))
+                    return ready
+                self._cond.wait(self._heap[0][0] - now if self._heap else None)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="trigger-worker", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            for user_id in self._take_due():
+                self.evaluate(user_id)
+
+    def flush(self):
+        """
+        Evaluate every pending user now (shutdown, tests).
+        """
+        with self._cond:
+            users = list(self._due)
+            self._due.clear()
+            self._heap.clear()
+            TRIGGER_PENDING_USERS.set(0)
+        for user_id in users:
+            self.evaluate(user_id)
+        return len(users)
+
+    # -------------------------------------------------------------------
+    # Evaluation
+    # -------------------------------------------------------------------
+    def evaluate(self, user_id):
+        """
+        Run UniversalEngine for one user; log the trigger only if it changed.
+        """
+        try:
+            conn = self._connection()
+            try:
+                result = UniversalEngine(conn, policy=self._policy).detect_symbolic_trigger(user_id)
+            finally:
+                conn.close()
+        except Exception as e:
+            TRIGGER_EVALUATIONS.inc(outcome="error")
+            print(f"⚠️ Trigger evaluation failed for user {user_id}: {e}")
+            return None
+
+        if not result:
+            TRIGGER_EVALUATIONS.inc(outcome="no_match")
+        elif result["changed"]:
+            TRIGGER_EVALUATIONS.inc(outcome="changed")
+            log_symbolic_trigger({
+                "user_id": user_id,
+                "emotion": result["emotion"],
+                "virtue": result["virtue"],
+                "action": result["action"],
+                "trigger_id": result["trigger_id"]
+            })
+        else:
+            TRIGGER_EVALUATIONS.inc(outcome="unchanged")
+        return result
+
+
+TRIGGER_WORKER = TriggerWorker()
@@ -2,63 +2,135 @@
 # File: universal_engine.py
 # Purpose: Symbolic detection engine that analyzes recent user emotion logs and determines
 # if a symbolic action should trigger. Matches emotion → virtue, and logs the trigger.
+#
+# Trigger policies (TRIGGER_POLICY env var or constructor argument):
+# - "recent"  → mode of the latest 5 EmotionLog rows (default)
+# - "decayed" → dominant emotion from the time-decayed accumulator (no history query)
+#
+# A SymbolicTrigger row is written only when the dominant emotion or its virtue differs
+# from the user's latest trigger; otherwise that trigger is returned with changed=False.
+# Triggers sharing a timestamp are ordered by trigger_id, so "latest" is deterministic.
+# The check and the insert are not atomic: the trigger worker (core/trigger_worker.py)
+# and /cloelia/analyze-emotion can evaluate the same user at once, and both may insert
+# the same trigger. The cost is one duplicate row, which the next evaluation treats as
+# the latest trigger; nothing locks per user.
 # ========================================================================================
 
+import os
 from datetime import datetime, timedelta
+from core.emotion_state import get_emotion_state
+from src.utils.metrics import DB_QUERY_SECONDS
+from src.utils.tracing import span
+
+TRIGGER_POLICIES = ("recent", "decayed")
+
+# Hot queries; src/utils/schema.py checks that their plans keep using an index
+RECENT_EMOTIONS_SQL = """
+    SELECT emotion FROM EmotionLog
+    WHERE user_id = %s
+    ORDER BY timestamp DESC
+    LIMIT 5;
+"""
+
+VIRTUE_FOR_EMOTION_SQL = """
+    SELECT virtue_id, name FROM VirtueEntry
+    WHERE emotion_link = %s;
+"""
+
+LATEST_TRIGGER_SQL = """
+    SELECT trigger_id, emotion_match, symbol FROM SymbolicTrigger
+    WHERE user_id = %s
+    ORDER BY timestamp DESC, trigger_id DESC
+    LIMIT 1;
+"""
 
 
 class UniversalEngine:
-    def __init__(self, db_conn):
+    def __init__(self, db_conn, policy=None, emotion_state=None):
         self.conn = db_conn
+        self.policy = policy or os.getenv("TRIGGER_POLICY", "recent")
+        if self.policy not in TRIGGER_POLICIES:
+            raise ValueError(f"Unknown trigger policy: {self.policy}")
+        self.emotion_state = emotion_state
+
+    def _recent_dominant(self, cur, user_id):
+        """
+        Mode of the user's latest 5 emotion logs (requires a history query).
+        """
+        with span("db_recent_emotions"), DB_QUERY_SECONDS.time(query="recent_emotions"):
+            cur.execute(RECENT_EMOTIONS_SQL, (user_id,))
+            rows = cur.fetchall()
+
+        if not rows:
+            return None
+
+        emotions = [row[0] for row in rows]
+        return max(set(emotions), key=emotions.count)
+
+    def _decayed_dominant(self, user_id):
+        """
+        Highest time-decayed emotion from the in-memory accumulator.
+        """
+        state = self.emotion_state or get_emotion_state()
+        return state.dominant(user_id)
 
     def detect_symbolic_trigger(self, user_id):
         """
         Analyze recent logs to determine if a symbolic trigger should occur.
         """
         with self.conn.cursor() as cur:
-            # Step 1: Fetch latest 5 emotion logs
-            cur.execute("""
-                SELECT emotion FROM EmotionLog
-                WHERE user_id = %s
-                ORDER BY timestamp DESC
-                LIMIT 5;
-            """, (user_id,))
-            rows = cur.fetchall()
+            # Step 1: Determine the dominant emotion under the active policy
+            if self.policy == "decayed":
+                dominant = self._decayed_dominant(user_id)
+            else:
+                dominant = self._recent_dominant(cur, user_id)
 
-            if not rows:
+            if not dominant:
                 return None
 
-            emotions = [row[0] for row in rows]
-            dominant = max(set(emotions), key=emotions.count)
-
             # Step 2: Find matching virtue
-            cur.execute("""
-                SELECT virtue_id, name FROM VirtueEntry
-                WHERE emotion_link = %s;
-            """, (dominant,))
-            virtue = cur.fetchone()
+            with span("db_virtue_for_emotion"), DB_QUERY_SECONDS.time(query="virtue_for_emotion"):
+                cur.execute(VIRTUE_FOR_EMOTION_SQL, (dominant,))
+                virtue = cur.fetchone()
 
             if not virtue:
                 return None
 
-            # Step 3: Log symbolic trigger
-            cur.execute("""
-                INSERT INTO SymbolicTrigger (user_id, symbol, emotion_match, action_type, narration_file)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING trigger_id;
-            """, (
-                user_id,
-                virtue[1],
-                dominant,
-                'reflection_prompt',
-                f"narration_{virtue[1].lower()}.mp3"
-            ))
-            trigger_id = cur.fetchone()[0]
-            self.conn.commit()
+            # Step 3: Nothing changed since the latest trigger → no new row
+            with span("db_latest_trigger"), DB_QUERY_SECONDS.time(query="latest_trigger"):
+                cur.execute(LATEST_TRIGGER_SQL, (user_id,))
+                latest = cur.fetchone()
+
+            if latest and (latest[1], latest[2]) == (dominant, virtue[1]):
+                self.conn.rollback()
+                return {
+                    "trigger_id": latest[0],
+                    "emotion": dominant,
+                    "virtue": virtue[1],
+                    "action": "reflection_prompt",
+                    "changed": False
+                }
+
+            # Step 4: Log symbolic trigger
+            with span("db_insert_symbolic_trigger"), DB_QUERY_SECONDS.time(query="insert_symbolic_trigger"):
+                cur.execute("""
+                    INSERT INTO SymbolicTrigger (user_id, symbol, emotion_match, action_type, narration_file)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING trigger_id;
+                """, (
+                    user_id,
+                    virtue[1],
+                    dominant,
+                    'reflection_prompt',
+                    f"narration_{virtue[1].lower()}.mp3"
+                ))
+                trigger_id = cur.fetchone()[0]
+                self.conn.commit()
 
             return {
                 "trigger_id": trigger_id,
                 "emotion": dominant,
                 "virtue": virtue[1],
-                "action": "reflection_prompt"
+                "action": "reflection_prompt",
+                "changed": True
             }
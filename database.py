@@ -1,21 +1,25 @@
 # ========================================================================================
 # File: database.py
-# Purpose: PostgreSQL connection helper for the CloeliaAI Agent System
-# Note: Uses psycopg2 + dotenv for secure configuration
+# Purpose: Database connection helper for the CloeliaAI Agent System
+# Note: DB_BACKEND selects PostgreSQL (psycopg2, default) or the embedded SQLite
+#       backend in src/utils/sqlite_backend.py; both hand out psycopg2-style
+#       connections. Settings come from the shared .env loader in src/utils/config.py
 # ========================================================================================
 
-import psycopg2
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from src.utils.config import get_setting
 
 
 def get_connection():
+    if get_setting("DB_BACKEND", "postgresql").lower() == "sqlite":
+        from src.utils.sqlite_backend import get_sqlite_database
+        return get_sqlite_database().connect()
+
+    import psycopg2  # Imported on first use to keep application startup light
+
     return psycopg2.connect(
-        dbname=os.getenv("DB_NAME", "cloeila_dev"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD"),
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", "8888")
+        dbname=get_setting("DB_NAME", "cloeila_dev"),
+        user=get_setting("DB_USER", "postgres"),
+        password=get_setting("DB_PASSWORD"),
+        host=get_setting("DB_HOST", "localhost"),
+        port=get_setting("DB_PORT", "8888")
     )
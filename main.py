@@ -7,36 +7,68 @@
 # Purpose:
 #   Bootstraps the FastAPI application, loads environment variables,
 #   and registers symbolic perception routes for:
-#     • Metatron Firewall Middleware
+#     • Metatron Firewall Middleware (behind the deception net CIDR blocklist)
+#     • /auth Register / Login / Logout (bcrypt in a process pool, cached sessions)
 #     • /cloelia Emotion API
-#     • /emotion Logging
+#     • /emotion Logging (background trigger evaluation), History & Daily Arcs
 #     • /trigger Symbolic Feed
 #     • /firewall-log Event Review
 #     • /gpt Symbolic GPT Interaction (Fully FastAPI Integrated)
-#     • /gpt/test Jinja2 UI for Manual Testing
+#     • /gpt/test Jinja2 UI for Manual Testing (rendered once, cached)
+#     • /static Fingerprinted, Precompressed Assets (src/utils/static_assets.py)
+#     • /metrics Prometheus Instrumentation
+#     • /events Live Trigger & Firewall Push (SSE / WebSocket)
+#     • /perception Content-Addressed Microexpression Images
+#     • /admin Diagnostics (traces, profiles; requires X-Admin-Token)
+#
+# Startup:
+#   Configuration is loaded once (src/utils/config.load_env). External clients
+#   (psycopg2, ElevenLabs/requests) and heavy libraries (networkx, matplotlib)
+#   are imported lazily on first use, and a missing API key only disables the
+#   feature that needs it. Guarded by tests/benchmark_startup.py.
 #
 # Run:
 #   uvicorn main:app --reload
 # =============================================================================
 
+from src.utils.config import load_env, get_db_connection
+
+# Step 1: Load environment variables from .env (once, before any controller)
+load_env()
+
 from src.controllers.firewall_log_controller import firewall_log
 from src.controllers.trigger_feed_controller import trigger_feed
 from src.controllers.emotion_log_controller import emotion_log
 from src.agents.cloelia_ai.cloelia_api import cloelia_router
+from src.controllers import gpt_controller
 from src.controllers.gpt_controller import gpt_router
-from src.middleware.proxy_mind import ProxyMindMiddleware
+from src.controllers.metrics_controller import metrics_router
+from src.controllers.admin_controller import admin_router
+from src.controllers.auth_controller import auth_router
+from src.controllers.events_controller import events_router
+from src.agent_perception.main import perception_router
+from src.middleware.proxy_mind import ProxyMindMiddleware, FIREWALL_LOG
+from src.middleware.request_metrics import RequestMetricsMiddleware
+from src.middleware.deception import DeceptionMiddleware, BLOCKLIST
+from src.utils.profiler import ProfilingMiddleware
+from src.utils.metrics import REGISTRY
+from src.utils.firewall_store import FIREWALL_STORE
+from src.utils.firewall_rollup import FIREWALL_ROLLUP
+from src.utils.trigger_store import TRIGGER_STORE
+from src.utils.fact_sampler import FACT_SAMPLER
+from src.utils.fact_index import FACT_INDEX
+from src.utils.static_assets import STATIC_ASSETS, cached_page
+from src.utils.password_hashing import PASSWORD_HASHER
+from core.emotion_arc import EMOTION_ARCS
+from core.trigger_worker import TRIGGER_WORKER
+from core.emotion_state import get_emotion_state
+from src.utils.logger import LOG_FILE as SYMBOLIC_LOG
 import os
 import traceback
 from fastapi import FastAPI, Request, APIRouter
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import JSONResponse
-from dotenv import load_dotenv
-from src.utils.config import get_db_connection
-
-
-# Step 1: Load environment variables from .env
-load_dotenv()
 
 # Step 2: Initialize FastAPI app instance with metadata
 app = FastAPI(
@@ -44,10 +76,10 @@ app = FastAPI(
     description="Symbolic Emotional Insight API + GPT-4o-mini + ElevenLabs Audio Synthesis",
     version="0.1.0")
 
-# Step 3: Mount Static Assets (CSS/JS/Audio Files)
+# Step 3: Mount Static Assets (CSS/JS/Audio Files; fingerprinted URLs are immutable)
 app.mount(
     "/static",
-    StaticFiles(directory=os.path.join("views", "static")),
+    STATIC_ASSETS,
     name="static"
 )
 
@@ -60,10 +92,145 @@ app.mount(
 
 # Step 4: Configure Jinja2 Templates for UI Rendering
 templates = Jinja2Templates(directory=os.path.join("views", "templates"))
+templates.env.globals["asset_url"] = STATIC_ASSETS.url
 
-# Step 5: Add Metatron-Inspired Firewall Middleware
+# Step 5: Opt-in per-request profiler (innermost: profiles only the route itself)
+app.add_middleware(ProfilingMiddleware)
+
+# Step 6: Add Metatron-Inspired Firewall Middleware
 app.add_middleware(ProxyMindMiddleware)
 
+# Step 7: Per-route request metrics (so firewall time is included)
+app.add_middleware(RequestMetricsMiddleware)
+
+# Step 8: Deception net blocklist (outermost: listed networks skip all other work)
+app.add_middleware(DeceptionMiddleware)
+
+
+@app.on_event("startup")
+def start_metrics_flusher():
+    """
+    Periodically publish this worker's metrics snapshot for multi-worker /metrics.
+    """
+    REGISTRY.start_flusher()
+
+
+@app.on_event("startup")
+def build_static_assets():
+    """
+    Fingerprint views/static and write any missing gzip/brotli siblings.
+    """
+    count = STATIC_ASSETS.build()
+    print(f"🎨 Static assets ready: {count} files (build {STATIC_ASSETS.version}).")
+
+
+@app.on_event("startup")
+def start_blocklist_watcher():
+    """
+    Load the deception net blocklist and hot-reload it when the file changes.
+    """
+    BLOCKLIST.start_watcher()
+
+
+@app.on_event("startup")
+def import_legacy_firewall_log():
+    """
+    Carry proxy_mind_log.json over into the segmented firewall store (first run only).
+    """
+    imported = FIREWALL_STORE.import_legacy(FIREWALL_LOG)
+    if imported:
+        print(f"📥 Imported {imported} legacy firewall log entries.")
+
+
+@app.on_event("startup")
+def start_firewall_rollup():
+    """
+    Restore this worker's firewall rollups and persist them in the background.
+    """
+    try:
+        FIREWALL_ROLLUP.load()
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not restore firewall rollups: {e}")
+    FIREWALL_ROLLUP.start_persister()
+
+
+@app.on_event("shutdown")
+def persist_firewall_rollup():
+    FIREWALL_ROLLUP.persist()
+
+
+@app.on_event("shutdown")
+def persist_emotion_state():
+    try:
+        get_emotion_state().persist()
+    except OSError as e:
+        print(f"⚠️ Could not persist emotion state: {e}")
+
+
+@app.on_event("startup")
+def load_trigger_index():
+    """
+    Rebuild the trigger feed indexes (checkpoint + tail scan; legacy import on first run).
+    """
+    imported = TRIGGER_STORE.import_legacy(SYMBOLIC_LOG)
+    if imported:
+        print(f"📥 Imported {imported} legacy symbolic log entries.")
+    TRIGGER_STORE.load_checkpoint()
+
+
+@app.on_event("startup")
+def start_fact_sampler():
+    """
+    Load knowledge_base facts for GPT prompts in the background (never blocks startup).
+    The relevance index is memory-mapped from disk and kept in sync with each refresh.
+    """
+    if not FACT_INDEX.load():
+        print("ℹ️ No saved fact index yet; it will be built on the first fact refresh.")
+    FACT_SAMPLER.add_listener(FACT_INDEX.sync)
+    FACT_SAMPLER.start()
+
+
+@app.on_event("startup")
+def start_emotion_arc_refresher():
+    """
+    Fold new EmotionLog / SymbolicTrigger rows into the daily arc rollups in the background.
+    """
+    EMOTION_ARCS.start()
+
+
+@app.on_event("startup")
+def start_trigger_worker():
+    """
+    Evaluate symbolic triggers in the background after /emotion/log-emotion (debounced per user).
+    """
+    TRIGGER_WORKER.start()
+
+
+@app.on_event("startup")
+async def prepare_password_hasher():
+    """
+    Compute the dummy hash for unknown-user logins once, in a worker thread.
+    """
+    PASSWORD_HASHER.prepare()
+
+
+@app.on_event("shutdown")
+def flush_trigger_worker():
+    TRIGGER_WORKER.flush()
+
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    PASSWORD_HASHER.shutdown()
+
+
+@app.on_event("shutdown")
+def save_trigger_index():
+    try:
+        TRIGGER_STORE.save_checkpoint()
+    except OSError as e:
+        print(f"⚠️ Could not checkpoint trigger index: {e}")
+
 # -----------------------------------------------------------------------------
 # Root Health Check (Hidden from OpenAPI Docs)
 # -----------------------------------------------------------------------------
@@ -85,12 +252,10 @@ def root():
 def gpt_test_ui(request: Request):
     """
     Renders the symbolic GPT test interface for manual message evaluation.
+    The page has no per-request data, so it is rendered once and revalidated by ETag.
     """
     try:
-        return templates.TemplateResponse(
-            "gpt_test_ui.html",
-            {"request": request}
-        )
+        return cached_page(request, templates, "gpt_test_ui.html")
     except Exception as e:
         traceback.print_exc()
         return JSONResponse(
@@ -145,6 +310,8 @@ app.include_router(gpt_router)
 # -----------------------------------------------------------------------------
 # Register All Other Routers (Modular Controllers)
 # -----------------------------------------------------------------------------
+app.include_router(auth_router, prefix="/auth", tags=["Auth"])
+
 app.include_router(cloelia_router, prefix="/cloelia", tags=["Cloelia"])
 
 app.include_router(emotion_log, prefix="/emotion", tags=["Emotion Log"])
@@ -152,3 +319,11 @@ app.include_router(emotion_log, prefix="/emotion", tags=["Emotion Log"])
 app.include_router(trigger_feed, prefix="/trigger", tags=["Symbolic Feed"])
 
 app.include_router(firewall_log, prefix="/firewall-log", tags=["Firewall Log"])
+
+app.include_router(events_router, prefix="/events", tags=["Live Events"])
+
+app.include_router(perception_router, prefix="/perception", tags=["Perception"])
+
+app.include_router(metrics_router, tags=["System Check"])
+
+app.include_router(admin_router, prefix="/admin", tags=["Admin"])
@@ -7,7 +7,8 @@
 // Purpose:
 //   Node.js GPT Bridge to OpenAI API with Database Knowledge Injection.
 //     1. Loads environment variables securely.
-//     2. Fetches symbolic facts from PostgreSQL.
+//     2. Uses the fact sampled by the Python side (CLOELIA_FACT), or fetches one
+//        from PostgreSQL when run standalone.
 //     3. Enriches GPT prompt with database knowledge.
 //     4. Sends the enriched prompt to OpenAI API.
 //     5. Returns strict JSON response with "content" field.
@@ -66,8 +67,13 @@ if (!fs.existsSync(logDir)) {
     fs.mkdirSync(logDir, { recursive: true });
 }
 
+// ✅ Fact injected by gpt_controller (FactSampler); undefined when run standalone
+const injectedFact = process.env.CLOELIA_FACT;
+
 // ✅ Validate Required Environment Variables Before Proceeding
-const REQUIRED_ENV_VARS = ['OPENAI_KEY', 'DB_USER', 'DB_HOST', 'DB_NAME', 'DB_PASSWORD', 'DB_PORT'];
+const REQUIRED_ENV_VARS = injectedFact !== undefined
+    ? ['OPENAI_KEY']
+    : ['OPENAI_KEY', 'DB_USER', 'DB_HOST', 'DB_NAME', 'DB_PASSWORD', 'DB_PORT'];
 for (const key of REQUIRED_ENV_VARS) {
     if (!process.env[key]) {
         console.error(`❌ Missing environment variable: ${key}`);
@@ -78,10 +84,14 @@ for (const key of REQUIRED_ENV_VARS) {
 const openai = new OpenAI({ apiKey: process.env.OPENAI_KEY });
 
 /**
- * Fetches a symbolic fact from the PostgreSQL knowledge base.
+ * Returns the injected fact, or fetches a symbolic fact from the PostgreSQL knowledge base.
  * @returns {Promise<string>} A fact string to inject into the GPT prompt.
  */
 async function fetchDatabaseFact() {
+    if (injectedFact !== undefined) {
+        return injectedFact;
+    }
+
     const client = new Client({
         user: process.env.DB_USER,
         host: process.env.DB_HOST,
@@ -1 +1,225 @@
-print("Agent agent_deception_net is running!")
+# ========================================================================================
+# File: main.py
+# Project: CloeliaAI_AgentSystem — agent_deception_net
+#
+# Purpose:
+# Deception / blocklist engine. Banned and flagged networks are kept in a binary radix
+# trie of CIDR prefixes, so classifying a client address walks at most its prefix
+# length (32 bits for IPv4, 128 for IPv6) regardless of how many networks are listed.
+# The API consults it before any other middleware work (src/middleware/deception.py).
+#
+# Rules file (DECEPTION_BLOCKLIST, default blocklist.txt next to this module):
+#   # comment
+#   203.0.113.0/24    block     → immediate 403, nothing else runs
+#   198.51.100.7      tarpit    → connection held open, trickled a byte at a time
+#   2001:db8::/32     decoy     → canned fake page
+# The most specific matching prefix wins. DECEPTION_BLOCKLIST may list several files
+# separated by commas (the API adds guardian_cloeila's generated guardian_flagged.txt);
+# for the same prefix the later file wins. Files are re-read when an mtime changes
+# (polled every DECEPTION_RELOAD_SECONDS); a file with errors keeps the previous rules.
+#
+# Standalone (the agent's container entrypoint) it validates a rules file and classifies
+# addresses:
+#   python main.py [--file blocklist.txt[,more.txt]] 203.0.113.9 10.0.0.1
+# --file defaults to DECEPTION_BLOCKLIST (read through the project's .env when
+# src/utils is available). Only the standard library is used otherwise, so the module
+# also runs inside the agent image.
+# ========================================================================================
+
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+import ipaddress
+
+# Allow `python src/agent_deception_net/main.py` as well as `python -m`
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+ACTIONS = ("block", "tarpit", "decoy")
+
+DEFAULT_BLOCKLIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blocklist.txt")
+
+
+class CidrTrie:
+    """
+    Binary radix trie mapping CIDR prefixes to actions (longest prefix match).
+
+    Nodes are [child_0, child_1, action] lists; one trie per address family.
+    """
+
+    def __init__(self):
+        self._roots = {4: [None, None, None], 6: [None, None, None]}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, network, action):
+        network = ipaddress.ip_network(network, strict=False)
+        bits = network.max_prefixlen
+        value = int(network.network_address)
+        node = self._roots[network.version]
+        for i in range(network.prefixlen):
+            bit = (value >> (bits - 1 - i)) & 1
+            child = node[bit]
+            if child is None:
+                child = node[bit] = [None, None, None]
+            node = child
+        if node[2] is None:
+            self._size += 1
+        node[2] = action
+
+    def lookup(self, address):
+        """
+        Action of the most specific prefix containing `address`, or None.
+        """
+        if not self._size:
+            return None
+        try:
+            version, bits = 4, 32
+            value = int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big")
+        except OSError:
+            try:
+                parsed = ipaddress.IPv6Address(address)
+            except ValueError:
+                return None
+            if parsed.ipv4_mapped is not None:
+                version, value = 4, int(parsed.ipv4_mapped)
+            else:
+                version, bits, value = 6, 128, int(parsed)
+        node = self._roots[version]
+        found = node[2]
+        for i in range(bits):
+            node = node[(value >> (bits - 1 - i)) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                found = node[2]
+        return found
+
+
+def parse_rules(lines, trie=None):
+    """
+    Build (or extend) a CidrTrie from rules lines; raises ValueError naming the first
+    bad line.
+    """
+    trie = trie if trie is not None else CidrTrie()
+    for number, line in enumerate(lines, start=1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        parts = line.split()
+        action = parts[1].lower() if len(parts) > 1 else "block"
+        if len(parts) > 2 or action not in ACTIONS:
+            raise ValueError(f"line {number}: expected '<cidr> [{'|'.join(ACTIONS)}]'")
+        try:
+            trie.insert(parts[0], action)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from None
+    return trie
+
+
+class Blocklist:
+    """
+    Hot-reloadable CIDR rules; lookups read an immutable trie swapped on reload.
+    """
+
+    def __init__(self, paths=DEFAULT_BLOCKLIST, reload_seconds=2.0):
+        if isinstance(paths, str):
+            paths = paths.split(",")
+        self.paths = [p.strip() for p in paths if p.strip()]
+        self.reload_seconds = float(reload_seconds)
+        self._trie = CidrTrie()
+        self._mtimes = None
+        self._watcher = None
+
+    def __len__(self):
+        return len(self._trie)
+
+    def lookup(self, address):
+        return self._trie.lookup(address)
+
+    def reload(self):
+        """
+        Re-read the rules files if any changed; returns True when new rules were applied.
+        Missing files contribute no rules.
+        """
+        mtimes = []
+        for path in self.paths:
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        if mtimes == self._mtimes:
+            return False
+        trie = CidrTrie()
+        for path, mtime in zip(self.paths, mtimes):
+            if mtime is None:
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    parse_rules(f, trie)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Blocklist {path} not applied: {e}")
+                self._mtimes = mtimes  # don't re-parse the same broken file every poll
+                return False
+        self._trie, self._mtimes = trie, mtimes
+        print(f"🛡️ Blocklist loaded: {len(trie)} networks from {len(self.paths)} file(s)")
+        return True
+
+    def start_watcher(self):
+        """
+        Poll the rules file from a daemon thread and apply changes as they appear.
+        """
+        if self._watcher is not None:
+            return
+        self.reload()
+
+        def loop():
+            while True:
+                time.sleep(self.reload_seconds)
+                self.reload()
+
+        self._watcher = threading.Thread(target=loop, name="blocklist-watcher", daemon=True)
+        self._watcher.start()
+
+
+def _configured_blocklist():
+    """
+    DECEPTION_BLOCKLIST via get_setting (so .env applies); the agent image ships
+    without src/utils and python-dotenv, so fall back to the environment there.
+    """
+    try:
+        from src.utils.config import get_setting
+    except ImportError:
+        return os.getenv("DECEPTION_BLOCKLIST") or DEFAULT_BLOCKLIST
+    return get_setting("DECEPTION_BLOCKLIST") or DEFAULT_BLOCKLIST
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate a blocklist and classify addresses")
+    parser.add_argument("--file", default=None,
+                        help="rules file(s), comma-separated (default: DECEPTION_BLOCKLIST)")
+    parser.add_argument("addresses", nargs="*")
+    args = parser.parse_args(argv)
+
+    # Same parsing as the API's Blocklist: comma-separated, later files win
+    paths = Blocklist(args.file or _configured_blocklist()).paths
+    trie = CidrTrie()
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                parse_rules(f, trie)
+        except (OSError, ValueError) as e:
+            print(f"❌ {path}: {e}")
+            return 1
+    print(f"✅ {', '.join(paths)}: {len(trie)} networks")
+    for address in args.addresses:
+        print(f"{address}\t{trie.lookup(address) or 'allow'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
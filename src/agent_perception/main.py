@@ -1 +1,287 @@
-print("Agent agent_perception is running!")
+# ========================================================================================
+# File: main.py
+# Project: CloeliaAI_AgentSystem — agent_perception
+#
+# Purpose:
+# Content-addressed store for microexpression images, so EmotionLog rows carry a
+# 64-character SHA-256 digest instead of free-form image strings (paths, data URIs).
+#
+# Uploads:
+#   PUT /perception/images   body = raw image bytes (image/jpeg, png, gif or webp)
+#   → {"digest": "<sha256 hex>", "bytes": n, "duplicate": bool}
+# Uploads need a logged-in session (src/utils/session_auth.py) or a valid X-Admin-Token.
+# The body is hashed while it streams to a temporary file (never held in memory; disk
+# writes run in a worker thread) and is capped at PERCEPTION_MAX_IMAGE_MB: a larger
+# Content-Length is refused up front, a chunked body as soon as it passes the cap (413).
+# The file is then moved to its sharded location
+#   PERCEPTION_IMAGE_DIR (default <log dir>/images)/ab/cd/abcd…
+# Identical images are stored once; a second upload only discards its temp file.
+#
+# Reads:
+#   GET /perception/images/{digest}  → FileResponse (the file is streamed from disk, or
+#   sent zero-copy where the server supports the ASGI pathsend extension), with an
+#   immutable Cache-Control and the digest as ETag (If-None-Match → 304).
+#
+# POST /emotion/log-emotion stores digests: a data:image/...;base64 URI in
+# `microexpression_img` is ingested here first, and a digest must name a stored image.
+# Any other string (a legacy path or URL) is stored unchanged, with a warning.
+#
+# Standalone (the agent's container entrypoint) the store is served on its own:
+#   python -m src.agent_perception.main   (PERCEPTION_PORT, default 8010)
+# The container has no database driver, so login sessions cannot be checked there:
+# standalone uploads need X-Admin-Token (ADMIN_TOKEN) only.
+# ========================================================================================
+
+import os
+import re
+import sys
+import base64
+import asyncio
+import hashlib
+import tempfile
+import binascii
+
+# Allow `python src/agent_perception/main.py` as well as `python -m`
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from fastapi import APIRouter, Depends, HTTPException, Request  # noqa: E402
+from fastapi.responses import FileResponse, Response  # noqa: E402
+from src.utils.admin_auth import is_admin_token, require_admin  # noqa: E402
+from src.utils.config import get_setting, log_path  # noqa: E402
+from src.utils.metrics import PERCEPTION_IMAGES  # noqa: E402
+from src.utils.session_auth import require_user  # noqa: E402
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Magic numbers of the accepted formats → media type
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def sniff_media_type(head):
+    """
+    Media type of an image from its first bytes, or None when not a supported format.
+    """
+    for signature, media_type in _SIGNATURES:
+        if head.startswith(signature):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def is_digest(value):
+    return bool(value) and DIGEST_PATTERN.match(value) is not None
+
+
+class ImageStore:
+    """
+    Sharded, deduplicated on-disk store addressed by SHA-256 digest.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or get_setting("PERCEPTION_IMAGE_DIR") or log_path("images")
+        self.max_bytes = int(
+            max_bytes or float(get_setting("PERCEPTION_MAX_IMAGE_MB", "10")) * 1024 * 1024)
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return is_digest(digest) and os.path.exists(self.path_for(digest))
+
+    def _open_temp(self):
+        tmp_dir = os.path.join(self.directory, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        return os.fdopen(fd, "wb"), tmp_path
+
+    async def put_stream(self, chunks):
+        """
+        Store an async stream of bytes; returns (digest, size, duplicate).
+
+        Raises ValueError for an unsupported format and ImageTooLarge past max_bytes.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        # File I/O runs in a worker thread so a slow disk never stalls the event loop
+        f, tmp_path = await asyncio.to_thread(self._open_temp)
+        try:
+            try:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ImageTooLarge(f"image exceeds {self.max_bytes} bytes")
+                    if len(head) < 16:
+                        head += chunk[:16 - len(head)]
+                    digest.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+            if sniff_media_type(head) is None:
+                raise ValueError("unsupported image format (expected JPEG, PNG, GIF or WebP)")
+            return await asyncio.to_thread(self._commit, tmp_path, digest.hexdigest(), size)
+        except BaseException:
+            _remove(tmp_path)
+            raise
+
+    def put_bytes(self, data):
+        """
+        Store an in-memory image (e.g. a decoded data URI); same result as put_stream.
+        """
+        if len(data) > self.max_bytes:
+            raise ImageTooLarge(f"image exceeds {self.max_bytes} bytes")
+        if sniff_media_type(data[:16]) is None:
+            raise ValueError("unsupported image format (expected JPEG, PNG, GIF or WebP)")
+        digest = hashlib.sha256(data).hexdigest()
+        if self.exists(digest):
+            return digest, len(data), True
+        f, tmp_path = self._open_temp()
+        try:
+            with f:
+                f.write(data)
+            return self._commit(tmp_path, digest, len(data))
+        except BaseException:
+            _remove(tmp_path)
+            raise
+
+    def _commit(self, tmp_path, digest, size):
+        final_path = self.path_for(digest)
+        if os.path.exists(final_path):
+            _remove(tmp_path)
+            return digest, size, True
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)  # same bytes under the same name: races are benign
+        return digest, size, False
+
+    def media_type(self, digest):
+        with open(self.path_for(digest), "rb") as f:
+            return sniff_media_type(f.read(16)) or "application/octet-stream"
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+IMAGE_STORE = ImageStore()
+
+
+def resolve_image_reference(value, store=None):
+    """
+    Normalize an EmotionLog `microexpression_img` value for storage.
+
+    A data:image/...;base64 URI is ingested and replaced by its digest; a digest must
+    name a stored image (ValueError otherwise, as for malformed or oversized image
+    data). Any other string is returned unchanged, with a warning.
+    """
+    store = store or IMAGE_STORE
+    if value is None or value == "":
+        return None
+    value = value.strip()
+    if is_digest(value.lower()):
+        if not store.exists(value.lower()):
+            raise ValueError("unknown image digest; upload it to /perception/images first")
+        return value.lower()
+    if value.startswith("data:image/") and ";base64," in value:
+        encoded = value.split(",", 1)[1]
+        if len(encoded) > (store.max_bytes + 2) // 3 * 4:  # checked before decoding
+            raise ImageTooLarge(f"image exceeds {store.max_bytes} bytes")
+        try:
+            data = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError("malformed base64 image data") from None
+        digest, _, duplicate = store.put_bytes(data)
+        PERCEPTION_IMAGES.inc(result="duplicate" if duplicate else "stored")
+        return digest
+    print(f"⚠️ microexpression_img is neither an image digest nor a data:image URI; "
+          f"storing it unchanged: {value[:80]!r}")
+    PERCEPTION_IMAGES.inc(result="passthrough")
+    return value
+
+
+# -------------------------------------------------------------------
+# Routes
+# -------------------------------------------------------------------
+perception_router = APIRouter()
+
+
+async def require_uploader(request: Request):
+    """
+    FastAPI dependency: a valid X-Admin-Token, else a logged-in session (401).
+    """
+    if is_admin_token(request.headers.get("x-admin-token")):
+        return None
+    return await require_user(request)
+
+
+@perception_router.put("/images", dependencies=[Depends(require_uploader)])
+async def upload_image(request: Request):
+    """
+    Stream a raw image body into the store; returns its digest for EmotionLog.
+
+    Returns 401 without a session or admin token, 413 past PERCEPTION_MAX_IMAGE_MB
+    and 415 for a body that is not a JPEG, PNG, GIF or WebP image.
+    """
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > IMAGE_STORE.max_bytes:
+        PERCEPTION_IMAGES.inc(result="rejected")
+        raise HTTPException(status_code=413, detail="Image too large.")
+    try:
+        digest, size, duplicate = await IMAGE_STORE.put_stream(request.stream())
+    except ImageTooLarge as e:
+        PERCEPTION_IMAGES.inc(result="rejected")
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        PERCEPTION_IMAGES.inc(result="rejected")
+        raise HTTPException(status_code=415, detail=str(e))
+    PERCEPTION_IMAGES.inc(result="duplicate" if duplicate else "stored")
+    return {"digest": digest, "bytes": size, "duplicate": duplicate}
+
+
+@perception_router.get("/images/{digest}")
+def get_image(digest: str, request: Request):
+    """
+    Serve a stored image straight from disk; content never changes for a digest.
+    """
+    if not IMAGE_STORE.exists(digest):
+        raise HTTPException(status_code=404, detail="Image not found.")
+    headers = {
+        "ETag": f'"{digest}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if f'"{digest}"' in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        IMAGE_STORE.path_for(digest), media_type=IMAGE_STORE.media_type(digest), headers=headers)
+
+
+def create_app():
+    from fastapi import FastAPI
+    from src.utils.config import load_env
+    load_env()
+    app = FastAPI(title="Cloelia agent_perception")
+    app.include_router(perception_router, prefix="/perception", tags=["Perception"])
+    # No database here to confirm sessions against: uploads take the admin token only
+    app.dependency_overrides[require_uploader] = require_admin
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(create_app(), host="0.0.0.0", port=int(get_setting("PERCEPTION_PORT", "8010")))
@@ -8,6 +8,8 @@
 # FastAPI router module for Cloelia's emotional insight engine. This endpoint receives
 # structured emotion input and invokes the UniversalEngine to detect symbolic patterns
 # from recent emotion logs. If a pattern matches, it returns a virtue, action, and trigger ID.
+# (/emotion/log-emotion already schedules this evaluation in the background, see
+# core/trigger_worker.py; calling this route is only needed for an immediate answer.)
 #
 # Description:
 # This module follows modular N-tier architecture, combining API routing (Controller Layer)
@@ -19,13 +21,15 @@
 # - POST   /cloelia/analyze-emotion → Analyze recent logs to trigger symbolic insight
 # ========================================================================================
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 from pydantic import BaseModel
 from core.universal_engine import UniversalEngine            # Symbolic logic engine
 # DB connection helper
 from database import get_connection
 # Log symbolic insight to JSON
 from src.utils.logger import log_symbolic_trigger
+# Per-stage spans → Server-Timing header / admin trace buffer
+from src.utils.tracing import start_trace, span, finish_trace
 
 # -----------------------------------------------------------
 # Initialize FastAPI router for Cloelia endpoint group
@@ -68,7 +72,7 @@ def read_status():
 
 
 @cloelia_router.post("/analyze-emotion")
-async def analyze_emotion(req: EmotionRequest):
+async def analyze_emotion(req: EmotionRequest, response: Response):
     """
     Accepts user emotion input and analyzes recent emotional patterns to determine
     if a symbolic trigger (e.g., virtue reflection, legacy unlock) should activate.
@@ -77,21 +81,34 @@ async def analyze_emotion(req: EmotionRequest):
     1. Connects to the PostgreSQL database
     2. Uses UniversalEngine to scan recent logs
     3. Matches dominant emotion to a virtue (from VirtueEntry)
-    4. Inserts a symbolic trigger into SymbolicTrigger table
-    5. Logs the result to symbolic_log.json
+    4. Inserts a symbolic trigger into SymbolicTrigger table, unless the user's latest
+       trigger already has this emotion and virtue
+    5. Logs a new trigger to the symbolic log
 
     Returns:
     - emotion_detected: Dominant emotion
     - suggested_virtue: Mapped virtue response
     - action: Recommended symbolic action (e.g., 'reflection_prompt')
-    - trigger_id: Database ID of the symbolic trigger
+    - trigger_id: Database ID of the symbolic trigger (the existing one when unchanged)
+    - changed: False when no new trigger was written
 
     Errors:
     - Returns a descriptive error message on failure
+
+    Stage timings are returned in the `Server-Timing` header.
     """
+    trace = start_trace("analyze_emotion")
+    try:
+        return _analyze_emotion(req)
+    finally:
+        finish_trace(trace, response)
+
+
+def _analyze_emotion(req: EmotionRequest):
     try:
         # Step 1: Connect to database
-        conn = get_connection()
+        with span("db_connect"):
+            conn = get_connection()
 
         # Step 2: Run symbolic detection engine
         engine = UniversalEngine(conn)
@@ -102,19 +119,22 @@ async def analyze_emotion(req: EmotionRequest):
 
         # Step 4: Return result or no-match message
         if result:
-            log_symbolic_trigger({
-                "user_id": req.user_id,
-                "emotion": result["emotion"],
-                "virtue": result["virtue"],
-                "action": result["action"],
-                "trigger_id": result["trigger_id"]
-            })
+            if result["changed"]:
+                with span("log_write"):
+                    log_symbolic_trigger({
+                        "user_id": req.user_id,
+                        "emotion": result["emotion"],
+                        "virtue": result["virtue"],
+                        "action": result["action"],
+                        "trigger_id": result["trigger_id"]
+                    })
 
             return {
                 "emotion_detected": result["emotion"],
                 "suggested_virtue": result["virtue"],
                 "action": result["action"],
-                "trigger_id": result["trigger_id"]
+                "trigger_id": result["trigger_id"],
+                "changed": result["changed"]
             }
         else:
             return {"message": "No symbolic pattern detected."}
@@ -0,0 +1,99 @@
+# ========================================================================================
+# File: admin_controller.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Admin-only diagnostics for investigating individual slow requests. All routes require
+# the `X-Admin-Token` header (see src/utils/admin_auth.py).
+#
+# Routes:
+# - GET /admin/traces            → Recent traces (filters: name, min_duration_ms, status)
+# - GET /admin/traces/{trace_id} → One trace by the X-Trace-Id returned to the client
+# - GET /admin/profiles            → Stored per-request profiles (newest first)
+# - GET /admin/profiles/{id}       → Download a pstats file (?format=text for a report)
+# ========================================================================================
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+from src.utils.admin_auth import require_admin
+from src.utils.profiler import PROFILE_STORE
+from src.utils.tracing import TRACE_BUFFER
+
+# -----------------------------------------------------------------------------
+# Define router instance to be included in main.py
+# -----------------------------------------------------------------------------
+admin_router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@admin_router.get("/traces")
+def list_traces(name: str = None, min_duration_ms: float = 0.0, status: str = None,
+                limit: int = 50):
+    """
+    Return the most recent retained traces, newest first.
+
+    Returns:
+        - 200 OK: {"enabled": bool, "capacity": int, "traces": [...]}
+    """
+    return {
+        "enabled": TRACE_BUFFER.enabled,
+        "capacity": TRACE_BUFFER.size,
+        "traces": TRACE_BUFFER.query(
+            name=name,
+            min_duration_ms=min_duration_ms,
+            status=status,
+            limit=max(1, min(limit, 500))),
+    }
+
+
+@admin_router.get("/traces/{trace_id}")
+def get_trace(trace_id: str):
+    """
+    Return a single retained trace.
+
+    Returns:
+        - 200 OK: Trace with per-stage spans
+        - 404 Not Found: Unknown or already evicted trace ID
+    """
+    record = TRACE_BUFFER.get(trace_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Trace not found (evicted or never recorded).")
+    return record
+
+
+@admin_router.get("/profiles")
+def list_profiles(limit: int = 100):
+    """
+    List stored request profiles with their route, trigger, status and duration.
+    """
+    return {"profiles": PROFILE_STORE.list()[:max(1, min(limit, 1000))]}
+
+
+@admin_router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = "pstats", sort: str = "cumulative",
+                limit: int = 40):
+    """
+    Download a stored profile.
+
+    Query:
+        - format=pstats (default): raw file for `python -m pstats` / snakeviz
+        - format=text: top `limit` functions sorted by `sort`
+
+    Returns:
+        - 404 Not Found: Unknown or evicted profile ID
+    """
+    if format == "text":
+        try:
+            report = PROFILE_STORE.summary(profile_id, sort=sort, limit=max(1, min(limit, 500)))
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+        if report is None:
+            raise HTTPException(status_code=404, detail="Profile not found.")
+        return PlainTextResponse(report)
+
+    path = PROFILE_STORE.path_for(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=f"{profile_id}.prof")
@@ -1,41 +1,152 @@
-# Auth Controller (Auth feature)
-# Routes: /login, /register, /logout
-# Uses flask-login and passlib for password hashing.
-# src/controllers/auth_controller.py
-
-from flask import Blueprint, request, jsonify, session
-from flask_login import login_user, logout_user, login_required
-from passlib.hash import bcrypt
-from models.user_profile import UserProfile
-from src.database import db  # SQLAlchemy object
-
-auth = Blueprint("auth", __name__)
-
-
-@auth.route("/register", methods=["POST"])
-def register():
-    data = request.get_json()
-    username = data.get("username")
-    password = bcrypt.hash(data.get("password"))
-
-    user = UserProfile(username=username, password_hash=password)
-    db.session.add(user)
-    db.session.commit()
-    return jsonify({"message": "Registered successfully"})
-
-
-@auth.route("/login", methods=["POST"])
-def login():
-    data = request.get_json()
-    user = UserProfile.query.filter_by(username=data.get("username")).first()
-    if user and bcrypt.verify(data.get("password"), user.password_hash):
-        login_user(user)
-        return jsonify({"message": "Login successful"})
-    return jsonify({"error": "Invalid credentials"}), 401
-
-
-@auth.route("/logout", methods=["POST"])
-@login_required
-def logout():
-    logout_user()
-    return jsonify({"message": "Logged out"})
+# ========================================================================================
+# File: auth_controller.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Account registration and login sessions (UserProfile / UserSession tables).
+#
+# bcrypt never runs on the event loop: hashing and verification go through the bounded
+# process pool in src/utils/password_hashing.py (503 + Retry-After when it is saturated),
+# and authenticated requests are checked against signed tokens plus an in-memory session
+# cache (src/utils/session_auth.py), so they never touch bcrypt. Every route answers 503
+# while login sessions are disabled (JWT_SECRET_KEY unset under several workers).
+#
+# Routes:
+# - POST /auth/register → Create an account
+# - POST /auth/login    → Verify the password, start a session (token + cookie)
+# - POST /auth/logout   → End the current session
+# - GET  /auth/me       → The logged-in user
+# ========================================================================================
+
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from database import get_connection
+from src.utils.admission import AdmissionRejected
+from src.utils.metrics import DB_QUERY_SECONDS
+from src.utils.password_hashing import PASSWORD_HASHER
+from src.utils.session_auth import (
+    SESSION_COOKIE, SESSIONS, SessionUser, require_sessions, require_user)
+
+auth_router = APIRouter(dependencies=[Depends(require_sessions)])
+
+MIN_PASSWORD_LENGTH = 8
+MAX_USERNAME_LENGTH = 64
+
+
+class Credentials(BaseModel):
+    username: str
+    password: str
+
+
+def _hashing_busy(e: AdmissionRejected) -> HTTPException:
+    print(f"⏳ {e}")
+    return HTTPException(
+        status_code=503,
+        detail="Too many logins in progress; retry later.",
+        headers={"Retry-After": str(e.retry_after)})
+
+
+def _find_user(username):
+    """
+    (user_id, password_hash) for a username, or None.
+    """
+    conn = get_connection()
+    try:
+        with DB_QUERY_SECONDS.time(query="user_lookup"), conn.cursor() as cur:
+            cur.execute("SELECT user_id, password_hash FROM UserProfile WHERE username = %s",
+                        (username,))
+            row = cur.fetchone()
+        conn.rollback()
+        return row
+    finally:
+        conn.close()
+
+
+def _create_user(username, password_hash):
+    """
+    New user_id, or None when the username was taken meanwhile.
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO UserProfile (username, password_hash) VALUES (%s, %s) "
+                        "RETURNING user_id", (username, password_hash))
+            user_id = cur.fetchone()[0]
+        conn.commit()
+        return user_id
+    except Exception as e:
+        conn.rollback()
+        if type(e).__name__ in ("IntegrityError", "UniqueViolation"):
+            return None
+        raise
+    finally:
+        conn.close()
+
+
+@auth_router.post("/register", status_code=201)
+async def register(credentials: Credentials):
+    """
+    Returns:
+        - 201 Created: {"user_id": int, "username": str}
+        - 400 Bad Request: Invalid username or too short a password
+        - 409 Conflict: Username already taken
+        - 503 Service Unavailable: Password hashing saturated (see Retry-After)
+    """
+    username = credentials.username.strip()
+    if not username or len(username) > MAX_USERNAME_LENGTH:
+        raise HTTPException(status_code=400, detail=f"username must be 1-{MAX_USERNAME_LENGTH} characters.")
+    if len(credentials.password) < MIN_PASSWORD_LENGTH:
+        raise HTTPException(status_code=400, detail=f"password must be at least {MIN_PASSWORD_LENGTH} characters.")
+
+    # Checked before hashing so a taken name costs no bcrypt work
+    if await asyncio.to_thread(_find_user, username) is not None:
+        raise HTTPException(status_code=409, detail="Username already taken.")
+    try:
+        password_hash = await PASSWORD_HASHER.hash(credentials.password)
+    except AdmissionRejected as e:
+        raise _hashing_busy(e)
+
+    user_id = await asyncio.to_thread(_create_user, username, password_hash)
+    if user_id is None:
+        raise HTTPException(status_code=409, detail="Username already taken.")
+    return {"user_id": user_id, "username": username}
+
+
+@auth_router.post("/login")
+async def login(credentials: Credentials):
+    """
+    Returns:
+        - 200 OK: {"token": str, "user": {...}} and the session cookie
+        - 401 Unauthorized: Unknown username or wrong password
+        - 503 Service Unavailable: Password hashing saturated (see Retry-After)
+    """
+    username = credentials.username.strip()
+    row = await asyncio.to_thread(_find_user, username)
+    try:
+        valid = await PASSWORD_HASHER.verify(credentials.password, row[1] if row else None)
+    except AdmissionRejected as e:
+        raise _hashing_busy(e)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials.")
+
+    token = await asyncio.to_thread(SESSIONS.create, row[0], username)
+    user = await SESSIONS.authenticate(token)
+    response = JSONResponse({"token": token, "user": user.to_dict()})
+    response.set_cookie(SESSION_COOKIE, token, max_age=SESSIONS.ttl_seconds,
+                        httponly=True, samesite="lax")
+    return response
+
+
+@auth_router.post("/logout")
+async def logout(user: SessionUser = Depends(require_user)):
+    await asyncio.to_thread(SESSIONS.revoke, user.session_id)
+    response = JSONResponse({"message": "Logged out"})
+    response.delete_cookie(SESSION_COOKIE)
+    return response
+
+
+@auth_router.get("/me")
+async def me(user: SessionUser = Depends(require_user)):
+    return user.to_dict()
@@ -1,32 +1,124 @@
 # Writes emotion entries to PostgreSQL (cloeila_dev)
 
 # src/controllers/emotion_log_controller.py
-from fastapi import APIRouter, Request
+import json
+from datetime import datetime
+from fastapi import APIRouter, Request, HTTPException, Query
 from pydantic import BaseModel
 from database import get_connection
+from core.emotion_state import get_emotion_state
+from core.emotion_arc import EMOTION_ARCS, GRANULARITIES
+from core.trigger_worker import TRIGGER_WORKER
+from src.agent_perception.main import resolve_image_reference
+from src.utils.history_archive import read_history
+from src.utils.snapshot_cache import SnapshotCache, cache_key
 
 emotion_log = APIRouter()
 
+ARC_CACHE = SnapshotCache("emotion_arc")
+
 
 class EmotionEntry(BaseModel):
     user_id: int
     emotion: str
     context_note: str = None
-    microexpression_img: str = None
+    microexpression_img: str = None  # image digest (see /perception/images) or data:image URI
 
 
 @emotion_log.post("/log-emotion")
 def log_emotion(entry: EmotionEntry):
+    # Only the 64-char digest is stored; inline image data goes to the image store
+    try:
+        image_digest = resolve_image_reference(entry.microexpression_img)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     conn = get_connection()
     cur = conn.cursor()
 
     cur.execute("""
         INSERT INTO EmotionLog (user_id, emotion, context_note, microexpression_img)
         VALUES (%s, %s, %s, %s);
-    """, (entry.user_id, entry.emotion, entry.context_note, entry.microexpression_img))
+    """, (entry.user_id, entry.emotion, entry.context_note, image_digest))
 
     conn.commit()
     cur.close()
     conn.close()
 
-    return {"message": "Emotion logged successfully."}
+    # Fold the new entry into the decayed per-user accumulator (O(1))
+    get_emotion_state().record(entry.user_id, entry.emotion)
+
+    # Debounced background trigger evaluation; new triggers arrive via /events
+    TRIGGER_WORKER.submit(entry.user_id)
+
+    return {"message": "Emotion logged successfully.", "trigger_evaluation": "scheduled"}
+
+
+def _parse_time(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 timestamp.")
+
+
+@emotion_log.get("/history/{user_id}")
+def emotion_history(
+        user_id: int,
+        since: str = Query(None, description="ISO 8601, inclusive"),
+        until: str = Query(None, description="ISO 8601, exclusive"),
+        limit: int = Query(1000, ge=1, le=10000)):
+    """
+    A user's emotion log, oldest first, including rows moved to the Parquet archive.
+    """
+    since, until = _parse_time(since, "since"), _parse_time(until, "until")
+    conn = get_connection()
+    try:
+        frame = read_history(conn, "emotionlog", user_id=user_id, since=since, until=until)
+    finally:
+        conn.close()
+
+    truncated = len(frame) > limit
+    frame = frame.head(limit)
+    frame = frame.astype(object).where(frame.notna(), None)
+    entries = [{
+        "log_id": int(row.log_id),
+        "emotion": row.emotion,
+        "context_note": row.context_note,
+        "microexpression_img": row.microexpression_img,
+        "timestamp": row.timestamp.isoformat(),
+    } for row in frame.itertuples(index=False)]
+    return {"user_id": user_id, "entries": entries, "truncated": truncated}
+
+
+@emotion_log.get("/arc/{user_id}")
+def emotion_arc(
+        request: Request,
+        user_id: int,
+        since: str = Query(None, description="ISO 8601 date, inclusive"),
+        until: str = Query(None, description="ISO 8601 date, exclusive"),
+        granularity: str = Query("day", description="day | week | month")):
+    """
+    Per-user emotion and virtue counts over time, served from the daily rollups
+    (core/emotion_arc.py). The range is clamped to the user's first entry and today;
+    400 when it still spans more than ARC_MAX_DAYS. Cached until the rollups advance;
+    ETag / 304 supported.
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}.")
+    since, until = _parse_time(since, "since"), _parse_time(until, "until")
+    since = since.date() if since else None
+    until = until.date() if until else None
+
+    conn = get_connection()
+    try:
+        snapshot = ARC_CACHE.get_or_build(
+            cache_key(request), EMOTION_ARCS.version(conn),
+            lambda: (json.dumps(EMOTION_ARCS.arc(conn, user_id, since, until, granularity),
+                                separators=(",", ":")).encode("utf-8"), False))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        conn.close()
+    return ARC_CACHE.respond(request, snapshot)
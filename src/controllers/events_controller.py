@@ -0,0 +1,151 @@
+# ========================================================================================
+# File: events_controller.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Live push of symbolic triggers and firewall events (src/utils/event_bus.py) so the
+# emotion log and dashboard UIs no longer poll /trigger/trigger-feed and
+# /firewall-log/firewall-log.
+#
+# Routes:
+# - GET /events/stream → Server-Sent Events
+#     Query: topics (comma-separated: trigger, firewall; default both)
+#     Resume: standard `Last-Event-ID` header (sent automatically by EventSource) or
+#             ?last_event_id=
+# - WS  /events/ws     → same events as JSON text frames
+#     Query: topics, last_event_id
+#
+# Each message carries {"id", "topic", "data"}. A "reset" event means the requested
+# resume point is no longer available: re-read the paginated feed, then keep listening.
+# ========================================================================================
+
+import json
+from fastapi import APIRouter, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from src.utils.event_bus import EVENT_BUS, TOPICS
+
+# -----------------------------------------------------------------------------
+# Define router instance to be included in main.py
+# -----------------------------------------------------------------------------
+events_router = APIRouter()
+
+# Seconds between keep-alives on an idle connection (keeps proxies from closing it)
+HEARTBEAT_SECONDS = 15.0
+
+
+def _parse_topics(topics):
+    if not topics:
+        return set(TOPICS)
+    requested = {t.strip() for t in topics.split(",") if t.strip()}
+    unknown = requested - set(TOPICS)
+    if unknown:
+        raise ValueError(f"Unknown topics: {', '.join(sorted(unknown))}")
+    return requested
+
+
+def _message(event):
+    return {"id": event.event_id, "topic": event.topic, "data": event.data}
+
+
+def _sse(event_id, topic, data):
+    return f"id: {event_id}\nevent: {topic}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+# -----------------------------------------------------------------------------
+# Route: GET /stream
+# Description: Server-Sent Events feed of triggers / firewall events
+# -----------------------------------------------------------------------------
+@events_router.get("/stream")
+async def stream_events(
+        request: Request,
+        topics: str = Query(None, description="Comma-separated topics: trigger, firewall"),
+        last_event_id: str = Query(None, description="Resume after this event ID")):
+    """
+    Subscribe to live events over Server-Sent Events.
+
+    Returns:
+        - 200 OK: text/event-stream (ends if the client falls too far behind; reconnect
+          with Last-Event-ID to resume).
+        - 400 Bad Request: Unknown topic.
+    """
+    try:
+        wanted = _parse_topics(topics)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    subscriber, replay = EVENT_BUS.subscribe(wanted, resume_from)
+
+    async def event_source():
+        try:
+            yield b"retry: 2000\n\n"
+            if replay is None:
+                yield _sse(f"{EVENT_BUS.boot_id}-0", "reset", {"reason": "resume point unavailable"})
+            else:
+                for event in replay:
+                    yield _sse(event.event_id, event.topic, event.data)
+
+            while True:
+                batch = await subscriber.next_batch(HEARTBEAT_SECONDS)
+                if subscriber.dropped:
+                    EVENT_BUS.drop(subscriber, "sse")
+                    return
+                if not batch:
+                    if await request.is_disconnected():
+                        return
+                    yield b": keep-alive\n\n"
+                    continue
+                yield b"".join(_sse(e.event_id, e.topic, e.data) for e in batch)
+        finally:
+            EVENT_BUS.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# -----------------------------------------------------------------------------
+# Route: WS /ws
+# Description: WebSocket feed of triggers / firewall events
+# -----------------------------------------------------------------------------
+@events_router.websocket("/ws")
+async def websocket_events(websocket: WebSocket, topics: str = None, last_event_id: str = None):
+    """
+    Subscribe to live events over a WebSocket (JSON text frames).
+    Closes with code 1008 for an unknown topic and 1013 when the client falls behind.
+    """
+    try:
+        wanted = _parse_topics(topics)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+
+    await websocket.accept()
+    subscriber, replay = EVENT_BUS.subscribe(wanted, last_event_id)
+    try:
+        if replay is None:
+            await websocket.send_json({
+                "id": f"{EVENT_BUS.boot_id}-0",
+                "topic": "reset",
+                "data": {"reason": "resume point unavailable"},
+            })
+        else:
+            for event in replay:
+                await websocket.send_json(_message(event))
+
+        while True:
+            batch = await subscriber.next_batch(HEARTBEAT_SECONDS)
+            if subscriber.dropped:
+                EVENT_BUS.drop(subscriber, "websocket")
+                await websocket.close(code=1013, reason="Subscriber fell behind; resume with last_event_id")
+                return
+            if not batch:
+                await websocket.send_json({"topic": "heartbeat"})
+                continue
+            for event in batch:
+                await websocket.send_json(_message(event))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        EVENT_BUS.unsubscribe(subscriber)
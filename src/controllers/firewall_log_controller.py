@@ -10,63 +10,138 @@
 # visualization and analysis tool for symbolic defense patterns.
 #
 # Description:
-# Returns the contents of proxy_mind_log.json. If no file exists yet, it returns
-# an empty list. Used by devs or admins to review requests flagged by ProxyMind.
+# Queries the segmented firewall log (src/utils/firewall_store.py) with cursor-based
+# pagination and filters on time range, IP, path and threat flag. Only segments that
+# overlap the requested time range are read. Pages that later appends cannot change (a
+# full page with a next_cursor, or a time range that ended in the past) are kept in a
+# snapshot cache (src/utils/snapshot_cache.py) keyed by the query and the oldest retained
+# segment, so they are retired whenever retention deletes segments they may have been
+# read from. The tail page changes with every ProxyMind append and is rebuilt per
+# request. Every page carries an ETag and is answered with 304 when the client's copy is
+# current. Aggregate questions ("which IPs tripped the limiter in the last hour?") are
+# answered from ProxyMind's per-minute rollups (src/utils/firewall_rollup.py) without
+# touching the raw log.
 #
-# Route:
-# - GET /firewall-log → Returns a list of request logs with timestamps, IPs, and threat flags.
+# Routes:
+# - GET /firewall-log → {"log": [...], "next_cursor": "..." | null}
+#     Query: since, until (ISO 8601), ip, path, threat_detected, cursor, limit
+# - GET /stats → request/threat totals, top IPs, paths and offenders, per-minute series
+#     Query: window_minutes, top
 # ========================================================================================
 
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
-import os
 import json
+from datetime import datetime
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse
+from src.utils.firewall_store import FIREWALL_STORE, decode_cursor
+from src.utils.snapshot_cache import SnapshotCache, cache_key, settled
+from src.utils.firewall_rollup import FIREWALL_ROLLUP
 
 # -----------------------------------------------------------------------------
 # Define router instance to be included in main.py
 # -----------------------------------------------------------------------------
 firewall_log = APIRouter()
 
-# -----------------------------------------------------------------------------
-# Dynamically resolve the path to the firewall log file
-# -----------------------------------------------------------------------------
-LOG_PATH = os.path.abspath(
-    os.path.join(
-        os.path.dirname(__file__),
-        "..",
-        "logs",
-        "proxy_mind_log.json"))
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+PAGE_CACHE = SnapshotCache("firewall_log")
 
 # -----------------------------------------------------------------------------
 # Route: GET /firewall-log
-# Description: Returns contents of Cloelia's symbolic firewall memory log
+# Description: Returns a page of Cloelia's symbolic firewall memory log
 # -----------------------------------------------------------------------------
 
 
-@firewall_log.get("/firewall-log", response_class=JSONResponse)
-def get_firewall_log():
+def _render_page(events):
+    """
+    Serialize store query results as {"log": [...], "next_cursor": ...}.
+
+    Returns (body, next_cursor).
     """
-    Retrieve all symbolic firewall log entries.
+    entries = []
+    next_cursor = None
+    for kind, value in events:
+        if kind == "cursor":
+            next_cursor = value
+            break
+        entries.append(value)
+    body = json.dumps({"log": entries, "next_cursor": next_cursor}, separators=(",", ":"))
+    return body.encode("utf-8"), next_cursor
+
+
+@firewall_log.get("/firewall-log")
+def get_firewall_log(
+        request: Request,
+        since: str = Query(None, description="Only entries at/after this ISO timestamp"),
+        until: str = Query(None, description="Only entries at/before this ISO timestamp"),
+        ip: str = Query(None, description="Exact client IP"),
+        path: str = Query(None, description="Exact request path"),
+        threat_detected: bool = Query(None, description="Filter on the rate-limit flag"),
+        cursor: str = Query(None, description="next_cursor from a previous page"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    Retrieve a page of symbolic firewall log entries, oldest first.
 
     Returns:
-        - 200 OK: JSON response with a list of request logs under "log" key.
-        - 200 OK: Empty list if no log file exists yet.
-        - 500 Internal Server Error: On read/parse failure.
+        - 200 OK: JSON with "log" (list of entries) and "next_cursor"
+          (pass back as `cursor` for the next page; null when exhausted).
+        - 304 Not Modified: `If-None-Match` matches the current ETag.
+        - 400 Bad Request: Malformed timestamp or cursor.
+        - 500 Internal Server Error: On read failure.
     """
     try:
-        # If no log file exists yet, return empty list
-        if not os.path.exists(LOG_PATH):
-            return JSONResponse(content={"log": []}, status_code=200)
+        for value in (since, until):
+            if value:
+                datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        return JSONResponse(content={"error": f"Invalid query: {str(e)}"}, status_code=400)
 
-        # Load and return log file contents
-        with open(LOG_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    def build():
+        events = FIREWALL_STORE.query(
+            since=since, until=until, ip=ip, path=path, threat=threat_detected,
+            cursor=cursor, limit=limit)
+        body, next_cursor = _render_page(events)
+        # A full page or a past time range cannot change with later appends
+        return body, next_cursor is not None or settled(until)
 
-        return JSONResponse(content={"log": data}, status_code=200)
+    try:
+        key = cache_key(request) + (FIREWALL_STORE.oldest_segment(),)
+        snapshot = PAGE_CACHE.get_or_build(key, None, build, keep_mutable=False)
+        return PAGE_CACHE.respond(request, snapshot)
 
     except Exception as e:
-        # Return error if file read or JSON parsing fails
+        # Return error if the segment directory cannot be read
         return JSONResponse(
             content={"error": f"Unable to load firewall log: {str(e)}"},
             status_code=500
         )
+
+
+# -----------------------------------------------------------------------------
+# Route: GET /stats
+# Description: Aggregated firewall activity over a recent window
+# -----------------------------------------------------------------------------
+@firewall_log.get("/stats")
+def get_firewall_stats(
+        window_minutes: int = Query(60, ge=1, le=FIREWALL_ROLLUP.minutes),
+        top: int = Query(10, ge=1, le=100)):
+    """
+    Summarize the last `window_minutes` of firewall traffic across all workers.
+
+    Counts in top_ips / top_paths / top_offenders come from heavy-hitter sketches and may
+    over-estimate by at most their `max_error`.
+
+    Returns:
+        - 200 OK: {"requests", "threats", "top_ips", "top_paths", "top_offenders", "per_minute", ...}
+        - 500 Internal Server Error: On rollup read failure.
+    """
+    try:
+        return FIREWALL_ROLLUP.stats(window_minutes=window_minutes, top=top)
+    except Exception as e:
+        return JSONResponse(
+            content={"error": f"Unable to load firewall stats: {str(e)}"},
+            status_code=500
+        )
@@ -7,29 +7,97 @@
 # Purpose:
 #   Provides FastAPI-based GPT interaction endpoints:
 #     1. Accepts symbolic message via POST JSON.
-#     2. Calls Node.js GPT bridge for a symbolic response.
+#     2. Calls Node.js GPT bridge for a symbolic response, injecting the knowledge_base
+#        fact most relevant to the message (src/utils/fact_index.py), or a random one
+#        (src/utils/fact_sampler.py) when nothing matches or FACT_RETRIEVAL=random.
 #     3. Generates narrated audio via ElevenLabs.
 #     4. Returns both GPT response and audio URL in JSON format.
 #
+#   Bridge and ElevenLabs calls pass through per-upstream admission control
+#   (src/utils/admission.py). Callers pick a priority lane with the
+#   X-Cloelia-Priority header (interactive | batch | prewarm; default interactive).
+#   A bridge call that cannot be admitted in time gets 503 with Retry-After; when
+#   only ElevenLabs is saturated, the text reply is returned with audio_url null.
+#
 # Dependencies:
 #   - FastAPI for API Routing
 #   - Node.js (gpt_bridge.mjs) for GPT integration
-#   - ElevenLabs API via generate_audio()
+#   - ElevenLabs API via generate_audio() (optional: skipped when ELEVENLABS_KEY is unset)
 #   - Audio files saved under static/audio/responses/
 # =============================================================================
 
 import subprocess
+import shlex
 import json
 import uuid
 import os
+import time
+import asyncio
 import traceback
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import JSONResponse, FileResponse
-from src.utils.elevenlabs_client import generate_audio
+from src.utils.config import get_setting, missing_settings
+from src.utils import elevenlabs_client
+from src.utils.fact_sampler import FACT_SAMPLER
+from src.utils.fact_index import FACT_INDEX
+from src.utils.admission import (
+    AdmissionRejected, OPENAI_SCHEDULER, ELEVENLABS_SCHEDULER, LANES, estimate_tokens)
+from src.utils.metrics import DEPENDENCY_SECONDS
+from src.utils.tracing import start_trace, span, finish_trace
 
 # Initialize FastAPI Router
 gpt_router = APIRouter()
 
+# Default bridge invocation; GPT_BRIDGE_CMD overrides it (e.g. a local stand-in)
+DEFAULT_BRIDGE_CMD = "node node_clients/gpt_bridge.mjs"
+
+# Reply allowance added to the prompt estimate when budgeting OpenAI tokens
+REPLY_TOKENS = 300
+
+
+def bridge_command(user_msg: str) -> list:
+    """
+    Build the GPT bridge argv for a user message.
+    """
+    return shlex.split(get_setting("GPT_BRIDGE_CMD", DEFAULT_BRIDGE_CMD)) + [user_msg]
+
+
+def choose_fact(user_msg: str) -> str:
+    """
+    Pick the prompt fact: best TF-IDF match for the message, else a random fact.
+    """
+    if get_setting("FACT_RETRIEVAL", "relevance") == "relevance":
+        hits = FACT_INDEX.top_k(user_msg, k=1)
+        if hits:
+            return hits[0][0]
+    return FACT_SAMPLER.sample()
+
+
+def request_lane(request: Request) -> str:
+    """
+    Admission lane from the X-Cloelia-Priority header (unknown values → interactive).
+    """
+    lane = request.headers.get("x-cloelia-priority", "interactive").strip().lower()
+    return lane if lane in LANES else "interactive"
+
+
+def admission_error(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"{e.upstream} is at capacity ({e.reason}); retry later.",
+        headers={"Retry-After": str(e.retry_after)})
+
+
+def bridge_env(fact: str) -> dict:
+    """
+    Environment for the GPT bridge: CLOELIA_FACT carries the prompt fact so the bridge
+    skips its own knowledge_base query (an empty value means "inject nothing").
+    """
+    env = dict(os.environ)
+    env["CLOELIA_FACT"] = fact
+    return env
+
+
 @gpt_router.get("/audio/{filename}")
 async def serve_audio(filename: str):
     """
@@ -60,6 +128,9 @@ async def generate_response(request: Request):
         3. Generate narration audio via ElevenLabs.
         4. Return GPT response text and audio URL.
 
+    Each stage is recorded as a span and returned in the `Server-Timing` header
+    (plus `X-Trace-Id` for lookup via /admin/traces).
+
     Returns:
         JSONResponse: {
             "response": {
@@ -68,10 +139,21 @@ async def generate_response(request: Request):
             }
         }
     """
+    trace = start_trace("generate_response")
+    response = None
+    try:
+        response = await _generate_response(request)
+        return response
+    finally:
+        finish_trace(trace, response, status="ok" if response is not None else "error")
+
+
+async def _generate_response(request: Request):
     # 1️⃣ Validate Input Payload
     try:
-        payload = await request.json()
-        user_msg = payload.get("message", "").strip()
+        with span("payload_parse"):
+            payload = await request.json()
+            user_msg = payload.get("message", "").strip()
         print(f"📨 Incoming Message: {user_msg}")
 
         if not user_msg:
@@ -81,19 +163,47 @@ async def generate_response(request: Request):
         raise HTTPException(status_code=400, detail=f"Invalid JSON payload: {str(e)}")
 
     # 2️⃣ Call Node.js GPT Bridge for AI Response
+    lane = request_lane(request)
+    missing = missing_settings("gpt")
+    if missing:
+        raise HTTPException(
+            status_code=503,
+            detail=f"GPT features disabled: missing {', '.join(missing)}"
+        )
+
     try:
         print("🚀 Launching Node.js GPT Bridge...")
         root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
 
-        proc = subprocess.run(
-            ["node", "node_clients/gpt_bridge.mjs", user_msg],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True,
-            encoding="utf-8",
-            cwd=root_dir
-        )
+        with span("fact_select"):
+            fact = choose_fact(user_msg)
+
+        with span("admission_wait"):
+            await OPENAI_SCHEDULER.acquire(
+                estimate_tokens(user_msg, fact, reply_tokens=REPLY_TOKENS), lane)
+
+        bridge_start = time.perf_counter()
+        try:
+            with span("bridge_call"):
+                proc = await asyncio.to_thread(
+                    subprocess.run,
+                    bridge_command(user_msg),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    check=True,
+                    encoding="utf-8",
+                    cwd=root_dir,
+                    env=bridge_env(fact)
+                )
+        except Exception:
+            DEPENDENCY_SECONDS.observe(
+                time.perf_counter() - bridge_start, dependency="gpt_bridge", outcome="error")
+            raise
+        finally:
+            OPENAI_SCHEDULER.release()
+        DEPENDENCY_SECONDS.observe(
+            time.perf_counter() - bridge_start, dependency="gpt_bridge", outcome="ok")
 
         stdout_clean = proc.stdout.strip()
         print(f"📄 Raw Subprocess Output: {stdout_clean}")
@@ -102,14 +212,19 @@ async def generate_response(request: Request):
         if not stdout_clean.startswith("{") or '"content"' not in stdout_clean:
             raise HTTPException(status_code=500, detail="Invalid JSON output from GPT bridge.")
 
-        reply = json.loads(stdout_clean)
-        gpt_text = reply.get("content", "").strip()
+        with span("json_parse"):
+            reply = json.loads(stdout_clean)
+            gpt_text = reply.get("content", "").strip()
 
         if not gpt_text:
             raise ValueError("GPT response contained empty content.")
 
         print(f"🧠 GPT Text: {gpt_text}")
 
+    except AdmissionRejected as e:
+        print(f"⏳ {e}")
+        raise admission_error(e)
+
     except subprocess.CalledProcessError as e:
         stderr_output = e.stderr.strip() if e.stderr else "No stderr output."
         print(f"❌ Node.js Error: {stderr_output}")
@@ -128,18 +243,39 @@ async def generate_response(request: Request):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Unhandled GPT bridge error: {str(e)}")
 
-    # 3️⃣ Generate ElevenLabs Audio
-    audio_file = f"reply_{uuid.uuid4().hex[:8]}.mp3"
-    try:
-        print(f"🎤 Generating audio for: {audio_file}")
-        generate_audio(gpt_text, audio_file)
-        print(f"✅ Audio generated successfully: {audio_file}")
-    except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Audio generation failed: {str(e)}")
+    # 3️⃣ Generate ElevenLabs Audio (text-only reply when TTS is not configured or saturated;
+    #    the GPT reply is already paid for, so it is never thrown away)
+    audio_url = None
+    tts_admitted = False
+    if elevenlabs_client.is_configured():
+        try:
+            with span("tts_admission_wait"):
+                await ELEVENLABS_SCHEDULER.acquire(len(gpt_text), lane)
+            tts_admitted = True
+        except AdmissionRejected as e:
+            print(f"⏳ {e}; skipping audio synthesis.")
+    else:
+        print("🔇 ELEVENLABS_KEY not set; skipping audio synthesis.")
+
+    if tts_admitted:
+        audio_file = f"reply_{uuid.uuid4().hex[:8]}.mp3"
+        tts_start = time.perf_counter()
+        try:
+            print(f"🎤 Generating audio for: {audio_file}")
+            await asyncio.to_thread(elevenlabs_client.generate_audio, gpt_text, audio_file)
+            print(f"✅ Audio generated successfully: {audio_file}")
+        except Exception as e:
+            DEPENDENCY_SECONDS.observe(
+                time.perf_counter() - tts_start, dependency="elevenlabs", outcome="error")
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=f"Audio generation failed: {str(e)}")
+        finally:
+            ELEVENLABS_SCHEDULER.release()
+        DEPENDENCY_SECONDS.observe(
+            time.perf_counter() - tts_start, dependency="elevenlabs", outcome="ok")
+        audio_url = f"/gpt/audio/{audio_file}"
 
     # 4️⃣ Final Response Construction
-    audio_url = f"/gpt/audio/{audio_file}"
     print(f"📦 Final Response: text length={len(gpt_text)}, audio_url={audio_url}")
 
     return JSONResponse(content={
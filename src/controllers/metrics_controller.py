@@ -0,0 +1,30 @@
+# ========================================================================================
+# File: metrics_controller.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Exposes Cloelia's instrumentation (src/utils/metrics.py) in the Prometheus text
+# exposition format, merged across all worker processes.
+#
+# Route:
+# - GET /metrics → Prometheus text format (version 0.0.4)
+# ========================================================================================
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from src.utils.metrics import REGISTRY
+
+# -----------------------------------------------------------------------------
+# Define router instance to be included in main.py
+# -----------------------------------------------------------------------------
+metrics_router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Return all counters and histograms merged across workers.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -5,58 +5,84 @@
 # Date: 2025-05-08
 #
 # Purpose:
-# This controller provides an endpoint to return Cloelia's symbolic memory log
-# from symbolic_log.json. It allows frontend UIs or admins to reflect on past
-# perception triggers and view emotional arcs over time.
+# This controller provides an endpoint to return Cloelia's symbolic memory log.
+# It allows frontend UIs or admins to reflect on past perception triggers and view
+# emotional arcs over time.
+#
+# Filtering happens server-side against the trigger store's secondary indexes
+# (src/utils/trigger_store.py), one cursor-paginated page at a time. Serialized pages
+# are kept in a snapshot cache (src/utils/snapshot_cache.py) until the log changes,
+# carry an ETag, and are answered with 304 when the client's copy is current.
 #
 # Route:
-# - GET /trigger-feed → Returns full JSON memory stream of symbolic triggers
+# - GET /trigger-feed → {"log": [...], "next_cursor": "..." | null}
+#     Query: user_id, emotion, virtue, since, until (ISO 8601), cursor, limit
 # ========================================================================================
 
-import os
 import json
-from fastapi import APIRouter
+from datetime import datetime
+from fastapi import APIRouter, Query, Request
 from fastapi.responses import JSONResponse
-
-# -----------------------------------------------------------
-# Path to symbolic memory log (relative to project root)
-# -----------------------------------------------------------
-LOG_FILE = os.path.abspath(
-    os.path.join(
-        os.path.dirname(__file__),
-        "..",
-        "logs",
-        "symbolic_log.json"))
+from src.utils.trigger_store import TRIGGER_STORE
+from src.utils.snapshot_cache import SnapshotCache, cache_key, settled
 
 # -----------------------------------------------------------
 # FastAPI router initialization
 # -----------------------------------------------------------
 trigger_feed = APIRouter()
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+PAGE_CACHE = SnapshotCache("trigger_feed")
+
 # -----------------------------------------------------------
 # Route: GET /trigger-feed
-# Description: Returns Cloelia’s symbolic memory log as JSON
+# Description: Returns a page of Cloelia’s symbolic memory log as JSON
 # -----------------------------------------------------------
 
 
 @trigger_feed.get("/trigger-feed", response_class=JSONResponse)
-def get_trigger_feed():
+def get_trigger_feed(
+        request: Request,
+        user_id: str = Query(None, description="Only triggers for this user"),
+        emotion: str = Query(None, description="Only triggers for this emotion"),
+        virtue: str = Query(None, description="Only triggers suggesting this virtue"),
+        since: str = Query(None, description="Only triggers at/after this ISO timestamp"),
+        until: str = Query(None, description="Only triggers at/before this ISO timestamp"),
+        cursor: str = Query(None, description="next_cursor from a previous page"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
     """
-    Retrieve symbolic insights from Cloelia's memory log (symbolic_log.json).
+    Retrieve a page of symbolic insights from Cloelia's memory log, oldest first.
 
     Returns:
-        - 200: JSON with key `"log"` and list of symbolic entries.
-        - 200 (empty): If no log file is found, returns empty list under `"log"`.
-        - 500: On JSON decoding or file access error.
+        - 200: JSON with key `"log"` (list of symbolic entries) and `"next_cursor"`
+          (pass back as `cursor` for the next page; null when exhausted).
+        - 304: `If-None-Match` matches the current ETag.
+        - 200 (empty): If nothing has been logged yet, returns empty list under `"log"`.
+        - 400: Malformed timestamp or cursor.
+        - 500: On index or file access error.
     """
     try:
-        if not os.path.exists(LOG_FILE):
-            return {"log": []}
+        for value in (since, until):
+            if value:
+                datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if cursor and not cursor.isdigit():
+            raise ValueError("Invalid cursor")
+    except ValueError as e:
+        return JSONResponse(content={"error": f"Invalid query: {str(e)}"}, status_code=400)
 
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    def build():
+        entries, next_cursor = TRIGGER_STORE.query(
+            user_id=user_id, emotion=emotion, virtue=virtue, since=since, until=until,
+            cursor=cursor, limit=limit)
+        body = json.dumps({"log": entries, "next_cursor": next_cursor}, separators=(",", ":"))
+        # A full page or a past time range cannot change with later appends
+        return body.encode("utf-8"), next_cursor is not None or settled(until)
 
-        return {"log": data}
+    try:
+        snapshot = PAGE_CACHE.get_or_build(cache_key(request), TRIGGER_STORE.version(), build)
+        return PAGE_CACHE.respond(request, snapshot)
 
     except Exception as e:
         return JSONResponse(
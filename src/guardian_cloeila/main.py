@@ -1 +1,275 @@
-print("Agent guardian_cloeila is running!")
+# ========================================================================================
+# File: main.py
+# Project: CloeliaAI_AgentSystem — guardian_cloeila
+#
+# Purpose:
+# Local sidecar that takes firewall event processing off the API workers. ProxyMind sends
+# each request as a compact datagram, or a batch of them while it has a backlog
+# (src/utils/guardian_link.py); the guardian owns
+# everything that used to run in the request path:
+# - persistence to the segmented firewall log (batched: one lock + one write per burst)
+# - per-minute rollups, persisted as writer "guardian" and merged by /firewall-log/stats
+# - threat scoring: a per-IP score that decays with GUARDIAN_SCORE_HALF_LIFE seconds
+#   (+1 per request, +GUARDIAN_THREAT_WEIGHT per rate-limited one). IPs at or above
+#   GUARDIAN_FLAG_SCORE are written to <log dir>/guardian_flagged.txt in blocklist format,
+#   so the deception net (src/middleware/deception.py) tarpits them on its next reload;
+#   they are released once their score decays below half the threshold.
+#
+# The API never depends on the sidecar: while it is down, ProxyMind writes events
+# inline; while it is behind, the API's sender thread queues and batches them.
+#
+# Run (from the project root, sharing CLOELIA_LOG_DIR with the API):
+#   python -m src.guardian_cloeila.main
+# ========================================================================================
+
+import os
+import sys
+import json
+import math
+import time
+import signal
+import socket
+import threading
+from collections import deque
+from datetime import datetime
+
+# Allow `python src/guardian_cloeila/main.py` as well as `python -m`
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.config import load_env, get_setting, log_path  # noqa: E402
+from src.utils.firewall_store import FirewallLogStore  # noqa: E402
+from src.utils.firewall_rollup import FirewallRollup  # noqa: E402
+from src.utils.guardian_link import (  # noqa: E402
+    MAX_DATAGRAM_BYTES, decode_datagram, decode_event, socket_path
+)
+
+ROLLUP_WRITER = "guardian"
+MAX_BATCH = 1024
+RECEIVE_BUFFER_BYTES = 4 * 1024 * 1024
+
+
+class ThreatScorer:
+    """
+    Exponentially decaying per-IP threat score with hysteresis flagging.
+    """
+
+    def __init__(self, half_life=None, threat_weight=None, flag_score=None, max_tracked=None):
+        half_life = float(half_life or get_setting("GUARDIAN_SCORE_HALF_LIFE", "600"))
+        self.decay = math.log(2) / half_life
+        self.threat_weight = float(threat_weight or get_setting("GUARDIAN_THREAT_WEIGHT", "20"))
+        self.flag_score = float(flag_score or get_setting("GUARDIAN_FLAG_SCORE", "200"))
+        self.max_tracked = int(max_tracked or get_setting("GUARDIAN_MAX_TRACKED", "100000"))
+        self._scores = {}  # { ip: [score, updated_at] }
+        self.flagged = set()
+        self.changed = False
+
+    def _current(self, ip, now):
+        cell = self._scores.get(ip)
+        if cell is None:
+            return 0.0
+        return cell[0] * math.exp(-self.decay * (now - cell[1]))
+
+    def observe(self, ip, threat, now):
+        score = self._current(ip, now) + 1.0 + (self.threat_weight if threat else 0.0)
+        self._scores[ip] = [score, now]
+        if score >= self.flag_score and ip not in self.flagged:
+            self.flagged.add(ip)
+            self.changed = True
+        return score
+
+    def sweep(self, now):
+        """
+        Release decayed IPs and bound memory by forgetting the lowest scores.
+        """
+        for ip in [ip for ip in self.flagged if self._current(ip, now) < self.flag_score / 2]:
+            self.flagged.discard(ip)
+            self.changed = True
+        if len(self._scores) > self.max_tracked:
+            ranked = sorted(self._scores, key=lambda ip: self._current(ip, now))
+            for ip in ranked[:len(self._scores) - self.max_tracked]:
+                if ip not in self.flagged:
+                    del self._scores[ip]
+
+    def top(self, n, now):
+        ranked = sorted(((self._current(ip, now), ip) for ip in self._scores), reverse=True)
+        return [{"ip": ip, "score": round(score, 2), "flagged": ip in self.flagged}
+                for score, ip in ranked[:n]]
+
+
+class Guardian:
+    """
+    Datagram receiver feeding the firewall store, rollups and threat scorer.
+    """
+
+    def __init__(self, path=None, store=None, rollup=None, scorer=None, persist_seconds=10.0):
+        self.path = path or socket_path()
+        self.store = store or FirewallLogStore()
+        self.rollup = rollup or FirewallRollup(writer=ROLLUP_WRITER)
+        self.scorer = scorer or ThreatScorer()
+        self.persist_seconds = persist_seconds
+        self.scores_path = log_path("threat_scores.json")
+        self.flagged_path = log_path("guardian_flagged.txt")
+        self.received = 0
+        self.malformed = 0
+        self.overflowed = 0
+        # The kernel queues only net.unix.max_dgram_qlen datagrams per socket, so a
+        # receiver thread moves them into this queue and processing runs in batches
+        self.max_pending = int(get_setting("GUARDIAN_MAX_PENDING", "100000"))
+        self._pending = deque()
+        self._ready = threading.Event()
+        self._sock = None
+        self._running = False
+
+    def bind(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)  # stale socket from a previous run
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_BYTES)
+        except OSError:
+            pass
+        sock.bind(self.path)
+        sock.settimeout(1.0)
+        self._sock = sock
+        return sock
+
+    def _receive_loop(self):
+        """
+        Receiver thread: empty the socket as fast as possible into the pending queue.
+        """
+        while self._running:
+            try:
+                record = self._sock.recv(MAX_DATAGRAM_BYTES)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self._running:
+                    raise
+                return
+            if len(self._pending) >= self.max_pending:
+                self.overflowed += 1
+                continue
+            self._pending.append(record)
+            self._ready.set()
+
+    def _next_batch(self):
+        """
+        Up to MAX_BATCH pending datagrams, waiting at most a second for the first.
+        """
+        if not self._pending:
+            self._ready.wait(1.0)
+            self._ready.clear()
+        pending = self._pending
+        return [pending.popleft() for _ in range(min(len(pending), MAX_BATCH))]
+
+    def process(self, datagrams):
+        entries = []
+        for record in self._records(datagrams):
+            try:
+                ip, path, threat, timestamp = decode_event(record)
+            except ValueError:
+                self.malformed += 1
+                continue
+            entry = {
+                "timestamp": datetime.utcfromtimestamp(timestamp).isoformat(),
+                "ip": ip,
+                "path": path,
+                "threat_detected": threat
+            }
+            entries.append(entry)
+            self.rollup.record(ip, path, threat, entry["timestamp"])
+            self.scorer.observe(ip, threat, timestamp)
+        if entries:
+            self.store.append_many(entries)
+        self.received += len(entries)
+        return len(entries)
+
+    def _records(self, datagrams):
+        for datagram in datagrams:
+            try:
+                yield from decode_datagram(datagram)
+            except ValueError:
+                self.malformed += 1
+
+    def persist(self):
+        now = time.time()
+        self.rollup.persist()
+        self.scorer.sweep(now)
+        _write_atomic(self.scores_path, json.dumps({
+            "saved_at": datetime.utcnow().isoformat(),
+            "received": self.received,
+            "malformed": self.malformed,
+            "overflowed": self.overflowed,
+            "top": self.scorer.top(100, now),
+        }, indent=2))
+        if self.scorer.changed:
+            lines = ["# Written by guardian_cloeila: IPs over the threat score threshold"]
+            lines += [f"{ip} tarpit" for ip in sorted(self.scorer.flagged)]
+            _write_atomic(self.flagged_path, "\n".join(lines) + "\n")
+            self.scorer.changed = False
+
+    def run(self):
+        self.bind()
+        try:
+            self.rollup.load()
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not restore guardian rollups: {e}")
+        print(f"🛡️ guardian_cloeila listening on {self.path}")
+        self._running = True
+        # Hand the GIL to the receiver often: the kernel queue holds only a few datagrams
+        sys.setswitchinterval(0.0005)
+        receiver = threading.Thread(target=self._receive_loop, name="guardian-recv", daemon=True)
+        receiver.start()
+        next_persist = time.monotonic() + self.persist_seconds
+        try:
+            while self._running or self._pending:
+                records = self._next_batch()
+                if records:
+                    try:
+                        self.process(records)
+                    except OSError as e:
+                        print(f"⚠️ Firewall batch not persisted: {e}")
+                if time.monotonic() >= next_persist:
+                    self._persist_safely()
+                    next_persist = time.monotonic() + self.persist_seconds
+        finally:
+            self._running = False
+            receiver.join(timeout=2.0)
+            self._persist_safely()
+            self._sock.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def _persist_safely(self):
+        try:
+            self.persist()
+        except OSError as e:
+            print(f"⚠️ Guardian persist failed: {e}")
+
+    def stop(self, *_):
+        self._running = False
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def main():
+    load_env()
+    guardian = Guardian()
+    signal.signal(signal.SIGTERM, guardian.stop)
+    signal.signal(signal.SIGINT, guardian.stop)
+    guardian.run()
+    print(f"🛡️ guardian_cloeila stopped after {guardian.received} events.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# ========================================================================================
+# File: deception.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Pre-routing gate backed by the deception net blocklist (src/agent_deception_net/main.py).
+# Runs as the outermost pure ASGI middleware, so a listed client costs one radix-trie
+# lookup and never reaches ProxyMind's bookkeeping, logging or the routes:
+# - block  → 403 with a tiny fixed body
+# - decoy  → a canned fake admin page (prebuilt bytes, nothing rendered)
+# - tarpit → 200 whose body is trickled one byte every DECEPTION_TARPIT_INTERVAL seconds
+#            for up to DECEPTION_TARPIT_SECONDS. A held connection is a single sleeping
+#            coroutine; at most DECEPTION_TARPIT_MAX are held, extra ones are blocked.
+# WebSocket connections from listed networks are closed (1008) before acceptance.
+#
+# Middleware:
+# - Integrate with FastAPI in `main.py` via `add_middleware(DeceptionMiddleware)` (last,
+#   so it is outermost)
+# ========================================================================================
+
+import asyncio
+from src.utils.config import get_setting, log_path
+from src.utils.metrics import DECEPTION_DECISIONS, DECEPTION_TARPIT_HELD
+from src.agent_deception_net.main import Blocklist, DEFAULT_BLOCKLIST
+
+BLOCKLIST = Blocklist(
+    get_setting("DECEPTION_BLOCKLIST", f"{DEFAULT_BLOCKLIST},{log_path('guardian_flagged.txt')}"),
+    get_setting("DECEPTION_RELOAD_SECONDS", "2"))
+
+_BLOCK_BODY = b"Forbidden"
+
+_DECOY_BODY = (
+    b"<!doctype html><html><head><title>Cloelia Console</title></head><body>"
+    b"<h1>Cloelia Admin Console</h1><form method=\"post\" action=\"/console/login\">"
+    b"<input name=\"user\"><input name=\"password\" type=\"password\">"
+    b"<button>Sign in</button></form></body></html>")
+
+
+class DeceptionMiddleware:
+    """
+    Classifies the client address before anything else and diverts listed networks.
+    """
+
+    def __init__(self, app, blocklist=None):
+        self.app = app
+        self.blocklist = blocklist or BLOCKLIST
+        self.tarpit_interval = float(get_setting("DECEPTION_TARPIT_INTERVAL", "5"))
+        self.tarpit_seconds = float(get_setting("DECEPTION_TARPIT_SECONDS", "60"))
+        self.tarpit_max = int(get_setting("DECEPTION_TARPIT_MAX", "500"))
+        self.held = 0
+
+    async def __call__(self, scope, receive, send):
+        client = scope.get("client")
+        action = None
+        if scope["type"] in ("http", "websocket") and client:
+            action = self.blocklist.lookup(client[0])
+        if action is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["type"] == "websocket":
+            DECEPTION_DECISIONS.inc(action=action)
+            await send({"type": "websocket.close", "code": 1008})
+            return
+
+        if action == "tarpit" and self.held < self.tarpit_max:
+            DECEPTION_DECISIONS.inc(action="tarpit")
+            await self._tarpit(receive, send)
+        elif action == "decoy":
+            DECEPTION_DECISIONS.inc(action="decoy")
+            await self._respond(send, 200, b"text/html; charset=utf-8", _DECOY_BODY)
+        else:
+            DECEPTION_DECISIONS.inc(action="block")
+            await self._respond(send, 403, b"text/plain", _BLOCK_BODY)
+
+    @staticmethod
+    async def _respond(send, status, content_type, body):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _tarpit(self, receive, send):
+        """
+        Hold the connection open, dribbling one byte per interval until the client
+        gives up or the time limit passes.
+        """
+        self.held += 1
+        DECEPTION_TARPIT_HELD.set(self.held)
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/html; charset=utf-8")],
+            })
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.tarpit_seconds
+            while loop.time() < deadline:
+                try:
+                    message = await asyncio.wait_for(receive(), self.tarpit_interval)
+                except asyncio.TimeoutError:
+                    await send({"type": "http.response.body", "body": b" ", "more_body": True})
+                    continue
+                if message["type"] == "http.disconnect":
+                    return
+            await send({"type": "http.response.body", "body": b""})
+        except OSError:
+            pass  # client went away mid-write
+        finally:
+            self.held -= 1
+            DECEPTION_TARPIT_HELD.set(self.held)
@@ -8,7 +8,12 @@
 # Middleware firewall for Cloelia. This layer intercepts all incoming requests to:
 # - Track symbolic "heartbeat" patterns per IP
 # - Detect rapid/excessive requests symbolically (rate limiting)
-# - Log all activity to proxy_mind_log.json for reflection, training, or retaliation
+# - Log all activity to the segmented firewall log (src/utils/firewall_store.py) for
+#   reflection, training, or retaliation
+# - Keep per-minute traffic rollups (src/utils/firewall_rollup.py) for quick stats
+#   (both handed to the guardian_cloeila sidecar when it runs: src/utils/guardian_link.py)
+# - Shed load beyond an adaptive global concurrency limit per route class
+#   (src/utils/load_shedder.py) with fast 503 responses, keeping tail latency bounded
 #
 # Summary:
 # This module lays the foundation for a symbolic cybersecurity layer, inspired by
@@ -18,29 +23,53 @@
 # - Integrate this with FastAPI in `main.py` via `add_middleware(ProxyMindMiddleware)`
 # ========================================================================================
 
-import os
-import json
 import time
 from datetime import datetime
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
+from src.utils.config import get_setting, log_path
+from src.utils.firewall_store import FIREWALL_STORE
+from src.utils.firewall_rollup import FIREWALL_ROLLUP
+from src.utils.event_bus import publish
+from src.utils.guardian_link import GUARDIAN_LINK
+from src.utils.load_shedder import LOAD_SHEDDER
+from src.utils.metrics import PROXYMIND_DECISIONS
 
 # ---------------------------------------------------------------------------
-# Define path to log file: stores symbolic firewall detections
+# Legacy single-file log (imported once into the segmented store at startup)
 # ---------------------------------------------------------------------------
-FIREWALL_LOG = os.path.abspath(
-    os.path.join(
-        os.path.dirname(__file__),
-        "..",
-        "logs",
-        "proxy_mind_log.json"))
+FIREWALL_LOG = log_path("proxy_mind_log.json")
 
 # ---------------------------------------------------------------------------
 # Internal rate-limiting tracker per IP
 # ---------------------------------------------------------------------------
 REQUEST_TIMES = {}  # { ip_address: [timestamps] }
 
+# Requests per IP per 60s window before a request is flagged (default 10)
+MAX_REQUESTS_PER_MINUTE = int(get_setting("PROXYMIND_MAX_REQUESTS_PER_MIN", "10"))
+
+
+def _write_inline(entry):
+    FIREWALL_STORE.append(entry)
+    FIREWALL_ROLLUP.record(entry["ip"], entry["path"], entry["threat_detected"], entry["timestamp"])
+
+
+def _write_backlog_inline(events):
+    """
+    Events still queued for guardian_cloeila when it went away: persist them here.
+    """
+    for ip, path, threat, timestamp in events:
+        _write_inline({
+            "timestamp": datetime.utcfromtimestamp(timestamp).isoformat(),
+            "ip": ip,
+            "path": path,
+            "threat_detected": threat
+        })
+
+
+GUARDIAN_LINK.fallback = _write_backlog_inline
+
 
 class ProxyMindMiddleware(BaseHTTPMiddleware):
     """
@@ -62,50 +91,65 @@ class ProxyMindMiddleware(BaseHTTPMiddleware):
         # Remove timestamps older than 60 seconds
         REQUEST_TIMES[ip] = [t for t in REQUEST_TIMES[ip] if now - t < 60]
 
-        # >10 requests/min is suspicious
-        too_frequent = len(REQUEST_TIMES[ip]) > 10
+        # >10 requests/min (by default) is suspicious
+        too_frequent = len(REQUEST_TIMES[ip]) > MAX_REQUESTS_PER_MINUTE
 
         # Log every interaction (whether threat or not)
         self.log_event(ip, path, too_frequent)
 
         # If too many requests, respond symbolically (HTTP 429)
         if too_frequent:
+            PROXYMIND_DECISIONS.inc(decision="rate_limited")
             return JSONResponse(
                 content={
                     "error": "Cloelia has sensed an unnatural rhythm. Delay your inquiry."},
                 status_code=429)
 
+        # Over the adaptive concurrency limit: shed now rather than queue (HTTP 503)
+        limiter = LOAD_SHEDDER.limiter_for(request.method, path)
+        if limiter is not None and not limiter.try_acquire():
+            PROXYMIND_DECISIONS.inc(decision="shed")
+            return JSONResponse(
+                content={"error": "Cloelia is at capacity. Return in a moment."},
+                status_code=503,
+                headers={"Retry-After": str(limiter.retry_after())})
+        PROXYMIND_DECISIONS.inc(decision="allowed")
+        if limiter is None:
+            return await call_next(request)
+
         # Continue processing request
-        response = await call_next(request)
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        except BaseException:
+            limiter.release()
+            raise
+        limiter.release(time.perf_counter() - start)
         return response
 
     def log_event(self, ip: str, path: str, threat: bool):
         """
         Logs every intercepted request to symbolic firewall log.
 
+        Sends the event to the guardian_cloeila sidecar (one non-blocking datagram, or
+        the link's backlog while the sidecar is behind). When the sidecar is not
+        running, appends one line to the current firewall segment and folds the event
+        into the per-minute rollups behind /firewall-log/stats inline.
+        Either way the event is pushed to live /events subscribers.
+
         Args:
             ip (str): Requestor IP address
             path (str): Endpoint path
             threat (bool): Whether this request was flagged as excessive
         """
-        os.makedirs(os.path.dirname(FIREWALL_LOG), exist_ok=True)
-
-        # Load or create log
-        if os.path.exists(FIREWALL_LOG):
-            with open(FIREWALL_LOG, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        else:
-            data = []
-
+        now = time.time()
         entry = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.utcfromtimestamp(now).isoformat(),
             "ip": ip,
             "path": path,
             "threat_detected": threat
         }
 
-        data.append(entry)
-
-        # Save updated log
-        with open(FIREWALL_LOG, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
+        if not GUARDIAN_LINK.send(ip, path, threat, now):
+            _write_inline(entry)
+        publish("firewall", entry)
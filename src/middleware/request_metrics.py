@@ -0,0 +1,66 @@
+# ========================================================================================
+# File: request_metrics.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Pure ASGI middleware that records a request counter and latency histogram per route
+# template (e.g. /gpt/audio/{filename}, never the raw path, to keep label cardinality
+# bounded). The template is the matched route's own path format, which the router
+# stores with scope["route"] (never rebuilt from the path parameter values). Unmatched
+# paths (404s, scanners) share the "unmatched" label.
+# Implemented without BaseHTTPMiddleware so it adds no extra task or response buffering
+# per request.
+#
+# Middleware:
+# - Integrate with FastAPI in `main.py` via `add_middleware(RequestMetricsMiddleware)`
+# ========================================================================================
+
+import time
+from src.utils.metrics import HTTP_REQUESTS, HTTP_LATENCY
+
+
+def route_template(scope):
+    """
+    Path template of the route the router matched, e.g. /emotion/history/{user_id}.
+    """
+    route = scope.get("route")
+    if route is None:
+        # Mounts (static files) only set "endpoint"; their root_path is the mount prefix
+        if scope.get("endpoint") is not None:
+            return scope.get("root_path", "").rstrip("/") + "/{path}"
+        return "unmatched"
+    # FastAPI releases that keep included routers nested leave the router-relative
+    # route in scope["route"]; the full template is on the effective route context
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    return (getattr(context, "path_format", None) or getattr(route, "path_format", None)
+            or route.path)
+
+
+class RequestMetricsMiddleware:
+    """
+    Observes status code and wall time of every HTTP request by route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            template = route_template(scope)
+            method = scope.get("method", "")
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=template)
+            HTTP_REQUESTS.inc(method=method, route=template, status=status["code"])
@@ -0,0 +1,38 @@
+# ========================================================================================
+# File: admin_auth.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Shared guard for admin-only diagnostics (traces, profiles, ...). Requests must carry
+# an `X-Admin-Token` header equal to the ADMIN_TOKEN setting. When ADMIN_TOKEN is not
+# configured, every admin route is disabled.
+#
+# Usage:
+#   @admin_router.get("/traces", dependencies=[Depends(require_admin)])
+# ========================================================================================
+
+import hmac
+from fastapi import Header, HTTPException
+from src.utils.config import get_setting
+
+ADMIN_HEADER = "X-Admin-Token"
+
+
+def is_admin_token(token):
+    """
+    Constant-time comparison of a presented token against ADMIN_TOKEN.
+    """
+    expected = get_setting("ADMIN_TOKEN")
+    if not expected or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8"))
+
+
+def require_admin(x_admin_token: str = Header(default=None)):
+    """
+    FastAPI dependency rejecting requests without a valid admin token.
+    """
+    if not get_setting("ADMIN_TOKEN"):
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set).")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid or missing admin token.")
@@ -0,0 +1,213 @@
+# ========================================================================================
+# File: admission.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Local admission control for paid upstreams (OpenAI via the GPT bridge, ElevenLabs),
+# so bursts on /gpt/generate-response queue here instead of turning into upstream 429s
+# and paid retries.
+#
+# Per upstream:
+# - a concurrency limit (<UPSTREAM>_MAX_CONCURRENCY)
+# - a per-minute budget refilled continuously (OPENAI_TOKENS_PER_MINUTE, estimated from
+#   prompt length + max reply tokens; ELEVENLABS_CHARS_PER_MINUTE, characters sent)
+# - priority lanes: "interactive" is always admitted before "batch", then "prewarm"
+#
+# Every call carries a deadline. A call that cannot possibly be admitted in time (its
+# cost exceeds the budget, the refill alone would take longer, or <UPSTREAM>_MAX_QUEUE
+# calls of its priority or higher are already waiting) is rejected at once; one still
+# waiting when its deadline passes is rejected then. Rejections raise
+# AdmissionRejected with a Retry-After hint.
+#
+# Queue depth, wait time and rejections are exported on /metrics.
+#
+# Usage:
+#   async with OPENAI_SCHEDULER.admit(cost=tokens, lane="interactive"):
+#       await asyncio.to_thread(call_bridge)
+# ========================================================================================
+
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from src.utils.config import get_setting
+from src.utils.metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTIONS
+
+LANES = {"interactive": 0, "batch": 1, "prewarm": 2}
+
+# Default time a caller is willing to wait for admission, per lane (seconds)
+DEFAULT_DEADLINES = {"interactive": 5.0, "batch": 30.0, "prewarm": 120.0}
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a call cannot be admitted before its deadline.
+    """
+
+    def __init__(self, upstream, reason, retry_after):
+        super().__init__(f"{upstream} admission rejected: {reason}")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class _Waiter:
+    __slots__ = ("cost", "lane", "future", "cancelled")
+
+    def __init__(self, cost, lane, future):
+        self.cost = cost
+        self.lane = lane
+        self.future = future
+        self.cancelled = False
+
+
+class UpstreamScheduler:
+    """
+    Concurrency slots + token-bucket budget + strict-priority wait queue for one upstream.
+    """
+
+    def __init__(self, name, max_concurrency, budget_per_minute, max_queue=None):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = int(max_queue) if max_queue else 4 * self.max_concurrency
+        self.capacity = float(budget_per_minute)
+        self.rate = self.capacity / 60.0
+        self._budget = self.capacity
+        self._updated = time.monotonic()
+        self._active = 0
+        self._queue = []  # heap of (lane priority, seq, _Waiter)
+        self._seq = itertools.count()
+        self._timer = None
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def queued(self):
+        return sum(1 for _, _, w in self._queue if not w.cancelled)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._budget = min(self.capacity, self._budget + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _grant(self, waiter):
+        self._active += 1
+        self._budget -= waiter.cost
+
+    def _reject(self, lane, reason, retry_after, waited=0.0):
+        ADMISSION_REJECTIONS.inc(upstream=self.name, lane=lane, reason=reason)
+        ADMISSION_WAIT_SECONDS.observe(waited, upstream=self.name, lane=lane, outcome="rejected")
+        return AdmissionRejected(self.name, reason, retry_after)
+
+    async def acquire(self, cost, lane="interactive", deadline=None):
+        """
+        Wait for a slot and `cost` budget units; raises AdmissionRejected.
+        """
+        lane = lane if lane in LANES else "interactive"
+        deadline = DEFAULT_DEADLINES[lane] if deadline is None else deadline
+        cost = float(cost)
+        if cost > self.capacity:
+            raise self._reject(lane, "over_budget", 60.0)
+
+        self._refill()
+        if not self._queue and self._active < self.max_concurrency and self._budget >= cost:
+            self._grant(_Waiter(cost, lane, None))
+            ADMISSION_WAIT_SECONDS.observe(0.0, upstream=self.name, lane=lane, outcome="admitted")
+            return
+
+        # Budget alone (ignoring slots and everyone queued ahead) would take too long
+        refill_wait = max(0.0, cost - self._budget) / self.rate if self.rate else math.inf
+        if refill_wait > deadline:
+            raise self._reject(lane, "budget", refill_wait)
+
+        ahead = sum(1 for p, _, w in self._queue if p <= LANES[lane] and not w.cancelled)
+        if ahead >= self.max_queue:
+            raise self._reject(lane, "queue_full", max(refill_wait, 1.0))
+
+        waiter = _Waiter(cost, lane, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (LANES[lane], next(self._seq), waiter))
+        ADMISSION_QUEUE_DEPTH.inc(upstream=self.name, lane=lane)
+        start = time.monotonic()
+        try:
+            self._pump()
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=deadline)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted in the same tick the deadline fired: keep the slot
+                ADMISSION_WAIT_SECONDS.observe(
+                    time.monotonic() - start, upstream=self.name, lane=lane, outcome="admitted")
+                return
+            waiter.cancelled = True
+            self._pump()
+            raise self._reject(lane, "deadline", max(refill_wait, 1.0), time.monotonic() - start)
+        except BaseException:
+            # Caller cancelled (client disconnected): give back a slot granted meanwhile
+            waiter.cancelled = True
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release()
+            raise
+        finally:
+            ADMISSION_QUEUE_DEPTH.dec(upstream=self.name, lane=lane)
+        ADMISSION_WAIT_SECONDS.observe(
+            time.monotonic() - start, upstream=self.name, lane=lane, outcome="admitted")
+
+    def release(self):
+        self._active = max(0, self._active - 1)
+        self._pump()
+
+    def _pump(self):
+        """
+        Grant queued waiters in priority order while slots and budget allow.
+        """
+        self._refill()
+        while self._queue:
+            _, _, head = self._queue[0]
+            if head.cancelled:
+                heapq.heappop(self._queue)
+                continue
+            if self._active >= self.max_concurrency:
+                return  # release() pumps again
+            if self._budget < head.cost:
+                self._schedule((head.cost - self._budget) / self.rate)
+                return
+            heapq.heappop(self._queue)
+            self._grant(head)
+            head.future.set_result(True)
+
+    def _schedule(self, delay):
+        if self._timer is not None and not self._timer.cancelled():
+            self._timer.cancel()
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(max(delay, 0.001), self._pump)
+
+    @asynccontextmanager
+    async def admit(self, cost, lane="interactive", deadline=None):
+        await self.acquire(cost, lane, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def estimate_tokens(*texts, reply_tokens=0):
+    """
+    Rough OpenAI token estimate (~4 characters per token) plus the reply allowance.
+    """
+    return sum(len(t or "") for t in texts) / 4.0 + reply_tokens
+
+
+OPENAI_SCHEDULER = UpstreamScheduler(
+    "openai",
+    get_setting("OPENAI_MAX_CONCURRENCY", "4"),
+    get_setting("OPENAI_TOKENS_PER_MINUTE", "30000"),
+    get_setting("OPENAI_MAX_QUEUE"))
+
+ELEVENLABS_SCHEDULER = UpstreamScheduler(
+    "elevenlabs",
+    get_setting("ELEVENLABS_MAX_CONCURRENCY", "2"),
+    get_setting("ELEVENLABS_CHARS_PER_MINUTE", "20000"),
+    get_setting("ELEVENLABS_MAX_QUEUE"))
@@ -1,13 +1,73 @@
 import os
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
-import psycopg2
 
 # ===============================================
-# Load Environment Variables from .env (Project Root)
+# Project Root + .env Location
 # ===============================================
-env_path = Path(__file__).resolve().parents[3] / ".env"
-load_dotenv(dotenv_path=env_path)
+# src/utils/config.py → parents[0]=utils, parents[1]=src, parents[2]=project root
+ROOT_DIR = Path(__file__).resolve().parents[2]
+# CLOELIA_ENV_FILE points at another dotenv file (tests use an empty one)
+ENV_PATH = Path(os.environ.get("CLOELIA_ENV_FILE") or ROOT_DIR / ".env")
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+# Settings each optional feature needs; a missing key disables only that feature
+FEATURE_REQUIREMENTS = {
+    "gpt": ("OPENAI_KEY",),
+    "tts": ("ELEVENLABS_KEY",),
+}
+
+
+def load_env():
+    """
+    Load the project-root .env exactly once per process.
+
+    Safe to call from any module; later calls are no-ops. Variables already set in the
+    process environment (e.g. by Render) take precedence over the .env file.
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            load_dotenv(dotenv_path=ENV_PATH)
+            _env_loaded = True
+
+
+def get_setting(name, default=None):
+    """
+    Read a configuration value after making sure .env has been loaded.
+    """
+    load_env()
+    return os.getenv(name, default)
+
+
+def log_path(*parts):
+    """
+    Resolve a path under the runtime log directory (CLOELIA_LOG_DIR, default src/logs/).
+
+    Lets benchmarks and throwaway environments redirect every log/snapshot file at once.
+    """
+    log_dir = get_setting("CLOELIA_LOG_DIR") or str(ROOT_DIR / "src" / "logs")
+    return os.path.abspath(os.path.join(log_dir, *parts))
+
+
+def missing_settings(feature):
+    """
+    Return the required settings that are not configured for a feature.
+    """
+    return [key for key in FEATURE_REQUIREMENTS.get(feature, ()) if not get_setting(key)]
+
+
+def feature_enabled(feature):
+    """
+    True when every setting the feature needs is present.
+    """
+    return not missing_settings(feature)
+
 
 # ===============================================
 # Database Connection Utility
@@ -15,7 +75,8 @@ load_dotenv(dotenv_path=env_path)
 
 def get_db_connection():
     """
-    Establishes and returns a PostgreSQL database connection using environment variables.
+    Establishes and returns a PostgreSQL database connection using environment variables
+    (or an embedded SQLite connection when DB_BACKEND=sqlite).
 
     Returns:
         connection (psycopg2.connection): Active database connection object.
@@ -23,13 +84,19 @@ def get_db_connection():
     Raises:
         psycopg2.Error: If connection fails due to incorrect credentials or server issues.
     """
+    if get_setting("DB_BACKEND", "postgresql").lower() == "sqlite":
+        from src.utils.sqlite_backend import get_sqlite_database
+        return get_sqlite_database().connect()
+
+    import psycopg2  # Imported on first use to keep application startup light
+
     try:
         connection = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
+            dbname=get_setting("DB_NAME"),
+            user=get_setting("DB_USER"),
+            password=get_setting("DB_PASSWORD"),
+            host=get_setting("DB_HOST"),
+            port=get_setting("DB_PORT")
         )
         return connection
     except psycopg2.Error as e:
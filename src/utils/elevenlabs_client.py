@@ -6,8 +6,9 @@
 #
 # Purpose:
 #   Utility module to convert GPT symbolic replies into ElevenLabs MP3 audio files.
-#   Loads ELEVENLABS_KEY from the project-root .env, calls the ElevenLabs REST API,
-#   and saves the .mp3 into static/audio/responses/.
+#   Reads ELEVENLABS_KEY (via the shared config loader) on first use, calls the
+#   ElevenLabs REST API, and saves the .mp3 into static/audio/responses/.
+#   A missing key only disables audio synthesis; importing this module never fails.
 #
 # Requirements:
 #   pip install requests python-dotenv
@@ -19,32 +20,39 @@
 # ====================================================================================
 
 import os
-import requests
-from dotenv import load_dotenv
+from src.utils.config import ENV_PATH, get_setting, feature_enabled
+from src.utils.tracing import span
 
 # -------------------------------------------------------------------
-# 1. Locate and load the project-root .env
+# 1. Project root (audio output lives under static/audio/responses/)
 # -------------------------------------------------------------------
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-ENV_PATH = os.path.join(ROOT, ".env")
-load_dotenv(dotenv_path=ENV_PATH)
 
 # -------------------------------------------------------------------
-# 2. Read ElevenLabs API key
-# -------------------------------------------------------------------
-ELEVEN_KEY = os.getenv("ELEVENLABS_KEY")
-if not ELEVEN_KEY:
-    raise RuntimeError("ELEVENLABS_KEY not found in .env")
-
-# -------------------------------------------------------------------
-# 3. Default voice ID (you can override via env or function arg)
+# 2. Default voice ID (you can override via env or function arg)
 #    - You can find your voice IDs via GET /v1/voices
 # -------------------------------------------------------------------
-DEFAULT_VOICE_ID = os.getenv(
-    "ELEVENLABS_VOICE_ID",
-    "EXAVITQu4vr4xnSDxMaL")  # e.g. Rachel
+FALLBACK_VOICE_ID = "EXAVITQu4vr4xnSDxMaL"  # e.g. Rachel
+
+# Overridable (ELEVENLABS_BASE_URL) so load tests can point at a local stand-in
+DEFAULT_BASE_URL = "https://api.elevenlabs.io/v1"
+
+
+def is_configured() -> bool:
+    """
+    True when an ElevenLabs API key is available.
+    """
+    return feature_enabled("tts")
+
 
-BASE_URL = "https://api.elevenlabs.io/v1"
+def _api_key() -> str:
+    """
+    Resolve the ElevenLabs key lazily so a missing key only breaks audio synthesis.
+    """
+    key = get_setting("ELEVENLABS_KEY")
+    if not key:
+        raise RuntimeError("ELEVENLABS_KEY not found in .env")
+    return key
 
 
 def generate_audio(
@@ -57,7 +65,7 @@ def generate_audio(
     Args:
         text (str): The text to synthesize.
         filename (str): The name for the output .mp3 (default: response.mp3).
-        voice_id (str): Optional ElevenLabs voice ID; defaults to DEFAULT_VOICE_ID.
+        voice_id (str): Optional ElevenLabs voice ID; defaults to ELEVENLABS_VOICE_ID.
 
     Returns:
         str: Full path to the saved .mp3 file.
@@ -65,31 +73,38 @@ def generate_audio(
     Raises:
         HTTPError: If the ElevenLabs API call fails.
         ValueError: If `text` is empty.
+        RuntimeError: If ELEVENLABS_KEY is not configured.
     """
+    import requests  # Imported on first use to keep application startup light
+
     if not text:
         raise ValueError("No text provided for audio generation.")
 
-    vid = voice_id or DEFAULT_VOICE_ID
-    url = f"{BASE_URL}/text-to-speech/{vid}"
+    vid = voice_id or get_setting("ELEVENLABS_VOICE_ID", FALLBACK_VOICE_ID)
+    base_url = get_setting("ELEVENLABS_BASE_URL", DEFAULT_BASE_URL)
+    url = f"{base_url}/text-to-speech/{vid}"
 
     headers = {
         "Accept": "audio/mpeg",
         "Content-Type": "application/json",
-        "xi-api-key": ELEVEN_KEY
+        "xi-api-key": _api_key()
     }
     payload = {
         "text": text,
         "model_id": "eleven_monolingual_v1"
     }
 
-    resp = requests.post(url, headers=headers, json=payload)
-    resp.raise_for_status()
+    with span("tts_request"):
+        resp = requests.post(url, headers=headers, json=payload)
+        resp.raise_for_status()
 
-    out_dir = os.path.join(ROOT, "static", "audio", "responses")
+    out_dir = get_setting(
+        "AUDIO_OUTPUT_DIR",
+        os.path.join(ROOT, "static", "audio", "responses"))
     os.makedirs(out_dir, exist_ok=True)
     out_path = os.path.join(out_dir, filename)
 
-    with open(out_path, "wb") as f:
+    with span("file_write"), open(out_path, "wb") as f:
         f.write(resp.content)
 
     return out_path
@@ -101,7 +116,7 @@ def generate_audio(
 if __name__ == "__main__":
     sample = "In moments of fear, the virtue of courage rises."
     print(f"Using .env at: {ENV_PATH}")
-    print(f"ELEVENLABS_KEY = {ELEVEN_KEY[:6]}…")
+    print(f"ELEVENLABS_KEY = {_api_key()[:6]}…")
     try:
         out = generate_audio(sample, "test_audio.mp3")
         print(f"✅ Audio saved to: {out}")
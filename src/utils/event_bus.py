@@ -0,0 +1,157 @@
+# ========================================================================================
+# File: event_bus.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# In-process publish/subscribe broadcaster that pushes symbolic triggers and ProxyMind
+# firewall events to live subscribers (SSE / WebSocket, see events_controller.py), so
+# dashboards stop polling the feeds.
+#
+# Design:
+# - publish() is cheap and thread-safe: it assigns an event ID, appends the event to a
+#   bounded history ring (EVENT_HISTORY_SIZE) and hands it to every subscriber of that
+#   topic on the subscriber's own event loop.
+# - Each subscriber has a bounded queue (EVENT_QUEUE_SIZE). A subscriber that falls that
+#   far behind is dropped rather than allowed to grow memory; its stream ends and the
+#   client reconnects with the last event ID it saw.
+# - Event IDs are "<boot id>-<sequence>". Resuming replays the history after that ID;
+#   if the ID is from another boot or older than the ring, the subscriber gets a single
+#   "reset" event and should re-read the paginated feed.
+#
+# Events are per worker process: with several workers, a subscriber sees the events
+# produced by the worker it is connected to.
+# ========================================================================================
+
+import uuid
+import asyncio
+import threading
+from collections import deque
+from src.utils.config import get_setting
+from src.utils.metrics import EVENT_SUBSCRIBER_DROPS
+
+TOPICS = ("trigger", "firewall")
+
+
+class Event:
+    __slots__ = ("event_id", "seq", "topic", "data")
+
+    def __init__(self, event_id, seq, topic, data):
+        self.event_id = event_id
+        self.seq = seq
+        self.topic = topic
+        self.data = data
+
+
+class Subscriber:
+    """
+    One live connection: a bounded buffer drained by its transport on `loop`.
+    """
+
+    def __init__(self, topics, loop, max_queue):
+        self.topics = frozenset(topics)
+        self.loop = loop
+        self.max_queue = max_queue
+        self.buffer = deque()
+        self.dropped = False
+        self._wakeup = asyncio.Event()
+
+    def offer(self, event):
+        """
+        Called on the subscriber's loop; flags the subscriber instead of blocking.
+        """
+        if self.dropped:
+            return
+        if len(self.buffer) >= self.max_queue:
+            self.dropped = True
+            self.buffer.clear()
+        else:
+            self.buffer.append(event)
+        self._wakeup.set()
+
+    async def next_batch(self, timeout):
+        """
+        Wait up to `timeout` seconds and return the pending events ([] on timeout).
+        """
+        if not self.buffer and not self.dropped:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._wakeup.clear()
+        batch = list(self.buffer)
+        self.buffer.clear()
+        return batch
+
+
+class EventBroadcaster:
+    """
+    Topic fan-out with a replayable history ring.
+    """
+
+    def __init__(self, history_size=None, queue_size=None):
+        self.boot_id = uuid.uuid4().hex[:8]
+        self.history = deque(maxlen=int(history_size or get_setting("EVENT_HISTORY_SIZE", "1000")))
+        self.queue_size = int(queue_size or get_setting("EVENT_QUEUE_SIZE", "256"))
+        self._seq = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, topic, data):
+        with self._lock:
+            self._seq += 1
+            event = Event(f"{self.boot_id}-{self._seq}", self._seq, topic, data)
+            self.history.append(event)
+            subscribers = [s for s in self._subscribers if topic in s.topics]
+
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+            except RuntimeError:
+                # Loop already closed: the connection is gone
+                self.unsubscribe(subscriber)
+        return event
+
+    def subscribe(self, topics, last_event_id=None):
+        """
+        Register a subscriber on the running loop.
+
+        Returns (subscriber, replay) where replay is the list of missed events, or None
+        when `last_event_id` can no longer be resumed (the caller should send a reset).
+        """
+        subscriber = Subscriber(topics, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            replay = [] if not last_event_id else self._replay_after(last_event_id, subscriber.topics)
+            self._subscribers.add(subscriber)
+        return subscriber, replay
+
+    def _replay_after(self, last_event_id, topics):
+        boot_id, _, seq = last_event_id.partition("-")
+        if boot_id != self.boot_id or not seq.isdigit():
+            return None
+        seq = int(seq)
+        oldest = self.history[0].seq if self.history else self._seq + 1
+        if seq < oldest - 1:
+            return None  # the ring has already evicted events the client missed
+        return [e for e in self.history if e.seq > seq and e.topic in topics]
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def drop(self, subscriber, transport):
+        self.unsubscribe(subscriber)
+        EVENT_SUBSCRIBER_DROPS.inc(transport=transport)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+EVENT_BUS = EventBroadcaster()
+
+
+def publish(topic, data):
+    """
+    Publish `data` (a JSON-serializable dict) to live subscribers of `topic`.
+    """
+    return EVENT_BUS.publish(topic, data)
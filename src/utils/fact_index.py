@@ -0,0 +1,395 @@
+# ========================================================================================
+# File: fact_index.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Relevance-ranked retrieval of knowledge_base facts for GPT prompts, so the injected
+# fact relates to the user's message instead of being picked at random.
+#
+# Model:
+# - Facts are hashed with scikit-learn's HashingVectorizer (2^18 features, English stop
+#   words, sublinear TF). Hashing needs no vocabulary, so new facts are added without
+#   refitting anything.
+# - IDF comes from document frequencies kept alongside the matrix; the score of a fact
+#   is cosine similarity in TF-IDF space.
+# - The matrix is stored column-major (one posting list per hashed term). A query only
+#   touches the postings of its own few terms, and terms found in more than FACT_MAX_DF
+#   of all facts (corpus-specific stop words) are skipped when a more selective term
+#   matched, so a lookup stays under a millisecond at 100k facts. Below
+#   FACT_MAX_DF_MIN_FACTS facts (default 1000) every term is used: postings are short
+#   anyway, and in a small corpus ordinary words easily pass the share.
+#
+# Incremental additions:
+# New facts go to a small delta matrix searched next to the base one, so an addition
+# costs about the size of the delta rather than a rebuild of the 100k-fact matrix.
+# Document frequencies (IDF) cover base + delta; base fact norms keep the IDF of the
+# last fold. The delta is folded into the base once it holds FACT_DELTA_MAX facts
+# (default 2000) and on every full reload.
+#
+# Persistence:
+# FACT_INDEX_DIR (default <log dir>/fact_index/) holds .npy arrays that are memory-
+# mapped on load, so a restart does not re-tokenize the table. The index is fed by
+# FactSampler refreshes (src/utils/fact_sampler.py) and saved whenever the base
+# changes (build or fold). Facts still in the delta are not saved, but the sampler's
+# first refresh after a restart is a full reload, which re-adds them.
+#
+# scikit-learn / NumPy are imported off the request path to keep application startup
+# light: by the FactSampler thread on its first refresh, or right after load() in a
+# background thread, so the first GPT request does not pay for the import.
+# ========================================================================================
+
+import os
+import json
+import math
+import shutil
+import threading
+from src.utils.config import get_setting, log_path
+
+N_FEATURES = 2 ** 18
+_ARRAYS = ("data", "indices", "indptr", "df", "norms", "ids")
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+class _Snapshot:
+    """
+    Immutable view of the index; swapped atomically so queries never lock.
+    """
+    __slots__ = ("data", "indices", "indptr", "df", "norms", "ids", "facts", "idf",
+                 "delta", "base_rows")
+
+    def __init__(self, data, indices, indptr, df, norms, ids, facts, delta=None):
+        np = _np()
+        self.data = data        # float32 sublinear TF, grouped by term (CSC)
+        self.indices = indices  # int32 fact row per entry
+        self.indptr = indptr    # int64 term → [start, end) into data/indices
+        self.df = df            # int32 document frequency per term (base facts)
+        self.norms = norms      # float32 TF-IDF norm per fact (base, then delta)
+        self.ids = ids          # int64 knowledge_base.id per fact row (base, then delta)
+        self.facts = facts      # list[str] fact text per row (base, then delta)
+        self.delta = delta      # CSC matrix of facts added since the last fold, or None
+        self.base_rows = len(facts) - (delta.shape[0] if delta is not None else 0)
+        if delta is not None:
+            df = df + np.diff(delta.indptr).astype(np.int32)
+        n = len(facts)
+        self.idf = (np.log((1.0 + n) / (1.0 + df.astype(np.float32))) + 1.0).astype(np.float32)
+
+    def postings(self, term):
+        """
+        (fact rows, tf values) of `term` across the base and the delta.
+        """
+        start, end = int(self.indptr[term]), int(self.indptr[term + 1])
+        rows, data = self.indices[start:end], self.data[start:end]
+        delta = self.delta
+        if delta is not None:
+            start, end = int(delta.indptr[term]), int(delta.indptr[term + 1])
+            if start < end:
+                np = _np()
+                rows = np.concatenate([rows, delta.indices[start:end] + self.base_rows])
+                data = np.concatenate([data, delta.data[start:end]])
+        return rows, data
+
+
+class FactIndex:
+    """
+    Sparse TF-IDF index over knowledge_base facts with incremental additions.
+    """
+
+    def __init__(self, directory=None, max_df=None):
+        self.directory = directory or get_setting("FACT_INDEX_DIR") or log_path("fact_index")
+        self.max_df = float(max_df or get_setting("FACT_MAX_DF", "0.1"))
+        self.max_df_min_facts = int(get_setting("FACT_MAX_DF_MIN_FACTS", "1000"))
+        self.delta_max = int(get_setting("FACT_DELTA_MAX") or 2000)
+        self._snapshot = None
+        self._vectorizer = None
+        self._analyzer = None
+        self._write_lock = threading.Lock()
+
+    def __len__(self):
+        snapshot = self._snapshot
+        return len(snapshot.facts) if snapshot is not None else 0
+
+    # -------------------------------------------------------------------
+    # Tokenization
+    # -------------------------------------------------------------------
+    def _vectorizer_instance(self):
+        if self._vectorizer is None:
+            np = _np()
+            from sklearn.feature_extraction.text import HashingVectorizer
+            self._vectorizer = HashingVectorizer(
+                n_features=N_FEATURES, alternate_sign=False, norm=None,
+                stop_words="english", dtype=np.float32)
+            self._analyzer = self._vectorizer.build_analyzer()
+        return self._vectorizer
+
+    def warm(self):
+        """
+        Import scikit-learn / SciPy and build the vectorizer ahead of the first query.
+        """
+        import scipy.sparse  # noqa: F401
+        from sklearn.utils import murmurhash3_32  # noqa: F401
+        self._vectorizer_instance()
+
+    def _query_terms(self, text):
+        """
+        {hashed term: sublinear tf} for a query, hashed exactly like HashingVectorizer.
+        """
+        from sklearn.utils import murmurhash3_32
+        self._vectorizer_instance()
+        counts = {}
+        for token in self._analyzer(text):
+            term = abs(murmurhash3_32(token, seed=0)) % N_FEATURES
+            counts[term] = counts.get(term, 0) + 1
+        return {term: 1.0 + math.log(count) for term, count in counts.items()}
+
+    def _term_matrix(self, texts):
+        """
+        Facts × terms CSR matrix of sublinear term frequencies.
+        """
+        np = _np()
+        if not texts:
+            # HashingVectorizer raises StopIteration on an empty batch
+            from scipy.sparse import csr_matrix
+            return csr_matrix((0, N_FEATURES), dtype=np.float32)
+        matrix = self._vectorizer_instance().transform(texts).tocsr()
+        np.log(matrix.data, out=matrix.data)
+        matrix.data += 1.0
+        return matrix
+
+    # -------------------------------------------------------------------
+    # Building
+    # -------------------------------------------------------------------
+    def _snapshot_from(self, csr, ids, facts):
+        np = _np()
+        csc = csr.tocsc()
+        csc.sort_indices()
+        df = np.diff(csc.indptr).astype(np.int32)
+        snapshot = _Snapshot(
+            csc.data.astype(np.float32), csc.indices.astype(np.int32),
+            csc.indptr.astype(np.int64), df, None, np.asarray(ids, dtype=np.int64), facts)
+        snapshot.norms = self._norms(csr, snapshot.idf)
+        return snapshot
+
+    @staticmethod
+    def _norms(csr, idf):
+        np = _np()
+        squared = csr.multiply(csr) @ (idf.astype(np.float64) ** 2)
+        norms = np.sqrt(np.asarray(squared, dtype=np.float64)).astype(np.float32)
+        norms[norms == 0] = 1.0
+        return norms
+
+    def _current_csr(self):
+        """
+        All facts (base, then delta) as one CSR matrix.
+        """
+        from scipy.sparse import csc_matrix, vstack
+        snapshot = self._snapshot
+        matrix = csc_matrix(
+            (snapshot.data, snapshot.indices, snapshot.indptr),
+            shape=(snapshot.base_rows, N_FEATURES)).tocsr()
+        if snapshot.delta is None:
+            return matrix
+        return vstack([matrix, snapshot.delta.tocsr()]).tocsr()
+
+    def build(self, rows):
+        """
+        Replace the index with `rows` = [(id, fact), ...].
+        """
+        rows = [(i, f) for i, f in rows if f]
+        with self._write_lock:
+            ids = [i for i, _ in rows]
+            facts = [f for _, f in rows]
+            self._snapshot = self._snapshot_from(self._term_matrix(facts), ids, facts)
+        return len(facts)
+
+    def add(self, rows):
+        """
+        Append new facts without re-tokenizing existing ones.
+        """
+        rows = [(i, f) for i, f in rows if f]
+        if not rows:
+            return 0
+        if self._snapshot is None:
+            return self.build(rows)
+        np = _np()
+        from scipy.sparse import vstack
+        with self._write_lock:
+            snapshot = self._snapshot
+            delta = self._term_matrix([f for _, f in rows])
+            if snapshot.delta is not None:
+                delta = vstack([snapshot.delta.tocsr(), delta]).tocsr()
+            ids = np.concatenate([snapshot.ids, np.asarray([i for i, _ in rows], dtype=np.int64)])
+            facts = snapshot.facts + [f for _, f in rows]
+            delta_csc = delta.tocsc()
+            delta_csc.sort_indices()
+            updated = _Snapshot(
+                snapshot.data, snapshot.indices, snapshot.indptr, snapshot.df, None, ids, facts,
+                delta_csc)
+            updated.norms = np.concatenate([
+                snapshot.norms[:snapshot.base_rows], self._norms(delta, updated.idf)])
+            self._snapshot = updated
+            if delta.shape[0] >= self.delta_max:
+                self._fold()
+        return len(rows)
+
+    def fold(self):
+        """
+        Merge the delta into the base matrix (refreshing every norm); True if it changed.
+        """
+        with self._write_lock:
+            return self._fold()
+
+    def _fold(self):
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.delta is None:
+            return False
+        self._snapshot = self._snapshot_from(self._current_csr(), snapshot.ids, snapshot.facts)
+        return True
+
+    def sync(self, rows, full):
+        """
+        FactSampler listener: apply a refresh (full table or rows after the last id).
+        """
+        self.warm()
+        snapshot = self._snapshot
+        if not full:
+            base = snapshot.base_rows if snapshot is not None else None
+            added = self.add(rows)
+            # Saved only when the base changed: a fold, or the first build
+            if added and (snapshot is None or self._snapshot.base_rows != base):
+                self.save()
+            return added
+        if snapshot is not None and self._unchanged_prefix(snapshot, rows):
+            # Full reload of a table that only grew: index just the new tail
+            added = self.add(rows[len(snapshot.facts):])
+            if self.fold() or added:
+                self.save()
+            return added
+        added = self.build(rows)
+        self.save()
+        return added
+
+    @staticmethod
+    def _unchanged_prefix(snapshot, rows):
+        rows = [(i, f) for i, f in rows if f]
+        n = len(snapshot.facts)
+        if len(rows) < n:
+            return False
+        return (
+            [i for i, _ in rows[:n]] == snapshot.ids.tolist()
+            and [f for _, f in rows[:n]] == snapshot.facts)
+
+    # -------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------
+    def save(self):
+        np = _np()
+        self.fold()  # only the base matrix is persisted
+        snapshot = self._snapshot
+        if snapshot is None:
+            return
+        tmp_dir = f"{self.directory}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name in _ARRAYS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(snapshot, name))
+        with open(os.path.join(tmp_dir, "facts.json"), "w", encoding="utf-8") as f:
+            json.dump(snapshot.facts, f)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"n_features": N_FEATURES, "facts": len(snapshot.facts)}, f)
+
+        old_dir = f"{self.directory}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.isdir(self.directory):
+            os.replace(self.directory, old_dir)
+        os.replace(tmp_dir, self.directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def load(self):
+        """
+        Memory-map a saved index; returns False when none (or an incompatible one) exists.
+        """
+        np = _np()
+        try:
+            with open(os.path.join(self.directory, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("n_features") != N_FEATURES:
+                return False
+            arrays = {
+                name: np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+                for name in _ARRAYS
+            }
+            with open(os.path.join(self.directory, "facts.json"), "r", encoding="utf-8") as f:
+                facts = json.load(f)
+        except (OSError, ValueError):
+            return False
+        snapshot = _Snapshot(
+            arrays["data"], arrays["indices"], arrays["indptr"], arrays["df"], None,
+            arrays["ids"], facts)
+        snapshot.norms = arrays["norms"]
+        self._snapshot = snapshot
+        threading.Thread(target=self.warm, name="fact-index-warm", daemon=True).start()
+        return True
+
+    # -------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------
+    def top_k(self, text, k=3):
+        """
+        The `k` facts most similar to `text`: [(fact, score), ...], best first.
+        Facts sharing no term with the query are never returned.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot.facts or not text:
+            return []
+        np = _np()
+        terms = self._query_terms(text)
+
+        # Very common terms carry little signal but dominate the work (long postings);
+        # they are skipped as long as a more selective term matched
+        n = len(snapshot.facts)
+        max_postings = max(1, int(n * self.max_df)) if n >= self.max_df_min_facts else n
+        postings = []
+        for term, tf in terms.items():
+            term_rows, term_data = snapshot.postings(term)
+            if len(term_rows):
+                postings.append((len(term_rows), term, tf, term_rows, term_data))
+        if not postings:
+            return []
+        postings.sort(key=lambda p: (p[0], p[1]))
+        selective = [p for p in postings if p[0] <= max_postings] or postings[:1]
+
+        rows, weights = [], []
+        for _, term, tf, term_rows, term_data in selective:
+            idf = float(snapshot.idf[term])
+            rows.append(term_rows)
+            weights.append(term_data * (tf * idf * idf))
+        rows = np.concatenate(rows) if len(rows) > 1 else rows[0]
+        weights = np.concatenate(weights) if len(weights) > 1 else weights[0]
+
+        if len(rows) * 8 < n:
+            # Few postings: accumulate over the touched facts only
+            candidates, inverse = np.unique(rows, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights) / snapshot.norms[candidates]
+        else:
+            # Long postings: a dense accumulator beats sorting them
+            candidates = None
+            scores = np.bincount(rows, weights=weights, minlength=n) / snapshot.norms
+        query_norm = math.sqrt(sum((tf * float(snapshot.idf[t])) ** 2 for t, tf in terms.items()))
+        scores /= query_norm or 1.0
+
+        if len(scores) > k:
+            best = np.argpartition(scores, len(scores) - k)[-k:]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        best = best[scores[best] > 0]
+        if candidates is not None:
+            return [(snapshot.facts[candidates[i]], float(scores[i])) for i in best]
+        return [(snapshot.facts[i], float(scores[i])) for i in best]
+
+
+FACT_INDEX = FactIndex()
@@ -0,0 +1,219 @@
+# ========================================================================================
+# File: fact_sampler.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# In-memory sampler for knowledge_base facts injected into GPT prompts. Replaces the
+# bridge's per-request `new pg.Client()` + `ORDER BY RANDOM() LIMIT 1` (a connection
+# handshake plus a full-table sort on every reply) with random.choice over a Python list.
+#
+# Refresh:
+# - A background thread loads the table once, then every FACT_REFRESH_SECONDS fetches
+#   only rows with `id` above the highest one seen (incremental).
+# - Every FACT_FULL_RELOAD_SECONDS the list is rebuilt to pick up edits and deletions.
+# - A hand-made knowledge_base without the `id` column (detected on the first refresh)
+#   cannot be read incrementally: every refresh is then a full reload ordered by
+#   key_fact, with row positions standing in for ids.
+# - On PostgreSQL the thread also LISTENs on `knowledge_base_changed`, so
+#   `NOTIFY knowledge_base_changed` (e.g. from an insert trigger) refreshes immediately.
+#
+# Listeners (e.g. the relevance index in src/utils/fact_index.py) receive every batch
+# of fetched rows. gpt_controller passes the chosen fact to the bridge via CLOELIA_FACT;
+# until the first load succeeds the bridge is told to inject nothing rather than query
+# the DB.
+# ========================================================================================
+
+import time
+import random
+import select
+import threading
+from src.utils.config import get_setting
+from src.utils.metrics import DB_QUERY_SECONDS
+
+NOTIFY_CHANNEL = "knowledge_base_changed"
+
+
+class FactSampler:
+    """
+    Array-backed knowledge_base cache with O(1) uniform sampling.
+    """
+
+    def __init__(self, connect=None, refresh_seconds=None, full_reload_seconds=None):
+        self._connect = connect
+        self.refresh_seconds = float(refresh_seconds or get_setting("FACT_REFRESH_SECONDS", "300"))
+        self.full_reload_seconds = float(
+            full_reload_seconds or get_setting("FACT_FULL_RELOAD_SECONDS", "3600"))
+        self._facts = []
+        self._max_id = 0
+        self._loaded_at = None
+        self._last_full = 0.0
+        self._has_id = None  # knowledge_base.id exists; probed on the first refresh
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def _connection(self):
+        if self._connect is not None:
+            return self._connect()
+        import database  # Resolved at call time so stand-ins can replace get_connection
+        return database.get_connection()
+
+    def add_listener(self, listener):
+        """
+        Call `listener(rows, full)` with the [(id, fact), ...] rows of every refresh.
+        """
+        self._listeners.append(listener)
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def __len__(self):
+        return len(self._facts)
+
+    # -------------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------------
+    def sample(self):
+        """
+        A uniformly random fact, or "" when none are loaded.
+        """
+        facts = self._facts  # list swapped atomically on reload; appends are in place
+        return random.choice(facts) if facts else ""
+
+    # -------------------------------------------------------------------
+    # Refresh
+    # -------------------------------------------------------------------
+    @staticmethod
+    def _probe_id_column(conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id FROM knowledge_base WHERE 1 = 0")
+                cursor.fetchall()
+            return True
+        except Exception:
+            conn.rollback()  # PostgreSQL aborts the transaction on the failed probe
+            return False
+
+    def _fetch(self, conn, full):
+        if self._has_id is None:
+            self._has_id = self._probe_id_column(conn)
+            if not self._has_id:
+                print("⚠️ knowledge_base has no id column; facts will be fully reloaded "
+                      "on every refresh.")
+        with DB_QUERY_SECONDS.time(query="knowledge_base_facts"):
+            with conn.cursor() as cursor:
+                if not self._has_id:
+                    cursor.execute("SELECT key_fact FROM knowledge_base ORDER BY key_fact")
+                    return [(position, fact) for position, (fact,) in enumerate(cursor.fetchall(), 1)]
+                cursor.execute(
+                    "SELECT id, key_fact FROM knowledge_base WHERE id > %s ORDER BY id",
+                    (0 if full else self._max_id,))
+                return cursor.fetchall()
+
+    def refresh(self, conn=None, full=False):
+        """
+        Fetch new facts (all facts when `full`); returns the number of rows read.
+        """
+        own = conn is None
+        conn = conn or self._connection()
+        try:
+            rows = self._fetch(conn, full)
+            full = full or not self._has_id
+        except Exception:
+            self._has_id = None  # probe again once the table is readable
+            raise
+        finally:
+            if own:
+                conn.close()
+
+        facts = [fact for _, fact in rows if fact]
+        with self._lock:
+            if full:
+                self._facts = facts
+                self._max_id = rows[-1][0] if rows else 0
+                self._last_full = time.time()
+            elif rows:
+                self._facts.extend(facts)
+                self._max_id = rows[-1][0]
+            self._loaded_at = time.time()
+
+        for listener in self._listeners:
+            try:
+                listener(rows, full)
+            except Exception as e:
+                print(f"⚠️ Knowledge fact listener failed: {e}")
+        return len(rows)
+
+    def request_refresh(self):
+        """
+        Ask the background thread for an incremental refresh now.
+        """
+        self._wakeup.set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="fact-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        conn = None
+        while True:
+            try:
+                if conn is None:
+                    conn = self._connection()
+                    listening = self._listen(conn)
+                full = time.time() - self._last_full >= self.full_reload_seconds
+                self.refresh(conn, full=full)
+                if hasattr(conn, "commit"):
+                    conn.commit()  # end the read transaction so LISTEN/NOTIFY is delivered
+                self._wait(conn if listening else None)
+            except Exception as e:
+                print(f"⚠️ Knowledge fact refresh failed: {e}")
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                conn = None
+                self._wakeup.wait(self.refresh_seconds)
+                self._wakeup.clear()
+
+    @staticmethod
+    def _listen(conn):
+        """
+        Subscribe to knowledge_base change notifications (PostgreSQL only).
+        """
+        if not hasattr(conn, "poll") or not hasattr(conn, "fileno"):
+            return False
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL};")
+            return True
+        except Exception:
+            return False
+
+    def _wait(self, listen_conn):
+        """
+        Sleep until the next scheduled refresh, a notification or request_refresh().
+        """
+        deadline = time.time() + self.refresh_seconds
+        while time.time() < deadline:
+            if self._wakeup.is_set():
+                break
+            if listen_conn is None:
+                self._wakeup.wait(deadline - time.time())
+                continue
+            ready, _, _ = select.select([listen_conn], [], [], min(1.0, deadline - time.time()))
+            if ready:
+                listen_conn.poll()
+                if listen_conn.notifies:
+                    listen_conn.notifies.clear()
+                    break
+        self._wakeup.clear()
+
+
+FACT_SAMPLER = FactSampler()
@@ -0,0 +1,290 @@
+# ========================================================================================
+# File: firewall_rollup.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Incremental per-minute rollups of ProxyMind traffic so "which IPs tripped the limiter
+# in the last hour" is answered from a few KB of aggregates instead of the raw log.
+#
+# Per minute we keep: request total, threat total, and Space-Saving heavy-hitter sketches
+# of request counts by IP, by path, and threat counts by IP (top offenders). Sketches are
+# bounded to FIREWALL_ROLLUP_TOP_K items and the ring keeps FIREWALL_ROLLUP_MINUTES
+# minutes, so memory is bounded no matter how many distinct IPs show up.
+#
+# Each writer process persists its rollup to <log dir>/rollups/firewall_<writer>.json
+# every few seconds from a background thread; stats merge the live in-process rollup with the other writers'
+# snapshots, so answers stay consistent across API workers.
+# ========================================================================================
+
+import os
+import json
+import time
+import calendar
+import threading
+from datetime import datetime
+from src.utils.config import get_setting, log_path
+
+PERSIST_EVERY_SECONDS = 10.0
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-K sketch (Metwally et al.): at most `k` counters; a new item evicts
+    the minimum counter and inherits its count as over-estimation error.
+    """
+
+    __slots__ = ("k", "counts")
+
+    def __init__(self, k, counts=None):
+        self.k = k
+        self.counts = counts or {}  # { item: [count, error] }
+
+    def add(self, item, amount=1):
+        cell = self.counts.get(item)
+        if cell is not None:
+            cell[0] += amount
+            return
+        if len(self.counts) < self.k:
+            self.counts[item] = [amount, 0]
+            return
+        victim = min(self.counts, key=lambda key: self.counts[key][0])
+        floor = self.counts.pop(victim)[0]
+        self.counts[item] = [floor + amount, floor]
+
+    def merge(self, other):
+        for item, (count, error) in other.counts.items():
+            cell = self.counts.get(item)
+            if cell is None:
+                self.counts[item] = [count, error]
+            else:
+                cell[0] += count
+                cell[1] += error
+        return self
+
+    def top(self, n):
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [{"key": item, "count": c, "max_error": e} for item, (c, e) in ranked]
+
+    def to_dict(self):
+        return {item: list(cell) for item, cell in self.counts.items()}
+
+
+class _Minute:
+    __slots__ = ("minute", "total", "threats", "ips", "paths", "offenders")
+
+    def __init__(self, minute, k):
+        self.minute = minute
+        self.total = 0
+        self.threats = 0
+        self.ips = SpaceSaving(k)
+        self.paths = SpaceSaving(k)
+        self.offenders = SpaceSaving(k)
+
+    def to_dict(self):
+        return {
+            "minute": self.minute,
+            "total": self.total,
+            "threats": self.threats,
+            "ips": self.ips.to_dict(),
+            "paths": self.paths.to_dict(),
+            "offenders": self.offenders.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data, k):
+        bucket = cls(int(data["minute"]), k)
+        bucket.total = int(data.get("total", 0))
+        bucket.threats = int(data.get("threats", 0))
+        bucket.ips = SpaceSaving(k, {i: list(c) for i, c in data.get("ips", {}).items()})
+        bucket.paths = SpaceSaving(k, {i: list(c) for i, c in data.get("paths", {}).items()})
+        bucket.offenders = SpaceSaving(k, {i: list(c) for i, c in data.get("offenders", {}).items()})
+        return bucket
+
+
+def _minute_of(timestamp):
+    """
+    Epoch minute of an epoch number or a naive-UTC ISO timestamp (as stored in the log).
+    """
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp // 60)
+    return calendar.timegm(datetime.fromisoformat(timestamp).timetuple()) // 60
+
+
+class FirewallRollup:
+    """
+    Bounded ring of per-minute firewall aggregates with periodic persistence.
+    """
+
+    def __init__(self, writer=None, directory=None, minutes=None, top_k=None):
+        self.writer = writer or str(os.getpid())
+        self.directory = directory or log_path("rollups")
+        self.minutes = int(minutes or get_setting("FIREWALL_ROLLUP_MINUTES", "1440"))
+        self.top_k = int(top_k or get_setting("FIREWALL_ROLLUP_TOP_K", "32"))
+        self._buckets = {}  # { minute: _Minute }
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._others_cache = {}  # { file name: (mtime, [_Minute, ...]) }
+        self._persister = None
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"firewall_{self.writer}.json")
+
+    # -------------------------------------------------------------------
+    # Incremental updates
+    # -------------------------------------------------------------------
+    def record(self, ip, path, threat, timestamp=None):
+        """
+        Fold one firewall event into its minute bucket (amortized O(1)).
+        """
+        minute = _minute_of(timestamp if timestamp is not None else time.time())
+        with self._lock:
+            bucket = self._buckets.get(minute)
+            if bucket is None:
+                bucket = self._buckets[minute] = _Minute(minute, self.top_k)
+                self._expire(minute)
+            bucket.total += 1
+            bucket.ips.add(ip)
+            bucket.paths.add(path)
+            if threat:
+                bucket.threats += 1
+                bucket.offenders.add(ip)
+            self._dirty = True
+
+    def _expire(self, newest_minute):
+        cutoff = newest_minute - self.minutes
+        for minute in [m for m in self._buckets if m <= cutoff]:
+            del self._buckets[minute]
+
+    # -------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------
+    def persist(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = {
+                "writer": self.writer,
+                "saved_at": time.time(),
+                "buckets": [b.to_dict() for b in self._buckets.values()],
+            }
+            self._dirty = False
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+
+    def start_persister(self, interval=PERSIST_EVERY_SECONDS):
+        """
+        Persist from a daemon thread so request handling never pays for serialization.
+        """
+        if self._persister is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.persist()
+                except OSError as e:
+                    print(f"⚠️ Firewall rollup persist failed: {e}")
+
+        self._persister = threading.Thread(target=loop, name="firewall-rollup", daemon=True)
+        self._persister.start()
+
+    def load(self):
+        """
+        Restore this writer's persisted buckets (e.g. after a restart).
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        with self._lock:
+            for data in snapshot.get("buckets", []):
+                bucket = _Minute.from_dict(data, self.top_k)
+                self._buckets[bucket.minute] = bucket
+        return True
+
+    def _other_writers(self):
+        """
+        Buckets persisted by other writers (cached by mtime; expired files are removed).
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        buckets = []
+        expired_before = time.time() - self.minutes * 60
+        for name in os.listdir(self.directory):
+            if not (name.startswith("firewall_") and name.endswith(".json")):
+                continue
+            if name == os.path.basename(self.path):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                mtime = os.path.getmtime(path)
+                if mtime < expired_before:
+                    os.remove(path)
+                    self._others_cache.pop(name, None)
+                    continue
+                cached = self._others_cache.get(name)
+                if cached is None or cached[0] != mtime:
+                    with open(path, "r", encoding="utf-8") as f:
+                        snapshot = json.load(f)
+                    cached = (mtime, [_Minute.from_dict(d, self.top_k)
+                                      for d in snapshot.get("buckets", [])])
+                    self._others_cache[name] = cached
+            except (OSError, ValueError):
+                continue
+            buckets.extend(cached[1])
+        return buckets
+
+    # -------------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------------
+    def stats(self, window_minutes=60, top=10, now=None, include_other_writers=True):
+        """
+        Aggregate the last `window_minutes` minutes across all writers.
+        """
+        current = _minute_of(now if now is not None else time.time())
+        first = current - max(1, int(window_minutes)) + 1
+
+        with self._lock:
+            mine = [_Minute.from_dict(b.to_dict(), self.top_k)
+                    for m, b in self._buckets.items() if first <= m <= current]
+        others = self._other_writers() if include_other_writers else []
+
+        total = threats = 0
+        ips, paths, offenders = SpaceSaving(self.top_k), SpaceSaving(self.top_k), SpaceSaving(self.top_k)
+        series = {}
+        for bucket in mine + [b for b in others if first <= b.minute <= current]:
+            total += bucket.total
+            threats += bucket.threats
+            ips.merge(bucket.ips)
+            paths.merge(bucket.paths)
+            offenders.merge(bucket.offenders)
+            point = series.setdefault(bucket.minute, [0, 0])
+            point[0] += bucket.total
+            point[1] += bucket.threats
+
+        return {
+            "window_minutes": current - first + 1,
+            "from": datetime.utcfromtimestamp(first * 60).isoformat(),
+            "to": datetime.utcfromtimestamp((current + 1) * 60).isoformat(),
+            "requests": total,
+            "threats": threats,
+            "top_ips": ips.top(top),
+            "top_paths": paths.top(top),
+            "top_offenders": offenders.top(top),
+            "per_minute": [
+                {
+                    "minute": datetime.utcfromtimestamp(m * 60).isoformat(),
+                    "requests": v[0],
+                    "threats": v[1],
+                }
+                for m, v in sorted(series.items())
+            ],
+        }
+
+
+FIREWALL_ROLLUP = FirewallRollup()
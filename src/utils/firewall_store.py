@@ -0,0 +1,351 @@
+# ========================================================================================
+# File: firewall_store.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Append-only, segmented storage for ProxyMind firewall events, replacing the single
+# proxy_mind_log.json array that had to be fully re-read and re-written on every request.
+#
+# Layout (FIREWALL_LOG_DIR, default <log dir>/firewall/):
+#   segment_<first timestamp>.jsonl   one compact JSON event per line
+#   segment_<first timestamp>.idx     sparse index: "<timestamp>\t<byte offset>" lines
+#
+# A new segment starts once the current one reaches FIREWALL_SEGMENT_MB. Each segment
+# covers [its first timestamp, next segment's first timestamp), so a time-range query
+# opens only overlapping segments and uses the sparse index to seek near `since`
+# instead of scanning from the start. The oldest segments beyond FIREWALL_MAX_SEGMENTS
+# are deleted on roll-over.
+#
+# Writers from several worker processes are serialized with an advisory file lock
+# (fcntl, where available) so byte offsets in the index stay exact.
+# ========================================================================================
+
+import os
+import json
+import base64
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from src.utils.config import get_setting, log_path
+from src.utils.metrics import LOG_WRITE_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+SEGMENT_PREFIX = "segment_"
+SEGMENT_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+_NAME_FORMAT = "%Y%m%dT%H%M%S%f"
+
+
+def _normalize_ts(value):
+    """
+    Normalize an ISO timestamp (or datetime) to the isoformat() used in stored events.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None).isoformat()
+
+
+def encode_cursor(segment, offset):
+    raw = f"{segment}:{offset}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode an opaque cursor into (segment_name, byte_offset); raises ValueError if invalid.
+    """
+    padded = cursor + "=" * (-len(cursor) % 4)
+    segment, offset = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").rsplit(":", 1)
+    if os.path.basename(segment) != segment or not segment.startswith(SEGMENT_PREFIX):
+        raise ValueError("Invalid cursor")
+    return segment, int(offset)
+
+
+class FirewallLogStore:
+    """
+    Segmented JSONL firewall log with a sparse timestamp → byte-offset index.
+    """
+
+    def __init__(self, directory=None, segment_max_bytes=None, index_every_bytes=64 * 1024,
+                 max_segments=None):
+        self.directory = directory or get_setting("FIREWALL_LOG_DIR") or log_path("firewall")
+        self.segment_max_bytes = int(
+            segment_max_bytes or float(get_setting("FIREWALL_SEGMENT_MB", "8")) * 1024 * 1024)
+        self.index_every_bytes = index_every_bytes
+        self.max_segments = int(max_segments or get_setting("FIREWALL_MAX_SEGMENTS", "500"))
+        self._lock = threading.Lock()
+        self._current = None           # current segment file name
+        self._last_indexed = {}        # { segment: last indexed byte offset }
+        self._index_cache = {}         # { segment: (idx_size, [(ts, offset), ...]) }
+
+    # -------------------------------------------------------------------
+    # Segment bookkeeping
+    # -------------------------------------------------------------------
+    def segments(self):
+        """
+        Segment file names sorted oldest → newest.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            n for n in os.listdir(self.directory)
+            if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX))
+
+    @staticmethod
+    def segment_start(segment):
+        stamp = segment[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+        return datetime.strptime(stamp, _NAME_FORMAT).isoformat()
+
+    def _path(self, segment, suffix=SEGMENT_SUFFIX):
+        return os.path.join(self.directory, segment[:-len(SEGMENT_SUFFIX)] + suffix)
+
+    def _new_segment_name(self, timestamp):
+        name = f"{SEGMENT_PREFIX}{datetime.fromisoformat(timestamp).strftime(_NAME_FORMAT)}{SEGMENT_SUFFIX}"
+        # Two segments can never share a start: bump until unique
+        while os.path.exists(os.path.join(self.directory, name)):
+            stamp = datetime.strptime(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)], _NAME_FORMAT)
+            stamp = stamp.replace(microsecond=(stamp.microsecond + 1) % 1000000)
+            name = f"{SEGMENT_PREFIX}{stamp.strftime(_NAME_FORMAT)}{SEGMENT_SUFFIX}"
+        return name
+
+    def _segment_for_write(self, timestamp):
+        """
+        Current segment, rolling to a new one when full (called under the write lock).
+        """
+        if self._current and os.path.exists(os.path.join(self.directory, self._current)):
+            if os.path.getsize(os.path.join(self.directory, self._current)) < self.segment_max_bytes:
+                return self._current
+
+        existing = self.segments()
+        if existing:
+            newest = existing[-1]
+            if os.path.getsize(os.path.join(self.directory, newest)) < self.segment_max_bytes:
+                self._current = newest
+                return newest
+
+        self._current = self._new_segment_name(timestamp)
+        self._enforce_retention(existing + [self._current])
+        return self._current
+
+    def _enforce_retention(self, segments):
+        for old in segments[:-self.max_segments] if len(segments) > self.max_segments else []:
+            for suffix in (SEGMENT_SUFFIX, INDEX_SUFFIX):
+                try:
+                    os.remove(self._path(old, suffix))
+                except OSError:
+                    pass
+            self._last_indexed.pop(old, None)
+            self._index_cache.pop(old, None)
+
+    # -------------------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------------------
+    def append(self, entry):
+        """
+        Append one event (dict with an ISO "timestamp") and maintain the sparse index.
+        """
+        return self.append_many([entry])[-1]
+
+    def append_many(self, entries):
+        """
+        Append a batch of events under a single lock acquisition (guardian sidecar).
+        Returns the (segment, offset) of each event.
+        """
+        with LOG_WRITE_SECONDS.time(log="firewall_log"), self._locked():
+            return self._write(entries)
+
+    @contextmanager
+    def _locked(self):
+        """
+        Exclusive store lock: this process's RLock plus fcntl on <dir>/.lock for workers.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            lock_file = open(os.path.join(self.directory, ".lock"), "a")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def _write(self, entries):
+        """
+        Append events; the caller holds the store lock.
+        """
+        lines = [(json.dumps(e, separators=(",", ":")) + "\n").encode("utf-8") for e in entries]
+        positions = []
+        f = segment = None
+        try:
+            for entry, line in zip(entries, lines):
+                # Roll-over is checked per event, so a batch may span segments
+                current = self._segment_for_write(entry["timestamp"])
+                if current != segment:
+                    if f is not None:
+                        f.close()
+                    segment = current
+                    f = open(os.path.join(self.directory, segment), "ab")
+                    offset = f.seek(0, os.SEEK_END)
+                f.write(line)
+                positions.append((segment, offset))
+
+                last = self._last_indexed.get(segment)
+                if last is None or offset - last >= self.index_every_bytes:
+                    with open(self._path(segment, INDEX_SUFFIX), "a", encoding="utf-8") as idx:
+                        idx.write(f"{entry['timestamp']}\t{offset}\n")
+                    self._last_indexed[segment] = offset
+                offset += len(line)
+        finally:
+            if f is not None:
+                f.close()
+        return positions
+
+    def import_legacy(self, legacy_path):
+        """
+        One-time import of the old proxy_mind_log.json array when no segments exist yet.
+        The legacy file itself is left untouched.
+
+        Every worker calls this at startup, so the "no segments" check and the import
+        run under the store lock: only the first worker imports.
+        """
+        if self.segments() or not os.path.exists(legacy_path):
+            return 0
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not import legacy firewall log: {e}")
+            return 0
+        entries = [e for e in entries if isinstance(e, dict) and e.get("timestamp")]
+        with self._locked():
+            if self.segments():
+                return 0  # another worker imported while we read the legacy file
+            self._write(entries)
+        return len(entries)
+
+    # -------------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------------
+    def _index(self, segment):
+        path = self._path(segment, INDEX_SUFFIX)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return []
+        cached = self._index_cache.get(segment)
+        if cached and cached[0] == size:
+            return cached[1]
+        points = []
+        with open(path, "r", encoding="utf-8") as f:
+            for raw in f:
+                ts, _, offset = raw.rstrip("\n").partition("\t")
+                if offset:
+                    points.append((ts, int(offset)))
+        self._index_cache[segment] = (size, points)
+        return points
+
+    def _seek_offset(self, segment, since):
+        """
+        Largest indexed offset whose timestamp is strictly before `since` (0 if none).
+        """
+        if not since:
+            return 0
+        best = 0
+        for ts, offset in self._index(segment):
+            if ts < since:
+                best = offset
+            else:
+                break
+        return best
+
+    def query(self, since=None, until=None, ip=None, path=None, threat=None,
+              cursor=None, limit=500):
+        """
+        Iterate matching events oldest → newest.
+
+        Yields ("entry", dict) for up to `limit` matches, then a final ("cursor", str|None)
+        whose value resumes the scan right after the last returned entry.
+        """
+        since = _normalize_ts(since)
+        until = _normalize_ts(until)
+        segments = self.segments()
+
+        start_segment, start_offset = (None, None)
+        if cursor:
+            start_segment, start_offset = decode_cursor(cursor)
+
+        returned = 0
+        for i, segment in enumerate(segments):
+            if start_segment and segment < start_segment:
+                continue
+            next_start = self.segment_start(segments[i + 1]) if i + 1 < len(segments) else None
+            if since and next_start and next_start <= since:
+                continue
+            if until and self.segment_start(segment) > until:
+                break
+
+            if start_segment and segment == start_segment:
+                offset = start_offset
+            else:
+                offset = self._seek_offset(segment, since)
+
+            with open(os.path.join(self.directory, segment), "rb") as f:
+                f.seek(offset)
+                for raw in iter(f.readline, b""):
+                    line_offset = offset
+                    offset += len(raw)
+                    if not raw.endswith(b"\n"):
+                        break  # partially written tail; pick it up next time
+                    try:
+                        entry = json.loads(raw)
+                    except ValueError:
+                        continue
+                    ts = entry.get("timestamp", "")
+                    if since and ts < since:
+                        continue
+                    if until and ts > until:
+                        yield "cursor", None
+                        return
+                    if ip and entry.get("ip") != ip:
+                        continue
+                    if path and entry.get("path") != path:
+                        continue
+                    if threat is not None and bool(entry.get("threat_detected")) != threat:
+                        continue
+                    if returned >= limit:
+                        yield "cursor", encode_cursor(segment, line_offset)
+                        return
+                    returned += 1
+                    yield "entry", entry
+
+        yield "cursor", None
+
+    def oldest_segment(self):
+        """
+        Oldest retained segment; changes only when retention deletes segments.
+        """
+        segments = self.segments()
+        return segments[0] if segments else None
+
+    def version(self):
+        """
+        Cheap change marker: (newest segment, its size). Changes after every append.
+        """
+        segments = self.segments()
+        if not segments:
+            return None, 0
+        try:
+            return segments[-1], os.path.getsize(os.path.join(self.directory, segments[-1]))
+        except OSError:
+            return segments[-1], 0
+
+
+FIREWALL_STORE = FirewallLogStore()
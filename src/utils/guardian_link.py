@@ -0,0 +1,239 @@
+# ========================================================================================
+# File: guardian_link.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Fire-and-forget channel from ProxyMind to the guardian_cloeila sidecar
+# (src/guardian_cloeila/main.py), which owns firewall persistence, rollups and threat
+# scoring. The API worker's per-request firewall cost becomes one non-blocking sendto()
+# of a compact binary record on a Unix datagram socket (GUARDIAN_SOCKET, default
+# <log dir>/guardian.sock).
+#
+# Failure handling (the request path never waits on the sidecar):
+# - sidecar down (no socket / nobody bound): send() returns False and ProxyMind writes
+#   the event inline as before; the socket is retried every GUARDIAN_RETRY_SECONDS
+# - sidecar alive but its socket queue is full (Linux queues only
+#   net.unix.max_dgram_qlen datagrams per socket, often 10): the event goes to an
+#   in-process backlog of at most GUARDIAN_BACKLOG events (default 10000). A sender
+#   thread drains it, packing up to MAX_DATAGRAM_BYTES of records into each datagram
+#   and waiting on the sidecar instead of the request. Events arriving while the
+#   backlog is non-empty queue behind it, so a burst reaches the sidecar in a few
+#   batches. When the backlog is full, events are dropped and counted
+#   (cloelia_guardian_events_total{outcome="dropped"}). When the sender finds the
+#   sidecar gone, it hands the backlog to the inline fallback (ProxyMind's writer).
+# GUARDIAN_ENABLED=false keeps everything inline.
+#
+# Record layout (network byte order):
+#   version u8 | flags u8 (bit 0 = threat) | timestamp f64 (epoch seconds) |
+#   ip length u8 | ip bytes | path bytes (UTF-8, at most MAX_PATH_BYTES)
+# Batch datagram: BATCH_VERSION u8 | then per record: length u16 | record
+# ========================================================================================
+
+import time
+import errno
+import socket
+import struct
+import threading
+from collections import deque
+from src.utils.config import get_setting, log_path
+from src.utils.metrics import GUARDIAN_EVENTS
+
+VERSION = 1
+BATCH_VERSION = 2
+FLAG_THREAT = 0x01
+MAX_PATH_BYTES = 512
+MAX_DATAGRAM_BYTES = 64 * 1024
+
+_HEADER = struct.Struct("!BBdB")
+_LENGTH = struct.Struct("!H")
+
+
+def encode_event(ip, path, threat, timestamp):
+    ip_bytes = ip.encode("ascii", "replace")[:255]
+    path_bytes = path.encode("utf-8", "replace")[:MAX_PATH_BYTES]
+    flags = FLAG_THREAT if threat else 0
+    return _HEADER.pack(VERSION, flags, timestamp, len(ip_bytes)) + ip_bytes + path_bytes
+
+
+def decode_event(record):
+    """
+    (ip, path, threat, timestamp) from a record; raises ValueError when malformed.
+    """
+    if len(record) < _HEADER.size:
+        raise ValueError("short record")
+    version, flags, timestamp, ip_length = _HEADER.unpack_from(record)
+    if version != VERSION:
+        raise ValueError(f"unsupported record version {version}")
+    start = _HEADER.size
+    ip = record[start:start + ip_length].decode("ascii", "replace")
+    path = record[start + ip_length:].decode("utf-8", "replace")
+    return ip, path, bool(flags & FLAG_THREAT), timestamp
+
+
+def encode_batch(records):
+    """
+    One datagram carrying several encoded records.
+    """
+    parts = [bytes((BATCH_VERSION,))]
+    for record in records:
+        parts.append(_LENGTH.pack(len(record)))
+        parts.append(record)
+    return b"".join(parts)
+
+
+def decode_datagram(datagram):
+    """
+    Encoded records in a datagram (one, or several for a batch); raises ValueError when
+    a batch is malformed.
+    """
+    if not datagram or datagram[0] != BATCH_VERSION:
+        return [datagram]
+    records = []
+    offset = 1
+    while offset < len(datagram):
+        if offset + _LENGTH.size > len(datagram):
+            raise ValueError("truncated batch")
+        (length,) = _LENGTH.unpack_from(datagram, offset)
+        offset += _LENGTH.size
+        if offset + length > len(datagram):
+            raise ValueError("truncated batch")
+        records.append(datagram[offset:offset + length])
+        offset += length
+    return records
+
+
+def socket_path():
+    return get_setting("GUARDIAN_SOCKET") or log_path("guardian.sock")
+
+
+class GuardianLink:
+    """
+    Non-blocking datagram sender with a bounded backlog drained by a sender thread.
+    """
+
+    def __init__(self, path=None, retry_seconds=None, enabled=None, backlog=None, fallback=None):
+        self.path = path or socket_path()
+        self.retry_seconds = float(retry_seconds or get_setting("GUARDIAN_RETRY_SECONDS", "5"))
+        if enabled is None:
+            enabled = get_setting("GUARDIAN_ENABLED", "true").lower() == "true"
+        self.enabled = enabled and hasattr(socket, "AF_UNIX")
+        self.max_backlog = int(backlog or get_setting("GUARDIAN_BACKLOG") or 10000)
+        # fallback(events) writes [(ip, path, threat, timestamp), ...] inline
+        self.fallback = fallback
+        self.dropped = 0
+        self._sock = None
+        self._down_until = 0.0
+        self._backlog = deque()  # encoded records waiting for the sender thread
+        self._cond = threading.Condition()
+        self._sender = None
+
+    def _socket(self):
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            self._sock = sock
+        return self._sock
+
+    def _mark_down(self):
+        self._down_until = time.monotonic() + self.retry_seconds
+
+    def send(self, ip, path, threat, timestamp=None):
+        """
+        Hand one firewall event to the sidecar. False means "not taken: handle inline";
+        True means sent, queued for the sender thread, or dropped (backlog full).
+        """
+        if not self.enabled:
+            return False
+        if time.monotonic() < self._down_until:
+            GUARDIAN_EVENTS.inc(outcome="inline")
+            return False
+        record = encode_event(ip, path, threat, timestamp if timestamp is not None else time.time())
+        if not self._backlog:
+            try:
+                self._socket().sendto(record, self.path)
+                GUARDIAN_EVENTS.inc(outcome="sent")
+                return True
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.ENOBUFS):
+                    # ENOENT / ECONNREFUSED: sidecar not running
+                    self._mark_down()
+                    GUARDIAN_EVENTS.inc(outcome="inline")
+                    return False
+        # Sidecar alive but behind (or a backlog is already draining): queue it
+        return self._enqueue(record)
+
+    def _enqueue(self, record):
+        with self._cond:
+            if len(self._backlog) >= self.max_backlog:
+                self.dropped += 1
+                GUARDIAN_EVENTS.inc(outcome="dropped")
+                return True
+            self._backlog.append(record)
+            self._cond.notify()
+            if self._sender is None:
+                self._sender = threading.Thread(
+                    target=self._run_sender, name="guardian-sender", daemon=True)
+                self._sender.start()
+        GUARDIAN_EVENTS.inc(outcome="queued")
+        return True
+
+    def backlog(self):
+        return len(self._backlog)
+
+    def _take_batch(self):
+        """
+        Block until the backlog has records; return up to MAX_DATAGRAM_BYTES of them
+        (left in the backlog until sent).
+        """
+        with self._cond:
+            while not self._backlog:
+                self._cond.wait()
+            records, size = [], 1
+            for record in self._backlog:
+                if records and size + _LENGTH.size + len(record) > MAX_DATAGRAM_BYTES:
+                    break
+                records.append(record)
+                size += _LENGTH.size + len(record)
+            return records
+
+    def _run_sender(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.settimeout(1.0)  # blocking send: this thread waits on the sidecar
+        while True:
+            records = self._take_batch()
+            try:
+                sock.sendto(encode_batch(records), self.path)
+            except (socket.timeout, BlockingIOError):
+                continue  # still behind: retry the same batch
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.ENOBUFS):
+                    time.sleep(0.001)
+                    continue
+                self._mark_down()
+                self._flush_inline()
+                continue
+            with self._cond:
+                for _ in records:
+                    self._backlog.popleft()
+
+    def _flush_inline(self):
+        """
+        Sidecar gone: hand the whole backlog to the inline fallback.
+        """
+        with self._cond:
+            records = list(self._backlog)
+            self._backlog.clear()
+        if not records:
+            return
+        GUARDIAN_EVENTS.inc(len(records), outcome="inline")
+        if self.fallback is None:
+            self.dropped += len(records)
+            GUARDIAN_EVENTS.inc(len(records), outcome="dropped")
+            return
+        try:
+            self.fallback([decode_event(record) for record in records])
+        except Exception as e:
+            print(f"⚠️ Writing {len(records)} firewall events inline failed: {e}")
+
+
+GUARDIAN_LINK = GuardianLink()
@@ -0,0 +1,395 @@
+# ========================================================================================
+# File: history_archive.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Cold-history archive for EmotionLog and SymbolicTrigger. Detection only reads each
+# user's latest rows, so rows older than ARCHIVE_AFTER_DAYS (default 90) are moved out
+# of the database into zstd-compressed Parquet files. The hot tables (and their
+# indexes) stay small enough to remain cache-resident.
+#
+# Layout (ARCHIVE_DIR, default <log dir>/archive):
+#   manifest.json                                   tables → files with row counts and
+#                                                   id / timestamp ranges
+#   emotionlog/month=2026-07/bucket=03/part-<first id>-<last id>.parquet
+#   symbolictrigger/month=...
+# Files are partitioned by month and user bucket (user_id % ARCHIVE_USER_BUCKETS), so a
+# per-user history read opens one file per month. Once a month is fully archived its
+# files are compacted into one per bucket.
+#
+# Archive run, per batch of ARCHIVE_BATCH_ROWS rows (oldest ids first):
+#   write Parquet files → publish them in the manifest → DELETE the rows and commit.
+# A crash between the last two steps leaves rows in both places; readers drop the
+# duplicates by id. Files missing from the manifest are never read. On PostgreSQL,
+# monthly EmotionLog partitions left empty are dropped (src/utils/schema.py).
+#
+# Reads: `read_history()` returns a pandas DataFrame from the archive (pruned through the
+# manifest) plus the matching rows still in the database, so analytics never need to
+# know where the cutoff is.
+#
+# pandas / pyarrow are imported on first use to keep application startup light.
+#
+# Usage:
+#   python -m src.utils.history_archive [--days 90] [--dry-run]
+# ========================================================================================
+
+import os
+import sys
+import json
+import argparse
+import threading
+from datetime import datetime, timedelta
+from src.utils.config import get_setting, log_path
+from src.utils.schema import POSTGRESQL, dialect_of, drop_empty_partitions
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+MANIFEST_VERSION = 1
+
+
+class ArchivedTable:
+    __slots__ = ("key", "table", "id_column", "columns")
+
+    def __init__(self, key, table, id_column, columns):
+        self.key = key
+        self.table = table
+        self.id_column = id_column
+        self.columns = columns
+
+
+TABLES = {
+    "emotionlog": ArchivedTable(
+        "emotionlog", "EmotionLog", "log_id",
+        ("log_id", "user_id", "emotion", "context_note", "microexpression_img", "timestamp")),
+    "symbolictrigger": ArchivedTable(
+        "symbolictrigger", "SymbolicTrigger", "trigger_id",
+        ("trigger_id", "user_id", "symbol", "emotion_match", "action_type", "narration_file",
+         "timestamp")),
+}
+
+
+def _pd():
+    import pandas
+    return pandas
+
+
+def _month_bounds(month):
+    start = datetime.strptime(month, "%Y-%m")
+    end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, end
+
+
+class HistoryArchive:
+    """
+    Parquet archive of old rows plus the manifest that indexes it.
+    """
+
+    def __init__(self, directory=None, after_days=None, buckets=None, batch_rows=None):
+        self.directory = directory or get_setting("ARCHIVE_DIR") or log_path("archive")
+        self.after_days = float(after_days or get_setting("ARCHIVE_AFTER_DAYS", "90"))
+        self.buckets = int(buckets or get_setting("ARCHIVE_USER_BUCKETS", "16"))
+        self.batch_rows = int(batch_rows or get_setting("ARCHIVE_BATCH_ROWS", "50000"))
+        self.manifest_path = os.path.join(self.directory, "manifest.json")
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------
+    # Manifest
+    # -------------------------------------------------------------------
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {"version": MANIFEST_VERSION, "tables": {}}
+        for key in TABLES:
+            manifest["tables"].setdefault(key, {"files": [], "rows": 0, "archived_before": None})
+        return manifest
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def cutoff(self):
+        return datetime.utcnow() - timedelta(days=self.after_days)
+
+    # -------------------------------------------------------------------
+    # Archive job
+    # -------------------------------------------------------------------
+    def run(self, conn, cutoff=None, dry_run=False):
+        """
+        Move rows older than `cutoff` into the archive; returns {table key: rows moved}.
+        """
+        cutoff = cutoff or self.cutoff()
+        moved = {}
+        with self._lock, self._file_lock():
+            manifest = self.load_manifest()
+            for spec in TABLES.values():
+                moved[spec.key] = self._archive_table(conn, manifest, spec, cutoff, dry_run)
+            if not dry_run:
+                self._compact(manifest, cutoff)
+        if not dry_run and dialect_of(conn) == POSTGRESQL:
+            cur = conn.cursor()
+            try:
+                dropped = drop_empty_partitions(cur, before=cutoff)
+                conn.commit()
+            finally:
+                cur.close()
+            if dropped:
+                print(f"🗄️ Dropped empty EmotionLog partitions: {', '.join(dropped)}")
+        return moved
+
+    def _file_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return _FileLock(os.path.join(self.directory, ".lock"))
+
+    def _archive_table(self, conn, manifest, spec, cutoff, dry_run):
+        select_sql = (f"SELECT {', '.join(spec.columns)} FROM {spec.table} "
+                      f"WHERE timestamp < %s AND {spec.id_column} > %s "
+                      f"ORDER BY {spec.id_column} LIMIT %s")
+        delete_sql = (f"DELETE FROM {spec.table} WHERE {spec.id_column} >= %s "
+                      f"AND {spec.id_column} <= %s AND timestamp < %s")
+        entry = manifest["tables"][spec.key]
+        after_id = -1
+        total = 0
+        while True:
+            cur = conn.cursor()
+            try:
+                cur.execute(select_sql, (cutoff, after_id, self.batch_rows))
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+            if not rows:
+                break
+            first_id, last_id = rows[0][0], rows[-1][0]
+            after_id = last_id
+            total += len(rows)
+            if dry_run:
+                continue
+
+            entry["files"].extend(self._write_batch(spec, rows))
+            entry["rows"] += len(rows)
+            entry["archived_before"] = cutoff.isoformat()
+            self._save_manifest(manifest)
+
+            cur = conn.cursor()
+            try:
+                cur.execute(delete_sql, (first_id, last_id, cutoff))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+            if len(rows) < self.batch_rows:
+                break
+        if total:
+            verb = "would move" if dry_run else "moved"
+            print(f"🗄️ {spec.table}: {verb} {total} rows older than {cutoff:%Y-%m-%d} to the archive")
+        return total
+
+    def _write_batch(self, spec, rows):
+        """
+        Write one batch as a Parquet file per (month, bucket); returns manifest entries.
+        """
+        pd = _pd()
+        frame = pd.DataFrame.from_records(rows, columns=list(spec.columns))
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"], format="ISO8601")
+        frame["user_id"] = frame["user_id"].astype("int64")
+        months = frame["timestamp"].dt.strftime("%Y-%m")
+        buckets = frame["user_id"] % self.buckets
+        files = []
+        for (month, bucket), part in frame.groupby([months, buckets], sort=True):
+            files.append(self._write_file(spec, month, int(bucket), part))
+        return files
+
+    def _write_file(self, spec, month, bucket, frame):
+        ids = frame[spec.id_column]
+        relative = os.path.join(
+            spec.key, f"month={month}", f"bucket={bucket:02d}",
+            f"part-{int(ids.min())}-{int(ids.max())}.parquet")
+        path = os.path.join(self.directory, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        frame.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+        os.replace(tmp_path, path)
+        return {
+            "path": relative.replace(os.sep, "/"),
+            "month": month,
+            "bucket": bucket,
+            "rows": len(frame),
+            "min_id": int(ids.min()),
+            "max_id": int(ids.max()),
+            "min_ts": frame["timestamp"].min().isoformat(),
+            "max_ts": frame["timestamp"].max().isoformat(),
+        }
+
+    def _compact(self, manifest, cutoff):
+        """
+        Merge the files of every fully archived (month, bucket) into one.
+        """
+        pd = _pd()
+        for key, entry in manifest["tables"].items():
+            spec = TABLES[key]
+            groups = {}
+            for item in entry["files"]:
+                groups.setdefault((item["month"], item["bucket"]), []).append(item)
+            for (month, bucket), items in sorted(groups.items()):
+                if len(items) < 2 or _month_bounds(month)[1] > cutoff:
+                    continue
+                frame = pd.concat(
+                    [pd.read_parquet(os.path.join(self.directory, item["path"])) for item in items],
+                    ignore_index=True)
+                frame = frame.drop_duplicates(spec.id_column).sort_values(spec.id_column)
+                merged = self._write_file(spec, month, bucket, frame)
+                replaced = {item["path"] for item in items} - {merged["path"]}
+                entry["files"] = [item for item in entry["files"] if item["path"] not in replaced
+                                  and item["path"] != merged["path"]] + [merged]
+                entry["rows"] -= sum(item["rows"] for item in items) - merged["rows"]
+                self._save_manifest(manifest)
+                for path in replaced:
+                    try:
+                        os.remove(os.path.join(self.directory, path))
+                    except OSError:
+                        pass
+
+    # -------------------------------------------------------------------
+    # Read-through
+    # -------------------------------------------------------------------
+    def archived_files(self, key, user_id=None, since=None, until=None):
+        """
+        Manifest entries that may hold rows for the filters (pruned by bucket and time).
+        """
+        files = self.load_manifest()["tables"][key]["files"]
+        if user_id is not None:
+            files = [f for f in files if f["bucket"] == int(user_id) % self.buckets]
+        if since is not None:
+            files = [f for f in files if datetime.fromisoformat(f["max_ts"]) >= since]
+        if until is not None:
+            files = [f for f in files if datetime.fromisoformat(f["min_ts"]) < until]
+        return files
+
+    def read_after_id(self, key, after_id, columns=None):
+        """
+        Archived rows of `key` with an id above `after_id` (incremental consumers such as
+        core/emotion_arc.py), or None when the archive holds none.
+        """
+        pd = _pd()
+        spec = TABLES[key]
+        files = [f for f in self.load_manifest()["tables"][key]["files"] if f["max_id"] > after_id]
+        if not files:
+            return None
+        frames = [pd.read_parquet(
+            os.path.join(self.directory, item["path"]), engine="pyarrow", columns=columns,
+            filters=[(spec.id_column, ">", after_id)]) for item in files]
+        return pd.concat(frames, ignore_index=True).drop_duplicates(spec.id_column)
+
+    def read_history(self, conn, key, user_id=None, since=None, until=None):
+        """
+        Rows of `key` ("emotionlog" / "symbolictrigger") from archive and database,
+        oldest first, as a DataFrame. `since` is inclusive, `until` exclusive.
+        """
+        pd = _pd()
+        spec = TABLES[key]
+        filters = []
+        if user_id is not None:
+            filters.append(("user_id", "==", int(user_id)))
+        if since is not None:
+            filters.append(("timestamp", ">=", pd.Timestamp(since)))
+        if until is not None:
+            filters.append(("timestamp", "<", pd.Timestamp(until)))
+
+        frames = []
+        for item in self.archived_files(key, user_id, since, until):
+            frames.append(pd.read_parquet(
+                os.path.join(self.directory, item["path"]), engine="pyarrow",
+                filters=filters or None))
+
+        frames.append(self._read_database(conn, spec, user_id, since, until))
+
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return pd.DataFrame(columns=list(spec.columns))
+        frame = pd.concat(frames, ignore_index=True)
+        frame = frame.drop_duplicates(spec.id_column)
+        return frame.sort_values(["timestamp", spec.id_column], ignore_index=True)
+
+    def _read_database(self, conn, spec, user_id, since, until):
+        pd = _pd()
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = %s")
+            params.append(int(user_id))
+        if since is not None:
+            clauses.append("timestamp >= %s")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < %s")
+            params.append(until)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT {', '.join(spec.columns)} FROM {spec.table}{where}", tuple(params))
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+        frame = pd.DataFrame.from_records(rows, columns=list(spec.columns))
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"], format="ISO8601")
+        return frame
+
+
+class _FileLock:
+    """
+    Exclusive lock file so two archive runs never interleave (no-op without fcntl).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+HISTORY_ARCHIVE = HistoryArchive()
+
+
+def read_history(conn, key, user_id=None, since=None, until=None):
+    return HISTORY_ARCHIVE.read_history(conn, key, user_id, since, until)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old EmotionLog / SymbolicTrigger rows")
+    parser.add_argument("--days", type=float, default=None,
+                        help="archive rows older than this many days (ARCHIVE_AFTER_DAYS)")
+    parser.add_argument("--dry-run", action="store_true", help="count rows, move nothing")
+    args = parser.parse_args(argv)
+
+    from database import get_connection
+    archive = HistoryArchive(after_days=args.days)
+    conn = get_connection()
+    try:
+        moved = archive.run(conn, dry_run=args.dry_run)
+    finally:
+        conn.close()
+    print(f"✅ Archive {'dry run' if args.dry_run else 'run'} complete: {moved}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+# ========================================================================================
+# File: load_shedder.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Adaptive (AIMD) global concurrency limits for ProxyMind. Per-IP rate limiting does not
+# help when a spike comes from many IPs at once; without a global limit every request
+# is accepted and everyone's latency collapses. Here, requests beyond the current limit
+# of their route class are shed with a fast 503 + Retry-After, so the requests that are
+# admitted keep a bounded tail latency.
+#
+# Route classes (each with its own limit and latency history):
+# - "gpt"   POST /gpt/generate-response (seconds per call, upstream-bound)
+# - "read"  other GET / HEAD requests (feeds, logs, UI)
+# - "auth"  POST /auth/login and /auth/register (bcrypt-bound; PasswordHasher has its
+#           own admission queue, so a login flood must not drag down "write")
+# - "write" everything else (emotion logging, analysis)
+# Health checks and long-lived streams (LOAD_SHED_EXEMPT, default "/", /metrics and
+# /events/*) are never limited. Entries match the path exactly; a trailing "*"
+# (e.g. "/events/*") makes an entry a prefix.
+#
+# Algorithm, per class:
+# - The no-load latency is the minimum latency seen over the last one to two
+#   LOAD_SHED_WINDOW_SECONDS windows (so it follows real changes within minutes); the
+#   current latency is an EWMA of recent ones.
+# - While the current latency stays under LOAD_SHED_TOLERANCE × the no-load latency
+#   (plus a small absolute allowance), the limit grows additively (+1 per limit's worth
+#   of completed requests) as long as it is actually being used.
+# - When latency exceeds that, the limit shrinks multiplicatively (× LOAD_SHED_BACKOFF),
+#   at most once per current-latency interval so one slow burst is not punished twice.
+#
+# Limits are per worker process; with N workers the service admits up to N × limit.
+# ========================================================================================
+
+import math
+import time
+from src.utils.config import get_setting
+from src.utils.metrics import LOAD_SHED_LIMIT, LOAD_SHED_INFLIGHT
+
+DEFAULT_EXEMPT = "/,/metrics,/events/*"
+
+# Initial / minimum / maximum concurrent requests per route class
+CLASS_LIMITS = {
+    "gpt": (8, 1, 64),
+    "read": (64, 4, 1000),
+    "write": (32, 2, 500),
+    "auth": (32, 2, 500),
+}
+
+# Routes whose latency is bcrypt work, kept out of the "write" class
+AUTH_PATHS = frozenset(("/auth/login", "/auth/register"))
+
+# Latency increase tolerated over the no-load latency before backing off (seconds)
+LATENCY_ALLOWANCE = 0.05
+
+
+class AIMDLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit for one route class.
+    """
+
+    def __init__(self, name, initial, minimum, maximum, tolerance=2.0, backoff=0.9, window=60.0):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.tolerance = float(tolerance)
+        self.backoff = float(backoff)
+        self.window = float(window)
+        self.inflight = 0
+        self.latency = None    # EWMA of recent latencies
+        self._window_start = time.monotonic()
+        self._window_min = math.inf    # minimum latency in the current window
+        self._previous_min = math.inf  # ... and in the one before
+        self._last_decrease = 0.0
+        self._publish()
+
+    def try_acquire(self):
+        if self.inflight >= int(self.limit):
+            return False
+        self.inflight += 1
+        LOAD_SHED_INFLIGHT.set(self.inflight, route_class=self.name)
+        return True
+
+    def release(self, latency=None):
+        """
+        Return a slot; `latency` (seconds) feeds the limit unless the request failed.
+        """
+        used = self.inflight
+        self.inflight = max(0, self.inflight - 1)
+        LOAD_SHED_INFLIGHT.set(self.inflight, route_class=self.name)
+        if latency is not None:
+            self._observe(latency, used)
+
+    @property
+    def baseline(self):
+        """
+        No-load latency estimate: the minimum over the current and previous window.
+        """
+        baseline = min(self._window_min, self._previous_min)
+        return None if baseline == math.inf else baseline
+
+    def _observe(self, latency, inflight):
+        now = time.monotonic()
+        if now - self._window_start >= self.window:
+            self._previous_min, self._window_min = self._window_min, math.inf
+            self._window_start = now
+        self._window_min = min(self._window_min, latency)
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += 0.2 * (latency - self.latency)
+
+        threshold = self.baseline * self.tolerance + LATENCY_ALLOWANCE
+        if self.latency > threshold:
+            if now - self._last_decrease >= self.latency:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self._last_decrease = now
+                self._publish()
+        elif inflight * 2 >= self.limit:
+            # Only grow a limit that is actually being used
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._publish()
+
+    def retry_after(self):
+        """
+        Seconds a shed client should wait: about one current request duration.
+        """
+        return max(1, int(math.ceil(self.latency or 0)))
+
+    def _publish(self):
+        LOAD_SHED_LIMIT.set(int(self.limit), route_class=self.name)
+
+
+class LoadShedder:
+    """
+    Route classification plus one AIMDLimiter per class.
+    """
+
+    def __init__(self, exempt=None, tolerance=None, backoff=None):
+        exempt = exempt if exempt is not None else get_setting("LOAD_SHED_EXEMPT", DEFAULT_EXEMPT)
+        entries = [p.strip() for p in exempt.split(",") if p.strip()]
+        self.exempt = frozenset(p for p in entries if not p.endswith("*"))
+        self.exempt_prefixes = tuple(p[:-1] for p in entries if p.endswith("*"))
+        tolerance = float(tolerance or get_setting("LOAD_SHED_TOLERANCE", "2.0"))
+        backoff = float(backoff or get_setting("LOAD_SHED_BACKOFF", "0.9"))
+        window = float(get_setting("LOAD_SHED_WINDOW_SECONDS", "60"))
+        self.enabled = get_setting("LOAD_SHED_ENABLED", "true").lower() == "true"
+        self.limiters = {
+            name: AIMDLimiter(
+                name, *limits, tolerance=tolerance, backoff=backoff, window=window)
+            for name, limits in CLASS_LIMITS.items()
+        }
+
+    def is_exempt(self, path):
+        # Exact entries, plus "/x/*" entries covering everything under /x/
+        return path in self.exempt or path.startswith(self.exempt_prefixes)
+
+    @staticmethod
+    def route_class(method, path):
+        if method == "POST" and path.rstrip("/") == "/gpt/generate-response":
+            return "gpt"
+        if method == "POST" and path.rstrip("/") in AUTH_PATHS:
+            return "auth"
+        if method in ("GET", "HEAD"):
+            return "read"
+        return "write"
+
+    def limiter_for(self, method, path):
+        """
+        The limiter governing a request, or None when it is exempt.
+        """
+        if not self.enabled or self.is_exempt(path):
+            return None
+        return self.limiters[self.route_class(method, path)]
+
+
+LOAD_SHEDDER = LoadShedder()
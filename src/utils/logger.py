@@ -8,12 +8,14 @@
 # This module provides logging functionality for symbolic triggers generated by the
 # Cloelia AI Agent. When a symbolic insight is detected (e.g., anger → patience),
 # this logger saves the full event (emotion, virtue, action, and trigger ID)
-# to a persistent JSON file under `src/logs/symbolic_log.json`.
+# to the append-only symbolic log under `src/logs/symbolic_log.jsonl`
+# (see src/utils/trigger_store.py).
 #
 # Features:
 # - Automatically creates the logs directory if missing
 # - Appends new trigger memory with UTC timestamp
-# - Maintains a clean, append-only symbolic memory log
+# - Maintains a clean, append-only symbolic memory log, indexed by user, emotion and
+#   virtue for the trigger feed
 #
 # Usage:
 #   from utils.logger import log_symbolic_trigger
@@ -26,22 +28,18 @@
 #   })
 # ========================================================================================
 
-import os
-import json
 from datetime import datetime
+from src.utils.config import log_path
+from src.utils.trigger_store import TRIGGER_STORE
+from src.utils.event_bus import publish
 
-# Dynamically resolve the full path to symbolic_log.json within src/logs/
-LOG_FILE = os.path.abspath(
-    os.path.join(
-        os.path.dirname(__file__),
-        "..",
-        "logs",
-        "symbolic_log.json"))
+# Legacy single-array log (imported once into the JSONL store at startup)
+LOG_FILE = log_path("symbolic_log.json")
 
 
 def log_symbolic_trigger(data: dict):
     """
-    Appends a symbolic trigger event to the symbolic_log.json file.
+    Appends a symbolic trigger event to the symbolic log.
 
     Parameters:
     - data (dict): A dictionary containing symbolic trigger details:
@@ -52,29 +50,17 @@ def log_symbolic_trigger(data: dict):
         - trigger_id (int)
 
     Behavior:
-    - Ensures the log directory exists
-    - Appends new symbolic insight as a JSON object with UTC timestamp
-    - Creates the log file if it does not exist
+    - Appends new symbolic insight as one JSON line with UTC timestamp (O(1), no
+      re-read of history) and updates the feed indexes
+    - Pushes the entry to live /events subscribers
+    - Creates the log directory and file if they do not exist
     """
 
-    # Ensure the logs directory exists
-    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-
     # Construct log entry with UTC timestamp
     log_entry = {
         "timestamp": datetime.utcnow().isoformat(),
         **data
     }
 
-    # Load existing log entries or initialize a new list
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            log_data = json.load(f)
-    else:
-        log_data = []
-
-    # Append the new memory and write back to the file
-    log_data.append(log_entry)
-
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(log_data, f, indent=4)
+    TRIGGER_STORE.append(log_entry)
+    publish("trigger", log_entry)
@@ -0,0 +1,429 @@
+# ========================================================================================
+# File: metrics.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Low-overhead counters and latency histograms rendered in the Prometheus text format
+# (exposed on GET /metrics by metrics_controller.py).
+#
+# Multi-worker safety:
+# Each worker process keeps its metrics in memory and periodically writes a snapshot to
+# METRICS_DIR/metrics_<pid>.json (default <log dir>/metrics). A scrape flushes the
+# answering worker's own snapshot and merges every snapshot in the directory, so
+# `uvicorn --workers N` / gunicorn report one consistent view. Counters and histograms
+# from workers that have exited are kept so totals never go backwards; clear the
+# directory when (re)deploying the whole service.
+#
+# Usage:
+#   from src.utils.metrics import DEPENDENCY_SECONDS
+#   with DEPENDENCY_SECONDS.time(dependency="elevenlabs"):
+#       generate_audio(...)
+# ========================================================================================
+
+import os
+import json
+import time
+import bisect
+import threading
+from src.utils.config import get_setting, log_path
+
+# Latency buckets in seconds (5 ms → 30 s) suited to DB queries through GPT calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+FLUSH_INTERVAL_SECONDS = 5.0
+
+# Separator for label values inside snapshot keys (never appears in route templates)
+_KEY_SEP = "\x1f"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Timer:
+    """
+    Context manager observing elapsed wall time into a histogram.
+    """
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+    """
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {_KEY_SEP.join(k): v for k, v in self._values.items()}
+
+    @staticmethod
+    def merge(into, snap):
+        for key, value in snap.items():
+            into[key] = into.get(key, 0.0) + value
+
+    def render(self, merged):
+        lines = []
+        for key, value in sorted(merged.items()):
+            values = key.split(_KEY_SEP) if self.labelnames else []
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, values)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram with optional labels.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # { label_key: [bucket_counts..., +Inf count, sum] }
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            cell = self._values.get(key)
+            if cell is None:
+                cell = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            cell[index] += 1
+            cell[-1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {_KEY_SEP.join(k): list(v) for k, v in self._values.items()}
+
+    @staticmethod
+    def merge(into, snap):
+        for key, cell in snap.items():
+            current = into.get(key)
+            if current is None:
+                into[key] = list(cell)
+            else:
+                for i, v in enumerate(cell):
+                    current[i] += v
+
+    def render(self, merged):
+        lines = []
+        bounds = [_format_number(b) for b in self.buckets] + ["+Inf"]
+        for key, cell in sorted(merged.items()):
+            values = key.split(_KEY_SEP) if self.labelnames else []
+            cumulative = 0
+            for bound, count in zip(bounds, cell[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            base = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{base} {_format_number(cell[-1])}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Point-in-time value with optional labels (summed across live workers).
+
+    Snapshots carry the time they were taken; values from workers that stopped
+    flushing (exited) are ignored instead of being summed forever.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            return {_KEY_SEP.join(k): [v, now] for k, v in self._values.items()}
+
+    @staticmethod
+    def merge(into, snap):
+        cutoff = time.time() - 3 * FLUSH_INTERVAL_SECONDS
+        for key, (value, taken_at) in snap.items():
+            if taken_at >= cutoff:
+                into[key] = into.get(key, 0.0) + value
+
+    render = Counter.render
+
+
+class Registry:
+    """
+    Process-wide collection of metrics plus the multi-process snapshot directory.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    @property
+    def directory(self):
+        return get_setting("METRICS_DIR") or log_path("metrics")
+
+    def _snapshot_path(self, pid=None):
+        return os.path.join(self.directory, f"metrics_{pid or os.getpid()}.json")
+
+    def flush(self):
+        """
+        Write this worker's snapshot (temp file + rename so readers never see partials).
+        """
+        data = {name: m.snapshot() for name, m in list(self._metrics.items())}
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._snapshot_path()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def start_flusher(self, interval=FLUSH_INTERVAL_SECONDS):
+        """
+        Start a daemon thread that flushes this worker's snapshot every `interval` s.
+        """
+        if self._flusher is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"⚠️ Metrics flush failed: {e}")
+
+        self._flusher = threading.Thread(target=loop, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+    def collect(self):
+        """
+        Merge snapshots of every worker (including this one, freshly flushed).
+        """
+        try:
+            self.flush()
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+
+        merged = {name: {} for name in self._metrics}
+        for filename in names:
+            if not (filename.startswith("metrics_") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, snap in data.items():
+                metric = self._metrics.get(name)
+                if metric is not None:
+                    metric.merge(merged[name], snap)
+
+        # No readable snapshots (e.g. read-only disk): fall back to this process only
+        if not any(merged.values()):
+            merged = {name: {} for name in self._metrics}
+            for name, metric in self._metrics.items():
+                metric.merge(merged[name], metric.snapshot())
+        return merged
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        merged = self.collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(merged.get(name, {})))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+# -----------------------------------------------------------------------------
+# Shared application metrics
+# -----------------------------------------------------------------------------
+HTTP_REQUESTS = counter(
+    "cloelia_http_requests_total",
+    "HTTP requests handled, by route template and status code.",
+    ("method", "route", "status"))
+
+HTTP_LATENCY = histogram(
+    "cloelia_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route"))
+
+DB_QUERY_SECONDS = histogram(
+    "cloelia_db_query_duration_seconds",
+    "Latency of individual database queries issued by the engines.",
+    ("query",))
+
+DEPENDENCY_SECONDS = histogram(
+    "cloelia_dependency_duration_seconds",
+    "Latency of external dependency calls (GPT bridge, ElevenLabs).",
+    ("dependency", "outcome"))
+
+LOG_WRITE_SECONDS = histogram(
+    "cloelia_log_write_duration_seconds",
+    "Latency of JSON log writes.",
+    ("log",))
+
+PROXYMIND_DECISIONS = counter(
+    "cloelia_proxymind_requests_total",
+    "Requests seen by ProxyMind, by decision (allowed / rate_limited / shed).",
+    ("decision",))
+
+EVENT_SUBSCRIBER_DROPS = counter(
+    "cloelia_event_subscriber_drops_total",
+    "Live event subscribers disconnected for falling behind, by transport (sse / websocket).",
+    ("transport",))
+
+SNAPSHOT_CACHE_REQUESTS = counter(
+    "cloelia_snapshot_cache_requests_total",
+    "Log read endpoint snapshot lookups, by cache and result (hit / miss / not_modified).",
+    ("cache", "result"))
+
+ADMISSION_QUEUE_DEPTH = gauge(
+    "cloelia_admission_queue_depth",
+    "Calls waiting for an upstream slot or budget, by upstream and priority lane.",
+    ("upstream", "lane"))
+
+ADMISSION_WAIT_SECONDS = histogram(
+    "cloelia_admission_wait_seconds",
+    "Time spent waiting for upstream admission, by upstream, lane and outcome.",
+    ("upstream", "lane", "outcome"))
+
+ADMISSION_REJECTIONS = counter(
+    "cloelia_admission_rejections_total",
+    "Upstream calls rejected by admission control, by upstream, lane and reason.",
+    ("upstream", "lane", "reason"))
+
+LOAD_SHED_LIMIT = gauge(
+    "cloelia_load_shed_limit",
+    "Current adaptive concurrency limit per route class (summed across workers).",
+    ("route_class",))
+
+LOAD_SHED_INFLIGHT = gauge(
+    "cloelia_load_shed_inflight",
+    "Requests currently admitted per route class (summed across workers).",
+    ("route_class",))
+
+DECEPTION_DECISIONS = counter(
+    "cloelia_deception_requests_total",
+    "Requests from listed networks diverted before routing, by action (block / tarpit / decoy).",
+    ("action",))
+
+DECEPTION_TARPIT_HELD = gauge(
+    "cloelia_deception_tarpit_connections",
+    "Connections currently held open by the tarpit.")
+
+GUARDIAN_EVENTS = counter(
+    "cloelia_guardian_events_total",
+    "Firewall events by hand-off outcome (sent to guardian_cloeila / queued / dropped / "
+    "inline).",
+    ("outcome",))
+
+PERCEPTION_IMAGES = counter(
+    "cloelia_perception_images_total",
+    "Microexpression image uploads, by result (stored / duplicate / rejected / passthrough).",
+    ("result",))
+
+STATIC_ASSET_RESPONSES = counter(
+    "cloelia_static_asset_responses_total",
+    "Fingerprinted static asset responses, by encoding (br / gzip / identity / not_modified).",
+    ("encoding",))
+
+AUTH_SESSION_CHECKS = counter(
+    "cloelia_auth_session_checks_total",
+    "Session token checks, by result (cached / confirmed / revoked / invalid).",
+    ("result",))
+
+TRIGGER_EVALUATIONS = counter(
+    "cloelia_trigger_evaluations_total",
+    "Background trigger evaluations after log_emotion, by outcome (changed / unchanged / no_match / error).",
+    ("outcome",))
+
+TRIGGER_PENDING_USERS = gauge(
+    "cloelia_trigger_pending_users",
+    "Users with a debounced trigger evaluation waiting to run.")
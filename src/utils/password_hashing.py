@@ -0,0 +1,124 @@
+# ========================================================================================
+# File: password_hashing.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# bcrypt hashing and verification for the auth routes, kept off the event loop. One
+# bcrypt call is ~0.25 s of pure CPU at the default cost; run inline (or in the default
+# thread pool, which shares the GIL-bound process) a login burst stalls every other route.
+#
+# - Work runs in a ProcessPoolExecutor of AUTH_HASH_WORKERS processes (default: cpu
+#   count - 1, at least 1), started on first use with the "spawn" method so workers do
+#   not inherit the app's threads and sockets.
+# - Admission reuses the upstream scheduler in src/utils/admission.py ("bcrypt"): at most
+#   one call per worker runs, AUTH_HASH_MAX_QUEUE more may wait, and a call that cannot
+#   start within AUTH_HASH_DEADLINE_SECONDS is rejected with AdmissionRejected (→ 503 +
+#   Retry-After) instead of piling up. Queue depth / rejections show up on /metrics.
+# - Logins for unknown usernames still verify against a dummy hash, so response time
+#   does not reveal which accounts exist. The dummy hash is computed once, in a worker
+#   thread started by prepare() (main.py startup), never inside a login.
+#
+# Usage:
+#   hashed = await PASSWORD_HASHER.hash(password)
+#   ok = await PASSWORD_HASHER.verify(password, hashed)
+# ========================================================================================
+
+import os
+import asyncio
+import threading
+from src.utils.config import get_setting
+from src.utils.admission import UpstreamScheduler
+
+# bcrypt only looks at the first 72 bytes of a password
+MAX_PASSWORD_BYTES = 72
+
+
+def _secret(password):
+    return password.encode("utf-8")[:MAX_PASSWORD_BYTES]
+
+
+def _hash(password, rounds):
+    import bcrypt
+    return bcrypt.hashpw(_secret(password), bcrypt.gensalt(rounds)).decode("ascii")
+
+
+def _verify(password, hashed):
+    import bcrypt
+    try:
+        return bcrypt.checkpw(_secret(password), hashed.encode("ascii"))
+    except ValueError:  # malformed stored hash
+        return False
+
+
+class PasswordHasher:
+    """
+    bcrypt in a bounded process pool behind an admission queue.
+    """
+
+    def __init__(self, workers=None, rounds=None, max_queue=None, deadline=None):
+        default_workers = max(1, (os.cpu_count() or 2) - 1)
+        self.workers = max(1, int(workers or get_setting("AUTH_HASH_WORKERS") or default_workers))
+        self.rounds = int(rounds or get_setting("AUTH_BCRYPT_ROUNDS", "12"))
+        self.deadline = float(deadline or get_setting("AUTH_HASH_DEADLINE_SECONDS", "2"))
+        # The per-minute budget is not the limit here; slots and the queue are
+        self.scheduler = UpstreamScheduler(
+            "bcrypt", self.workers, 10 ** 9,
+            max_queue or get_setting("AUTH_HASH_MAX_QUEUE") or 8 * self.workers)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._dummy_hash = None
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def _run(self, fn, *args):
+        from concurrent.futures.process import BrokenProcessPool
+        async with self.scheduler.admit(1, "interactive", self.deadline):
+            pool = self._executor()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                # A worker died (OOM kill, ...): start a fresh pool for the next call
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+                raise
+
+    async def hash(self, password):
+        return await self._run(_hash, password, self.rounds)
+
+    def prepare(self):
+        """
+        Start computing the dummy hash (call from the running event loop, at startup).
+        """
+        future = self._dummy_hash
+        if future is None or (future.done() and future.exception() is not None):
+            self._dummy_hash = asyncio.ensure_future(
+                asyncio.to_thread(_hash, os.urandom(16).hex(), self.rounds))
+        return self._dummy_hash
+
+    async def verify(self, password, hashed):
+        """
+        True when `password` matches `hashed`; a None hash (unknown user) still costs
+        one full verification and returns False.
+        """
+        if hashed is None:
+            dummy = await asyncio.shield(self.prepare())
+            await self._run(_verify, password, dummy)
+            return False
+        return await self._run(_verify, password, hashed)
+
+    def shutdown(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+PASSWORD_HASHER = PasswordHasher()
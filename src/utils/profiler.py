@@ -0,0 +1,249 @@
+# ========================================================================================
+# File: profiler.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Opt-in, per-request profiling for endpoints that spike without a visible pattern.
+# A request is profiled (deterministically, with cProfile) when either:
+#   • it carries `X-Cloelia-Profile: 1` together with a valid `X-Admin-Token`, or
+#   • it is picked by the sampling rate PROFILE_SAMPLE_RATE (0.0 – 1.0, default 0).
+# Only paths listed in PROFILE_PATHS are eligible; every other request pays a set lookup
+# and an in-flight count. At most one request is profiled at a time; a requested profile
+# that finds another one running is skipped and answered with `X-Profile-Skipped: busy`.
+#
+# Limits of what a profile shows: cProfile hooks only the event-loop thread, for the
+# whole request. While the request awaits, other coroutines run on that thread and are
+# recorded too. Work handed to asyncio.to_thread or an executor (DB calls, bcrypt, file
+# I/O) shows up only as the await, not as its own frames. Each profile's metadata holds
+# `overlapping_requests`, the number of other requests in flight while it ran; a profile
+# with 0 shows that request alone.
+#
+# Profiles are stored as pstats files in a bounded directory (PROFILE_DIR, default
+# <log dir>/profiles; oldest evicted beyond PROFILE_MAX_FILES / PROFILE_MAX_MB) and are
+# listed/downloaded through /admin/profiles.
+# ========================================================================================
+
+import os
+import io
+import json
+import time
+import uuid
+import random
+import asyncio
+import cProfile
+import pstats
+import threading
+from datetime import datetime
+from src.utils.admin_auth import is_admin_token
+from src.utils.config import get_setting, log_path
+
+PROFILE_HEADER = b"x-cloelia-profile"
+ADMIN_HEADER = b"x-admin-token"
+
+DEFAULT_PROFILE_PATHS = "/gpt/generate-response,/cloelia/analyze-emotion"
+
+
+def _profile_dir():
+    return get_setting("PROFILE_DIR") or log_path("profiles")
+
+
+class ProfileStore:
+    """
+    Bounded on-disk directory of pstats dumps plus small JSON metadata sidecars.
+    """
+
+    def __init__(self, directory=None, max_files=None, max_mb=None):
+        self.directory = directory or _profile_dir()
+        self.max_files = int(max_files or get_setting("PROFILE_MAX_FILES", "50"))
+        self.max_bytes = float(max_mb or get_setting("PROFILE_MAX_MB", "50")) * 1024 * 1024
+        self._lock = threading.Lock()
+
+    def _paths(self, profile_id):
+        base = os.path.join(self.directory, profile_id)
+        return f"{base}.prof", f"{base}.json"
+
+    def save(self, profiler, meta):
+        """
+        Dump a finished profiler and enforce the directory bounds.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        prof_path, meta_path = self._paths(meta["profile_id"])
+        profiler.dump_stats(prof_path)
+        meta["size_bytes"] = os.path.getsize(prof_path)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".prof"):
+                    path = os.path.join(self.directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, name[:-5]))
+            entries.sort(reverse=True)  # newest first
+
+            kept_bytes = 0
+            for index, (_, size, profile_id) in enumerate(entries):
+                kept_bytes += size
+                if index >= self.max_files or kept_bytes > self.max_bytes:
+                    for path in self._paths(profile_id):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+
+    def list(self):
+        """
+        Metadata of stored profiles, newest first.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        records = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    records.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        records.sort(key=lambda r: r.get("started_at", ""), reverse=True)
+        return records
+
+    def path_for(self, profile_id):
+        """
+        Path of a stored .prof file, or None (also rejects anything path-like).
+        """
+        if not profile_id or os.path.basename(profile_id) != profile_id:
+            return None
+        prof_path, _ = self._paths(profile_id)
+        return prof_path if os.path.exists(prof_path) else None
+
+    def summary(self, profile_id, sort="cumulative", limit=40):
+        """
+        Human-readable pstats report for quick inspection without downloading.
+        """
+        prof_path = self.path_for(profile_id)
+        if prof_path is None:
+            return None
+        out = io.StringIO()
+        stats = pstats.Stats(prof_path, stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+PROFILE_STORE = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that wraps eligible requests in cProfile.
+    """
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or PROFILE_STORE
+        self.paths = {
+            p.strip() for p in get_setting("PROFILE_PATHS", DEFAULT_PROFILE_PATHS).split(",")
+            if p.strip()
+        }
+        self.sample_rate = float(get_setting("PROFILE_SAMPLE_RATE", "0"))
+        self._busy = threading.Lock()
+        self._in_flight = 0   # requests inside this middleware (event-loop thread only)
+        self._started = 0
+
+    def _trigger(self, scope):
+        """
+        Return "header", "sample" or None for an eligible request.
+        """
+        headers = dict(scope.get("headers") or [])
+        flag = headers.get(PROFILE_HEADER)
+        if flag and flag.strip() in (b"1", b"true"):
+            token = headers.get(ADMIN_HEADER, b"").decode("latin-1")
+            if is_admin_token(token):
+                return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self._in_flight += 1
+        self._started += 1
+        try:
+            if scope.get("path") not in self.paths:
+                await self.app(scope, receive, send)
+                return
+            trigger = self._trigger(scope)
+            if trigger is None:
+                await self.app(scope, receive, send)
+            elif not self._busy.acquire(blocking=False):
+                await self._skipped(scope, receive, send, trigger)
+            else:
+                await self._profiled(scope, receive, send, trigger)
+        finally:
+            self._in_flight -= 1
+
+    async def _skipped(self, scope, receive, send, trigger):
+        """
+        Another profile is running: serve the request unprofiled, and tell an explicit
+        (header-triggered) caller why.
+        """
+        if trigger != "header":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-skipped", b"busy")]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _profiled(self, scope, receive, send, trigger):
+        profile_id = f"{datetime.utcnow():%Y%m%dT%H%M%S}_{uuid.uuid4().hex[:8]}"
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-profile-id", profile_id.encode("latin-1"))]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        started_at = datetime.utcnow().isoformat()
+        start = time.perf_counter()
+        already_running, started_before = self._in_flight - 1, self._started
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.disable()
+            meta = {
+                "profile_id": profile_id,
+                "path": scope.get("path"),
+                "method": scope.get("method"),
+                "trigger": trigger,
+                "status": status["code"],
+                "started_at": started_at,
+                "duration_ms": round((time.perf_counter() - start) * 1000.0, 2),
+                # Other requests whose coroutines may appear in this profile
+                "overlapping_requests": already_running + self._started - started_before,
+            }
+            try:
+                await asyncio.to_thread(self.store.save, profiler, meta)
+            except OSError as e:
+                print(f"⚠️ Failed to store profile {profile_id}: {e}")
+        finally:
+            self._busy.release()
@@ -0,0 +1,564 @@
+# ========================================================================================
+# File: schema.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Versioned schema for the tables the API reads and writes (EmotionLog, VirtueEntry,
+# SymbolicTrigger, knowledge_base). Applied migrations are recorded in `schema_version`,
+# so running `migrate` again only applies what is new. Existing hand-made tables are
+# kept (CREATE ... IF NOT EXISTS) and gain the missing indexes.
+#
+# Layout (PostgreSQL):
+# - EmotionLog is range-partitioned by month on `timestamp` (emotionlog_y2026m10, ...),
+#   plus a default partition so an insert never fails. An existing unpartitioned
+#   EmotionLog is converted in place (rows copied, ids preserved) by migration 1.
+#   Partitions are created EMOTIONLOG_PARTITION_MONTHS_AHEAD (default 3) months ahead
+#   on every `migrate` run; run it at least monthly (deploy or cron). Rows that reached
+#   the default partition are moved when their month's partition is created.
+# - Indexes serving the hot queries in core/universal_engine.py:
+#     EmotionLog (user_id, timestamp DESC) INCLUDE (emotion)  → recent emotions, no sort
+#     VirtueEntry (emotion_link)                              → virtue lookup
+#     SymbolicTrigger (user_id, timestamp DESC, trigger_id DESC) → latest trigger / history
+#       (trigger_id breaks timestamp ties; migration 5 replaced the two-column index)
+# - EmotionArcDaily + rollup_watermark: daily per-user histograms (core/emotion_arc.py)
+# - UserProfile + UserSession: accounts and login sessions (src/controllers/auth_controller.py)
+# SQLite (the embedded backend and the offline stand-in) gets the same tables and indexes without partitioning.
+#
+# Query-plan check: `check` EXPLAINs the UniversalEngine hot queries (with sequential
+# scans disabled, so a usable index is always preferred) and fails when one of them
+# scans a table or sorts instead of reading an index.
+#
+# Usage:
+#   python -m src.utils.schema migrate   apply pending migrations + upcoming partitions
+#   python -m src.utils.schema status    show the applied schema version
+#   python -m src.utils.schema check     exit 1 if a hot query stops using an index
+# ========================================================================================
+
+import sys
+import json
+import argparse
+from datetime import datetime
+from src.utils.config import get_setting
+
+POSTGRESQL = "postgresql"
+SQLITE = "sqlite"
+
+# Serializes concurrent `migrate` runs (PostgreSQL advisory lock key)
+MIGRATION_LOCK_ID = 0x436C6F65
+
+SCHEMA_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# -------------------------------------------------------------------
+# Migration 1: tables
+# -------------------------------------------------------------------
+_EMOTION_LOG_PARTITIONED = """
+CREATE TABLE EmotionLog (
+    log_id BIGSERIAL,
+    user_id INTEGER NOT NULL,
+    emotion TEXT NOT NULL,
+    context_note TEXT,
+    microexpression_img TEXT,
+    timestamp TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    PRIMARY KEY (log_id, timestamp)
+) PARTITION BY RANGE (timestamp)
+"""
+
+_TABLES = {
+    POSTGRESQL: (
+        """
+        CREATE TABLE IF NOT EXISTS VirtueEntry (
+            virtue_id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            emotion_link TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS SymbolicTrigger (
+            trigger_id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            symbol TEXT,
+            emotion_match TEXT,
+            action_type TEXT,
+            narration_file TEXT,
+            timestamp TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS knowledge_base (
+            id SERIAL PRIMARY KEY,
+            key_fact TEXT NOT NULL
+        )
+        """,
+    ),
+    SQLITE: (
+        """
+        CREATE TABLE IF NOT EXISTS EmotionLog (
+            log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            emotion TEXT NOT NULL,
+            context_note TEXT,
+            microexpression_img TEXT,
+            timestamp TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS VirtueEntry (
+            virtue_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            emotion_link TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS SymbolicTrigger (
+            trigger_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            symbol TEXT,
+            emotion_match TEXT,
+            action_type TEXT,
+            narration_file TEXT,
+            timestamp TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS knowledge_base (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key_fact TEXT NOT NULL
+        )
+        """,
+    ),
+}
+
+
+def _create_tables(cur, dialect):
+    if dialect == POSTGRESQL:
+        _create_partitioned_emotion_log(cur)
+    for statement in _TABLES[dialect]:
+        cur.execute(statement)
+
+
+def _create_partitioned_emotion_log(cur):
+    """
+    Create EmotionLog partitioned by month, converting an unpartitioned table in place.
+    """
+    cur.execute("""
+        SELECT c.relkind FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = current_schema() AND c.relname = 'emotionlog'
+    """)
+    row = cur.fetchone()
+    if row and row[0] == "p":
+        return
+    if row:
+        cur.execute("ALTER TABLE EmotionLog RENAME TO emotionlog_unpartitioned")
+        # The old primary key index keeps its name and would clash with the new one
+        cur.execute("ALTER INDEX IF EXISTS emotionlog_pkey RENAME TO emotionlog_unpartitioned_pkey")
+    cur.execute(_EMOTION_LOG_PARTITIONED)
+    cur.execute("CREATE TABLE EmotionLog_default PARTITION OF EmotionLog DEFAULT")
+    if not row:
+        ensure_partitions(cur)
+        return
+
+    cur.execute("SELECT min(timestamp) FROM emotionlog_unpartitioned")
+    ensure_partitions(cur, start=cur.fetchone()[0])
+    cur.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'emotionlog_unpartitioned'
+    """)
+    columns = [c for (c,) in cur.fetchall()
+               if c in ("log_id", "user_id", "emotion", "context_note",
+                        "microexpression_img", "timestamp")]
+    selected = ["COALESCE(timestamp, now() AT TIME ZONE 'utc')" if c == "timestamp" else c
+                for c in columns]
+    cur.execute(f"INSERT INTO EmotionLog ({', '.join(columns)}) "
+                f"SELECT {', '.join(selected)} FROM emotionlog_unpartitioned")
+    if "log_id" in columns:
+        cur.execute("""
+            SELECT setval(pg_get_serial_sequence('emotionlog', 'log_id'),
+                          COALESCE((SELECT max(log_id) FROM EmotionLog), 0) + 1, false)
+        """)
+    cur.execute("DROP TABLE emotionlog_unpartitioned")
+
+
+# -------------------------------------------------------------------
+# Migration 2: indexes for the hot queries
+# -------------------------------------------------------------------
+_INDEXES = {
+    POSTGRESQL: (
+        # Declared on the parent: every current and future partition gets it
+        "CREATE INDEX IF NOT EXISTS idx_emotionlog_user_ts "
+        "ON EmotionLog (user_id, timestamp DESC) INCLUDE (emotion)",
+        "CREATE INDEX IF NOT EXISTS idx_virtueentry_emotion ON VirtueEntry (emotion_link)",
+        "CREATE INDEX IF NOT EXISTS idx_symbolictrigger_user_ts "
+        "ON SymbolicTrigger (user_id, timestamp DESC)",
+    ),
+    SQLITE: (
+        "CREATE INDEX IF NOT EXISTS idx_emotionlog_user_ts "
+        "ON EmotionLog (user_id, timestamp DESC, emotion)",
+        "CREATE INDEX IF NOT EXISTS idx_virtueentry_emotion ON VirtueEntry (emotion_link)",
+        "CREATE INDEX IF NOT EXISTS idx_symbolictrigger_user_ts "
+        "ON SymbolicTrigger (user_id, timestamp DESC)",
+    ),
+}
+
+
+def _create_indexes(cur, dialect):
+    for statement in _INDEXES[dialect]:
+        cur.execute(statement)
+
+
+# -------------------------------------------------------------------
+# Migration 3: materialized daily emotion / virtue arcs (core/emotion_arc.py)
+# -------------------------------------------------------------------
+_ARC_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS EmotionArcDaily (
+        user_id INTEGER NOT NULL,
+        day DATE NOT NULL,
+        kind TEXT NOT NULL,
+        label TEXT NOT NULL,
+        entries INTEGER NOT NULL,
+        PRIMARY KEY (user_id, day, kind, label)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_watermark (
+        source TEXT PRIMARY KEY,
+        last_id BIGINT NOT NULL
+    )
+    """,
+)
+
+
+def _create_arc_tables(cur, dialect):
+    for statement in _ARC_TABLES:
+        cur.execute(statement)
+
+
+# -------------------------------------------------------------------
+# Migration 4: accounts and login sessions (src/controllers/auth_controller.py)
+# -------------------------------------------------------------------
+_AUTH_TABLES = {
+    POSTGRESQL: (
+        """
+        CREATE TABLE IF NOT EXISTS UserProfile (
+            user_id SERIAL PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+        )
+        """,
+    ),
+    SQLITE: (
+        """
+        CREATE TABLE IF NOT EXISTS UserProfile (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+        """,
+    ),
+}
+
+_SESSION_TABLE = """
+CREATE TABLE IF NOT EXISTS UserSession (
+    session_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES UserProfile (user_id) ON DELETE CASCADE,
+    expires_at TIMESTAMP NOT NULL
+)
+"""
+
+
+def _create_auth_tables(cur, dialect):
+    for statement in _AUTH_TABLES[dialect]:
+        cur.execute(statement)
+    cur.execute(_SESSION_TABLE)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_usersession_expires ON UserSession (expires_at)")
+
+
+# -------------------------------------------------------------------
+# Migration 5: latest-trigger index with a trigger_id tie-breaker
+# -------------------------------------------------------------------
+def _extend_trigger_index(cur, dialect):
+    # LATEST_TRIGGER_SQL orders by (timestamp DESC, trigger_id DESC); the old index is
+    # a prefix of the new one, so it goes
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_symbolictrigger_user_ts_id "
+                "ON SymbolicTrigger (user_id, timestamp DESC, trigger_id DESC)")
+    cur.execute("DROP INDEX IF EXISTS idx_symbolictrigger_user_ts")
+
+
+# (version, name, apply(cur, dialect)); append only, never renumber
+MIGRATIONS = (
+    (1, "tables", _create_tables),  # EmotionLog partitioned by month on PostgreSQL
+    (2, "hot query indexes", _create_indexes),
+    (3, "daily emotion arc rollups", _create_arc_tables),
+    (4, "accounts and sessions", _create_auth_tables),
+    (5, "latest trigger tie-breaker index", _extend_trigger_index),
+)
+
+
+# -------------------------------------------------------------------
+# Monthly EmotionLog partitions (PostgreSQL)
+# -------------------------------------------------------------------
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def ensure_partitions(cur, start=None, months_ahead=None):
+    """
+    Create monthly EmotionLog partitions from `start` (default: this month) through
+    `months_ahead` months from now; returns the names created.
+    """
+    if months_ahead is None:
+        months_ahead = int(get_setting("EMOTIONLOG_PARTITION_MONTHS_AHEAD", "3"))
+    month = _month_start(start or datetime.utcnow())
+    last = _month_start(datetime.utcnow())
+    for _ in range(months_ahead):
+        last = _next_month(last)
+
+    created = []
+    while month <= last:
+        following = _next_month(month)
+        name = f"emotionlog_y{month:%Y}m{month:%m}"
+        cur.execute("SELECT to_regclass(%s)", (name,))
+        if cur.fetchone()[0] is None:
+            _create_partition(cur, name, month, following)
+            created.append(name)
+        month = following
+    return created
+
+
+def _create_partition(cur, name, month, following):
+    """
+    Attach one month; rows already in the default partition for it are moved over
+    (PostgreSQL refuses the partition while the default one holds matching rows).
+    """
+    bounds = (month, following)
+    cur.execute("SELECT 1 FROM EmotionLog_default WHERE timestamp >= %s AND timestamp < %s LIMIT 1",
+                bounds)
+    stranded = cur.fetchone() is not None
+    if stranded:
+        cur.execute("""
+            CREATE TEMP TABLE emotionlog_stranded ON COMMIT DROP AS
+            SELECT * FROM EmotionLog_default WHERE timestamp >= %s AND timestamp < %s
+        """, bounds)
+        cur.execute("DELETE FROM EmotionLog_default WHERE timestamp >= %s AND timestamp < %s",
+                    bounds)
+    cur.execute(f"CREATE TABLE {name} PARTITION OF EmotionLog "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{following:%Y-%m-%d}')")
+    if stranded:
+        cur.execute("INSERT INTO EmotionLog SELECT * FROM emotionlog_stranded")
+        cur.execute("DROP TABLE emotionlog_stranded")
+
+
+def drop_empty_partitions(cur, before):
+    """
+    Drop monthly EmotionLog partitions that ended before `before` and hold no rows
+    (emptied by the history archive, src/utils/history_archive.py); returns their names.
+    """
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'emotionlog' AND c.relname LIKE 'emotionlog_y%'
+        ORDER BY c.relname
+    """)
+    dropped = []
+    for (name,) in cur.fetchall():
+        month = datetime.strptime(name[len("emotionlog_y"):], "%Ym%m")
+        if _next_month(month) > before:
+            continue
+        cur.execute(f"SELECT 1 FROM {name} LIMIT 1")
+        if cur.fetchone() is None:
+            cur.execute(f"DROP TABLE {name}")
+            dropped.append(name)
+    return dropped
+
+
+# -------------------------------------------------------------------
+# Migration runner
+# -------------------------------------------------------------------
+def dialect_of(conn):
+    """
+    psycopg2 connections expose `server_version`; anything else is the SQLite stand-in.
+    """
+    return POSTGRESQL if hasattr(conn, "server_version") else SQLITE
+
+
+def _placeholders(sql, dialect):
+    return sql if dialect == POSTGRESQL else sql.replace("%s", "?")
+
+
+def current_version(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute(SCHEMA_VERSION_TABLE)
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        version = cur.fetchone()[0]
+    finally:
+        cur.close()
+    conn.commit()
+    return version
+
+
+def migrate(conn):
+    """
+    Apply pending migrations (each in its own transaction) and, on PostgreSQL, create
+    upcoming EmotionLog partitions. Returns the versions applied.
+    """
+    dialect = dialect_of(conn)
+    applied = []
+    if dialect == POSTGRESQL:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        cur.close()
+    try:
+        version = current_version(conn)
+        for number, name, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            cur = conn.cursor()
+            try:
+                apply(cur, dialect)
+                cur.execute(_placeholders(
+                    "INSERT INTO schema_version (version, name) VALUES (%s, %s)", dialect),
+                    (number, name))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+            applied.append(number)
+            print(f"🗄️ Applied schema migration {number}: {name}")
+
+        if dialect == POSTGRESQL:
+            cur = conn.cursor()
+            try:
+                created = ensure_partitions(cur)
+                conn.commit()
+            finally:
+                cur.close()
+            if created:
+                print(f"🗄️ Created EmotionLog partitions: {', '.join(created)}")
+    finally:
+        if dialect == POSTGRESQL:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            cur.close()
+            conn.commit()
+    return applied
+
+
+# -------------------------------------------------------------------
+# Query-plan check
+# -------------------------------------------------------------------
+def hot_queries():
+    """
+    (name, sql, sample params, needs index order) for the UniversalEngine queries.
+    """
+    from core.universal_engine import RECENT_EMOTIONS_SQL, VIRTUE_FOR_EMOTION_SQL, LATEST_TRIGGER_SQL
+    return (
+        ("recent_emotions", RECENT_EMOTIONS_SQL, (1,), True),
+        ("virtue_for_emotion", VIRTUE_FOR_EMOTION_SQL, ("anger",), False),
+        ("latest_trigger", LATEST_TRIGGER_SQL, (1,), True),
+    )
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _plan_nodes(child)
+
+
+def _postgres_plan_problems(cur, name, sql, params, ordered):
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql.strip(), params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    problems = []
+    for node in _plan_nodes(plan[0]["Plan"]):
+        node_type = node["Node Type"]
+        if node_type == "Seq Scan":
+            problems.append(f"{name}: sequential scan on {node.get('Relation Name')}")
+        elif ordered and node_type in ("Sort", "Incremental Sort"):
+            problems.append(f"{name}: sorts rows instead of reading the index in order")
+    return problems
+
+
+def _sqlite_plan_problems(cur, name, sql, params, ordered):
+    cur.execute("EXPLAIN QUERY PLAN " + _placeholders(sql.strip(), SQLITE), params)
+    problems = []
+    for row in cur.fetchall():
+        detail = row[-1]
+        if detail.startswith("SCAN ") and "INDEX" not in detail:
+            problems.append(f"{name}: full table scan ({detail})")
+        elif ordered and "TEMP B-TREE" in detail:
+            problems.append(f"{name}: sorts rows instead of reading the index in order")
+    return problems
+
+
+def check_query_plans(conn):
+    """
+    EXPLAIN every hot query; returns a list of problems (empty when all use an index).
+
+    Sequential scans are disabled for the check on PostgreSQL, so the plan shows one
+    only when no index can serve the query, whatever the current table sizes.
+    """
+    dialect = dialect_of(conn)
+    problems = []
+    cur = conn.cursor()
+    try:
+        if dialect == POSTGRESQL:
+            cur.execute("SET LOCAL enable_seqscan = off")
+        for name, sql, params, ordered in hot_queries():
+            if dialect == POSTGRESQL:
+                problems += _postgres_plan_problems(cur, name, sql, params, ordered)
+            else:
+                problems += _sqlite_plan_problems(cur, name, sql, params, ordered)
+    finally:
+        cur.close()
+        conn.rollback()
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cloelia database schema")
+    parser.add_argument("command", choices=("migrate", "status", "check"))
+    args = parser.parse_args(argv)
+
+    from database import get_connection
+    conn = get_connection()
+    try:
+        if args.command == "migrate":
+            applied = migrate(conn)
+            print(f"✅ Schema at version {current_version(conn)} "
+                  f"({len(applied)} migration(s) applied).")
+        elif args.command == "status":
+            version = current_version(conn)
+            pending = [number for number, _, _ in MIGRATIONS if number > version]
+            print(f"Schema version {version}; pending: {pending or 'none'}")
+        else:
+            problems = check_query_plans(conn)
+            for problem in problems:
+                print(f"❌ {problem}")
+            if problems:
+                return 1
+            print("✅ Hot queries use their indexes.")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+# ========================================================================================
+# File: session_auth.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Login sessions for the auth routes. A session is a UserSession row; the client holds
+# a signed token (compact JWT, HS256 with JWT_SECRET_KEY) naming it, sent as
+# `Authorization: Bearer <token>` or the `cloelia_session` cookie.
+#
+# Checking a token on an authenticated request:
+# 1. signature + expiry (HMAC, microseconds): forged or expired tokens never reach
+#    the cache or the database
+# 2. in-memory LRU of verified sessions (AUTH_SESSION_CACHE_SIZE, default 10000)
+# 3. only when the session is not cached, or was last confirmed more than
+#    AUTH_SESSION_RECHECK_SECONDS (default 60) ago, one primary-key lookup confirms it
+#    still exists; logout deletes the row, so other workers honour it within that window
+# bcrypt is only ever involved at login (src/utils/password_hashing.py).
+#
+# JWT_SECRET_KEY must be set in production. Without it a single worker signs with a
+# random per-process secret (sessions end on restart). Under several workers
+# (`--workers` / `-w` on the command line, or WEB_CONCURRENCY) each worker would reject
+# the others' tokens, so login sessions are disabled instead: /auth and every
+# session-protected route answer 503.
+#
+# Usage:
+#   @router.get("/me")
+#   async def me(user: SessionUser = Depends(require_user)): ...
+# ========================================================================================
+
+import os
+import sys
+import hmac
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from fastapi import HTTPException, Request
+from src.utils.config import get_setting
+from src.utils.metrics import AUTH_SESSION_CHECKS, DB_QUERY_SECONDS
+
+SESSION_COOKIE = "cloelia_session"
+
+_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def server_workers(argv=None):
+    """
+    Worker processes the server was started with (uvicorn / gunicorn), 1 if unknown.
+    """
+    argv = sys.argv if argv is None else argv
+    for i, arg in enumerate(argv):
+        for flag in ("--workers", "-w"):
+            value = None
+            if arg == flag and i + 1 < len(argv):
+                value = argv[i + 1]
+            elif arg.startswith(flag + "="):
+                value = arg[len(flag) + 1:]
+            if value is not None and value.isdigit():
+                return int(value)
+    concurrency = os.environ.get("WEB_CONCURRENCY", "")
+    return int(concurrency) if concurrency.isdigit() else 1
+
+
+class SessionUser:
+    __slots__ = ("user_id", "username", "session_id", "expires_at", "checked_at")
+
+    def __init__(self, user_id, username, session_id, expires_at, checked_at):
+        self.user_id = user_id
+        self.username = username
+        self.session_id = session_id
+        self.expires_at = expires_at  # epoch seconds
+        self.checked_at = checked_at  # monotonic
+
+    def to_dict(self):
+        return {"user_id": self.user_id, "username": self.username,
+                "expires_at": datetime.utcfromtimestamp(self.expires_at).isoformat() + "Z"}
+
+
+class SessionStore:
+    """
+    Signed session tokens backed by UserSession rows and an LRU of verified sessions.
+    """
+
+    def __init__(self, secret=None, ttl_seconds=None, cache_size=None, recheck_seconds=None,
+                 connect=None):
+        secret = secret or get_setting("JWT_SECRET_KEY") or get_setting("SECRET_KEY")
+        self.disabled = None  # reason login sessions are unavailable, if they are
+        if not secret:
+            workers = server_workers()
+            if workers > 1:
+                self.disabled = (f"JWT_SECRET_KEY is not set and the server runs {workers} "
+                                 "workers; login sessions are disabled.")
+                print(f"⚠️ {self.disabled}")
+            else:
+                print("⚠️ JWT_SECRET_KEY not set; session tokens will not survive a restart.")
+            secret = secrets.token_hex(32)
+        self._secret = secret.encode("utf-8")
+        self.ttl_seconds = int(ttl_seconds or get_setting("AUTH_SESSION_TTL_SECONDS", str(7 * 86400)))
+        self.cache_size = int(cache_size or get_setting("AUTH_SESSION_CACHE_SIZE", "10000"))
+        self.recheck_seconds = float(recheck_seconds or get_setting("AUTH_SESSION_RECHECK_SECONDS", "60"))
+        self._connect = connect
+        self._cache = OrderedDict()  # session_id → SessionUser, least recently used first
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._connect is not None:
+            return self._connect()
+        import database  # Resolved at call time so stand-ins can replace get_connection
+        return database.get_connection()
+
+    # -------------------------------------------------------------------
+    # Tokens
+    # -------------------------------------------------------------------
+    def _sign(self, signing_input):
+        return _b64encode(hmac.new(self._secret, signing_input, hashlib.sha256).digest())
+
+    def _encode(self, user_id, username, session_id, expires_at):
+        payload = _b64encode(json.dumps(
+            {"sub": str(user_id), "name": username, "sid": session_id, "exp": expires_at},
+            separators=(",", ":")).encode("utf-8"))
+        signing_input = _HEADER + b"." + payload
+        return (signing_input + b"." + self._sign(signing_input)).decode("ascii")
+
+    def _decode(self, token):
+        """
+        Claims of a well-signed, unexpired token, else None.
+        """
+        try:
+            header, payload, signature = token.encode("ascii").split(b".")
+        except (UnicodeEncodeError, ValueError):
+            return None
+        if header != _HEADER or not hmac.compare_digest(self._sign(header + b"." + payload), signature):
+            return None
+        try:
+            claims = json.loads(_b64decode(payload))
+            if claims["exp"] <= time.time():
+                return None
+            return claims
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    # -------------------------------------------------------------------
+    # Cache
+    # -------------------------------------------------------------------
+    def _remember(self, user):
+        with self._lock:
+            self._cache[user.session_id] = user
+            self._cache.move_to_end(user.session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cached(self, session_id):
+        with self._lock:
+            user = self._cache.get(session_id)
+            if user is not None:
+                self._cache.move_to_end(session_id)
+            return user
+
+    def _forget(self, session_id):
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    # -------------------------------------------------------------------
+    # Sessions (blocking: call from a worker thread)
+    # -------------------------------------------------------------------
+    def create(self, user_id, username):
+        """
+        Store a new session and return its token.
+        """
+        session_id = secrets.token_urlsafe(18)
+        expires_at = int(time.time()) + self.ttl_seconds
+        now = datetime.utcnow()
+        conn = self._connection()
+        try:
+            with DB_QUERY_SECONDS.time(query="session_create"), conn.cursor() as cur:
+                cur.execute("DELETE FROM UserSession WHERE expires_at < %s", (now,))
+                cur.execute(
+                    "INSERT INTO UserSession (session_id, user_id, expires_at) VALUES (%s, %s, %s)",
+                    (session_id, user_id, now + timedelta(seconds=self.ttl_seconds)))
+            conn.commit()
+        finally:
+            conn.close()
+        self._remember(SessionUser(user_id, username, session_id, expires_at, time.monotonic()))
+        return self._encode(user_id, username, session_id, expires_at)
+
+    def _confirm(self, session_id):
+        conn = self._connection()
+        try:
+            with DB_QUERY_SECONDS.time(query="session_lookup"), conn.cursor() as cur:
+                cur.execute("SELECT 1 FROM UserSession WHERE session_id = %s AND expires_at > %s",
+                            (session_id, datetime.utcnow()))
+                found = cur.fetchone() is not None
+            conn.rollback()
+            return found
+        finally:
+            conn.close()
+
+    def revoke(self, session_id):
+        self._forget(session_id)
+        conn = self._connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM UserSession WHERE session_id = %s", (session_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # -------------------------------------------------------------------
+    # Request authentication
+    # -------------------------------------------------------------------
+    async def authenticate(self, token):
+        """
+        SessionUser for a valid token, else None.
+        """
+        claims = self._decode(token) if token else None
+        if claims is None:
+            AUTH_SESSION_CHECKS.inc(result="invalid")
+            return None
+        session_id = claims.get("sid")
+        user = self._cached(session_id)
+        if user is not None and time.monotonic() - user.checked_at < self.recheck_seconds:
+            AUTH_SESSION_CHECKS.inc(result="cached")
+            return user
+        if not await asyncio.to_thread(self._confirm, session_id):
+            self._forget(session_id)
+            AUTH_SESSION_CHECKS.inc(result="revoked")
+            return None
+        user = SessionUser(int(claims["sub"]), claims.get("name"), session_id, claims["exp"],
+                           time.monotonic())
+        self._remember(user)
+        AUTH_SESSION_CHECKS.inc(result="confirmed")
+        return user
+
+
+def session_token(request: Request):
+    """
+    The token from `Authorization: Bearer ...`, else the session cookie.
+    """
+    authorization = request.headers.get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip()
+    return request.cookies.get(SESSION_COOKIE)
+
+
+SESSIONS = SessionStore()
+
+
+def require_sessions():
+    """
+    FastAPI dependency: 503 while login sessions are disabled (see the header).
+    """
+    if SESSIONS.disabled:
+        raise HTTPException(status_code=503, detail=SESSIONS.disabled)
+
+
+async def require_user(request: Request):
+    """
+    FastAPI dependency returning the caller's SessionUser (401 without a valid session,
+    503 while sessions are disabled).
+    """
+    require_sessions()
+    user = await SESSIONS.authenticate(session_token(request))
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not logged in.",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return user
@@ -0,0 +1,139 @@
+# ========================================================================================
+# File: snapshot_cache.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Cache of serialized (and lazily gzip-compressed) response bodies for the log read
+# endpoints, so dashboards polling /trigger/trigger-feed and /firewall-log/firewall-log
+# stop paying for a log scan and JSON encoding on every hit.
+#
+# A snapshot is keyed by route + query string and tagged with the version of the log it
+# was built from (the store's cheap change marker). It is reused until that version
+# changes, i.e. it is rebuilt only after a write. Pages that can no longer change
+# (a full page followed by more data, or a time range that ended in the past) are marked
+# immutable and reused regardless of later writes. Callers whose log changes on nearly
+# every request can pass keep_mutable=False: mutable pages are then built per request
+# (still with an ETag, so unchanged pages are answered with 304) and never stored.
+#
+# Every snapshot carries a strong ETag; `If-None-Match` is answered with 304 and no body.
+# Memory is bounded by SNAPSHOT_CACHE_MB (least recently used snapshots are evicted).
+# ========================================================================================
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from fastapi.responses import Response
+from src.utils.config import get_setting
+from src.utils.metrics import SNAPSHOT_CACHE_REQUESTS
+
+# Bodies smaller than this are not worth compressing
+MIN_GZIP_BYTES = 1024
+
+# Entries logged this close to "now" may still be in flight from another worker
+SETTLE_SECONDS = 5
+
+
+class Snapshot:
+    __slots__ = ("key", "body", "version", "immutable", "etag", "gzipped")
+
+    def __init__(self, key, body, version, immutable):
+        self.key = key
+        self.body = body
+        self.version = version
+        self.immutable = immutable
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.gzipped = None
+
+    @property
+    def size(self):
+        return len(self.body) + (len(self.gzipped) if self.gzipped else 0)
+
+
+def settled(until):
+    """
+    True when an ISO `until` bound lies far enough in the past that no new entry can
+    still fall inside it.
+    """
+    if not until:
+        return False
+    bound = datetime.fromisoformat(until.replace("Z", "+00:00")).replace(tzinfo=None)
+    return bound < datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS)
+
+
+class SnapshotCache:
+    """
+    LRU of response snapshots bounded by total bytes.
+    """
+
+    def __init__(self, name, max_mb=None):
+        self.name = name
+        self.max_bytes = float(max_mb or get_setting("SNAPSHOT_CACHE_MB", "32")) * 1024 * 1024
+        self._entries = OrderedDict()  # { key: Snapshot }
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, version, build, keep_mutable=True):
+        """
+        Return a current snapshot for `key`, calling `build()` → (body, immutable) on a miss.
+        With keep_mutable=False only immutable snapshots are stored.
+        """
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is not None and (snapshot.immutable or snapshot.version == version):
+                self._entries.move_to_end(key)
+                SNAPSHOT_CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                return snapshot
+
+        body, immutable = build()
+        snapshot = Snapshot(key, body, version, immutable)
+        SNAPSHOT_CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        if immutable or keep_mutable:
+            self._store(key, snapshot)
+        return snapshot
+
+    def _store(self, key, snapshot):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = snapshot
+            self._bytes += snapshot.size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def respond(self, request, snapshot, media_type="application/json"):
+        """
+        Build a 200 (optionally gzip-encoded) or 304 response for `snapshot`.
+        """
+        headers = {
+            "ETag": snapshot.etag,
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "private, max-age=3600" if snapshot.immutable else "no-cache",
+        }
+        if_none_match = request.headers.get("if-none-match", "")
+        if snapshot.etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+            SNAPSHOT_CACHE_REQUESTS.inc(cache=self.name, result="not_modified")
+            return Response(status_code=304, headers=headers)
+
+        body = snapshot.body
+        if len(body) >= MIN_GZIP_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+            if snapshot.gzipped is None:
+                gzipped = gzip.compress(snapshot.body, compresslevel=6)
+                with self._lock:
+                    if snapshot.gzipped is None:
+                        snapshot.gzipped = gzipped
+                        if self._entries.get(snapshot.key) is snapshot:
+                            self._bytes += len(gzipped)
+            body = snapshot.gzipped
+            headers["Content-Encoding"] = "gzip"
+        return Response(content=body, media_type=media_type, headers=headers)
+
+
+def cache_key(request):
+    """
+    Route path + normalized query string.
+    """
+    return request.url.path, tuple(sorted(request.query_params.multi_items()))
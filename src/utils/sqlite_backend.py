@@ -0,0 +1,387 @@
+# ========================================================================================
+# File: sqlite_backend.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Embedded SQLite storage for single-node deployments (DB_BACKEND=sqlite), so
+# analyze_emotion / log_emotion stop paying a network round trip per query. Connections
+# speak the psycopg2 subset the code base uses (`%s` parameters, `with conn.cursor()`,
+# RETURNING, commit / rollback), so database.get_connection(), UniversalEngine and every
+# controller run unchanged on either backend.
+#
+# Layout (SQLITE_PATH, default <log dir>/cloelia.db):
+# - WAL journal with synchronous=NORMAL: readers never block the writer and a commit is
+#   an append to the WAL, not an fsync of the database file.
+# - Reads run on a per-thread connection (query_only, large page cache, memory-mapped
+#   I/O) that lives as long as the thread, so its prepared-statement cache stays warm
+#   across requests.
+# - Every write transaction runs on one dedicated writer thread that owns the only
+#   write connection. The first write statement of a connection hands its transaction
+#   to the writer (BEGIN IMMEDIATE); later statements and the commit follow it there,
+#   so reads inside a write transaction see its own writes. Transactions are served
+#   one at a time, in arrival order, instead of contending for SQLite's write lock.
+#   A transaction left idle for SQLITE_WRITE_IDLE_SECONDS is rolled back so a leaked
+#   connection cannot stall all writers.
+# The schema (src/utils/schema.py) is applied automatically on first use.
+# ========================================================================================
+
+import re
+import queue
+import sqlite3
+import threading
+from datetime import date, datetime
+from functools import lru_cache
+from src.utils.config import get_setting, log_path
+
+_READ_STATEMENTS = ("SELECT", "WITH", "EXPLAIN", "VALUES")
+_FIRST_WORD = re.compile(r"\s*(\w+)")
+
+
+@lru_cache(maxsize=1024)
+def _translate(sql):
+    """
+    psycopg2 placeholders → SQLite's (cached: the same few statements run all day).
+    """
+    return sql.replace("%s", "?")
+
+
+@lru_cache(maxsize=1024)
+def _is_read(sql):
+    match = _FIRST_WORD.match(sql)
+    return bool(match) and match.group(1).upper() in _READ_STATEMENTS
+
+
+def _adapt(value):
+    # Same text layout as the column defaults, so range comparisons stay lexical
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None).isoformat(sep=" ", timespec="milliseconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _params(params):
+    if params is None:
+        return ()
+    return tuple(_adapt(value) for value in params)
+
+
+class _Request:
+    __slots__ = ("op", "sql", "params", "many", "result", "error", "done")
+
+    def __init__(self, op, sql=None, params=None, many=False):
+        self.op = op
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class _WriteSession:
+    """
+    One write transaction, executed statement by statement on the writer thread.
+    """
+
+    def __init__(self):
+        self.inbox = queue.Queue()
+        self.abandoned = False
+
+    def call(self, op, sql=None, params=None, many=False):
+        if self.abandoned:
+            raise sqlite3.OperationalError("write transaction was rolled back after sitting idle")
+        request = _Request(op, sql, params, many)
+        self.inbox.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+
+class _Result:
+    __slots__ = ("rows", "description", "rowcount", "lastrowid")
+
+    def __init__(self, rows, description, rowcount, lastrowid):
+        self.rows = rows
+        self.description = description
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+
+
+class SQLiteDatabase:
+    """
+    One database file per process: per-thread readers plus a single writer thread.
+    """
+
+    def __init__(self, path=None, cache_mb=None, mmap_mb=None, busy_timeout_ms=None,
+                 idle_seconds=None):
+        self.path = path or get_setting("SQLITE_PATH") or log_path("cloelia.db")
+        self.cache_kib = int(float(cache_mb or get_setting("SQLITE_CACHE_MB", "64")) * 1024)
+        self.mmap_bytes = int(float(mmap_mb or get_setting("SQLITE_MMAP_MB", "256")) * 1024 * 1024)
+        self.busy_timeout_ms = int(busy_timeout_ms or get_setting("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        self.idle_seconds = float(idle_seconds or get_setting("SQLITE_WRITE_IDLE_SECONDS", "30"))
+        self._local = threading.local()
+        self._sessions = queue.Queue()
+        self._writer = None
+        self._lock = threading.Lock()
+        self._ready = False
+
+    # -------------------------------------------------------------------
+    # Connections
+    # -------------------------------------------------------------------
+    def _open(self, writer):
+        conn = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False,
+            timeout=self.busy_timeout_ms / 1000.0, cached_statements=512)
+        if writer:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_kib}")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_bytes}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if not writer:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open(writer=False)
+        return conn
+
+    def connect(self):
+        """
+        A psycopg2-style connection; the first call also starts the writer and applies
+        pending schema migrations.
+        """
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self._start_writer()
+                    from src.utils.schema import migrate
+                    conn = SQLiteConnection(self)
+                    try:
+                        migrate(conn)
+                    finally:
+                        conn.close()
+                    self._ready = True
+        return SQLiteConnection(self)
+
+    # -------------------------------------------------------------------
+    # Writer thread
+    # -------------------------------------------------------------------
+    def _start_writer(self):
+        if self._writer is not None:
+            return
+        conn = self._open(writer=True)  # opened here so a bad path fails the caller
+        self._writer = threading.Thread(
+            target=self._run_writer, args=(conn,), name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+    def begin(self):
+        session = _WriteSession()
+        self._sessions.put(session)
+        return session
+
+    def _run_writer(self, conn):
+        while True:
+            session = self._sessions.get()
+            try:
+                self._serve(conn, session)
+            except Exception as e:  # never let one transaction kill the writer
+                print(f"⚠️ SQLite writer error: {e}")
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+
+    def _serve(self, conn, session):
+        begun = False
+        while True:
+            try:
+                request = session.inbox.get(timeout=self.idle_seconds)
+            except queue.Empty:
+                session.abandoned = True
+                if begun:
+                    conn.execute("ROLLBACK")
+                print(f"⚠️ SQLite write transaction idle for {self.idle_seconds:.0f}s; rolled back")
+                self._drain(session)
+                return
+            try:
+                if request.op in ("commit", "rollback"):
+                    if begun:
+                        conn.execute("COMMIT" if request.op == "commit" else "ROLLBACK")
+                    return
+                if not begun:
+                    conn.execute("BEGIN IMMEDIATE")
+                    begun = True
+                cur = conn.cursor()
+                try:
+                    if request.many:
+                        cur.executemany(request.sql, request.params)
+                    else:
+                        cur.execute(request.sql, request.params)
+                    rows = cur.fetchall() if cur.description else []
+                    request.result = _Result(rows, cur.description, cur.rowcount, cur.lastrowid)
+                finally:
+                    cur.close()
+            except Exception as e:
+                request.error = e
+                if request.op == "commit" and conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                    return
+            finally:
+                request.done.set()
+
+    @staticmethod
+    def _drain(session):
+        """
+        Fail requests that raced with the idle rollback instead of leaving them waiting.
+        """
+        while True:
+            try:
+                request = session.inbox.get_nowait()
+            except queue.Empty:
+                return
+            if request.op != "rollback":
+                request.error = sqlite3.OperationalError(
+                    "write transaction was rolled back after sitting idle")
+            request.done.set()
+
+
+class SQLiteCursor:
+    """
+    psycopg2-style cursor over either a live reader cursor or a writer result.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.itersize = 2000
+        self._live = None
+        self._rows = None
+        self._position = 0
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, query, params=None):
+        return self._run(query, _params(params) if params is not None else None, many=False)
+
+    def executemany(self, query, seq):
+        return self._run(query, [_params(p) for p in seq], many=True)
+
+    def _run(self, query, params, many):
+        sql = _translate(query) if params is not None else query
+        self._live, self._rows, self._position = None, None, 0
+        result = self.connection._execute(sql, params if params is not None else (), many)
+        if isinstance(result, _Result):
+            self._rows = result.rows
+            self.description = result.description
+            self.rowcount = result.rowcount
+            self.lastrowid = result.lastrowid
+        else:
+            self._live = result
+            self.description = result.description
+            self.rowcount = result.rowcount
+            self.lastrowid = result.lastrowid
+        return self
+
+    def fetchone(self):
+        if self._live is not None:
+            return self._live.fetchone()
+        if self._rows is None or self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = size or self.itersize
+        if self._live is not None:
+            return self._live.fetchmany(size)
+        rows = (self._rows or [])[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        if self._live is not None:
+            return self._live.fetchall()
+        rows = (self._rows or [])[self._position:]
+        self._position += len(rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany()
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        if self._live is not None:
+            self._live.close()
+            self._live = None
+        self._rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SQLiteConnection:
+    """
+    psycopg2-style connection; reads go to this thread's reader, writes to the writer.
+    """
+
+    def __init__(self, database):
+        self._database = database
+        self._session = None
+        self.closed = False
+
+    def cursor(self, name=None):
+        return SQLiteCursor(self)
+
+    def _execute(self, sql, params, many):
+        if self._session is None:
+            if not many and _is_read(sql):
+                return self._database.reader().execute(sql, params)
+            self._session = self._database.begin()
+        return self._session.call("execute", sql, params, many)
+
+    def commit(self):
+        session, self._session = self._session, None
+        if session is not None:
+            session.call("commit")
+
+    def rollback(self):
+        session, self._session = self._session, None
+        if session is not None and not session.abandoned:
+            session.call("rollback")
+
+    def close(self):
+        if not self.closed:
+            self.rollback()
+            self.closed = True
+
+    def __del__(self):
+        # A leaked connection must not hold the writer until the idle timeout
+        if self._session is not None and not self._session.abandoned:
+            self._session.inbox.put(_Request("rollback"))
+
+
+_DATABASE = None
+_DATABASE_LOCK = threading.Lock()
+
+
+def get_sqlite_database():
+    """
+    The process-wide SQLiteDatabase for SQLITE_PATH.
+    """
+    global _DATABASE
+    if _DATABASE is None:
+        with _DATABASE_LOCK:
+            if _DATABASE is None:
+                _DATABASE = SQLiteDatabase()
+    return _DATABASE
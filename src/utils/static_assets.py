@@ -0,0 +1,216 @@
+# ========================================================================================
+# File: static_assets.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Build-free asset pipeline for views/static, run once at startup (main.py):
+# - every file is hashed (BLAKE2b) and gets a fingerprinted URL,
+#     css/style.css → /static/css/style.3f9c2a7e10b4d655.css
+#   exposed to templates as `asset_url('css/style.css')`. Fingerprinted URLs are served
+#   with `Cache-Control: public, max-age=31536000, immutable`, so browsers never ask
+#   for them again; a changed file gets a new URL.
+# - text assets (CSS, JS, SVG, JSON, ...) get precompressed siblings in
+#   STATIC_BUILD_DIR (default <log dir>/static_build): .gz always, .br when the optional
+#   `brotli` package is installed. They are picked by Accept-Encoding (br > gzip >
+#   identity) with `Vary: Accept-Encoding`. Siblings are named by content hash, so a
+#   restart with unchanged files recompresses nothing.
+# - plain /static/<path> URLs keep working through StaticFiles (revalidated by ETag).
+#   Runtime-generated files (STATIC_DYNAMIC_DIRS, default audio/responses) are never
+#   fingerprinted.
+#
+# Fully static pages (no per-request data, e.g. /gpt/test) are rendered once per asset
+# build and served from a SnapshotCache with an ETag (If-None-Match → 304).
+# ========================================================================================
+
+import os
+import gzip
+import hashlib
+import mimetypes
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from src.utils.config import get_setting, log_path
+from src.utils.metrics import STATIC_ASSET_RESPONSES
+from src.utils.snapshot_cache import SnapshotCache
+
+STATIC_DIR = os.path.join("views", "static")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+COMPRESSIBLE = {".css", ".js", ".mjs", ".map", ".json", ".svg", ".html", ".txt", ".xml"}
+
+# Files smaller than this gain nothing from a compressed sibling
+MIN_COMPRESS_BYTES = 256
+
+# A sibling is only kept when it saves at least this share of the original size
+MIN_SAVING = 0.1
+
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def accepted_encodings(header):
+    """
+    Content codings from an Accept-Encoding header that are not refused with q=0.
+    """
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+class Asset:
+    __slots__ = ("path", "url", "source", "etag", "media_type", "variants")
+
+    def __init__(self, path, url, source, digest, media_type):
+        self.path = path
+        self.url = url
+        self.source = source
+        self.etag = f'"{digest}"'
+        self.media_type = media_type
+        self.variants = {}  # { encoding: sibling file path }
+
+
+class AssetPipeline:
+    """
+    Fingerprint manifest plus the ASGI app serving /static.
+    """
+
+    def __init__(self, source_dir=None, build_dir=None, prefix="/static", dynamic_dirs=None):
+        self.source_dir = os.path.abspath(source_dir or STATIC_DIR)
+        self.build_dir = build_dir or get_setting("STATIC_BUILD_DIR") or log_path("static_build")
+        self.prefix = prefix
+        if dynamic_dirs is None:
+            dynamic_dirs = get_setting("STATIC_DYNAMIC_DIRS", "audio/responses")
+        if isinstance(dynamic_dirs, str):
+            dynamic_dirs = dynamic_dirs.split(",")
+        self.dynamic_dirs = tuple(d.strip().strip("/") + "/" for d in dynamic_dirs if d.strip())
+        self.version = None
+        self._by_path = {}  # { "css/style.css": Asset }
+        self._by_url = {}   # { "css/style.3f9c….css": Asset }
+        self._fallback = StaticFiles(directory=self.source_dir, check_dir=False)
+
+    def __len__(self):
+        return len(self._by_path)
+
+    def build(self):
+        """
+        Hash every static file and write any missing compressed siblings.
+        """
+        brotli = _brotli()
+        by_path, by_url = {}, {}
+        for root, dirs, files in os.walk(self.source_dir):
+            dirs.sort()
+            for filename in sorted(files):
+                source = os.path.join(root, filename)
+                path = os.path.relpath(source, self.source_dir).replace(os.sep, "/")
+                if path.startswith(self.dynamic_dirs) or filename.startswith("."):
+                    continue
+                with open(source, "rb") as f:
+                    data = f.read()
+                digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+                stem, ext = os.path.splitext(path)
+                asset = Asset(path, f"{stem}.{digest}{ext}", source, digest,
+                              mimetypes.guess_type(filename)[0] or "application/octet-stream")
+                if ext.lower() in COMPRESSIBLE and len(data) >= MIN_COMPRESS_BYTES:
+                    self._compress(asset, data, brotli)
+                by_path[path] = asset
+                by_url[asset.url] = asset
+        self._by_path, self._by_url = by_path, by_url
+        self.version = hashlib.blake2b(
+            "\n".join(sorted(by_url)).encode("utf-8"), digest_size=8).hexdigest()
+        return len(by_path)
+
+    def _compress(self, asset, data, brotli):
+        for encoding, suffix in _ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            target = os.path.join(self.build_dir, asset.url + suffix)
+            if not os.path.exists(target):
+                if encoding == "br":
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) > len(data) * (1 - MIN_SAVING):
+                    continue
+                _write_atomic(target, compressed)
+            asset.variants[encoding] = target
+
+    def url(self, path):
+        """
+        Fingerprinted URL of a static file (template helper `asset_url`); unknown files
+        fall back to their plain /static URL.
+        """
+        path = path.lstrip("/")
+        asset = self._by_path.get(path)
+        return f"{self.prefix}/{asset.url if asset else path}"
+
+    async def __call__(self, scope, receive, send):
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        asset = self._by_url.get(path.lstrip("/"))
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            await self._fallback(scope, receive, send)
+            return
+        await self._respond(asset, Headers(scope=scope))(scope, receive, send)
+
+    def _respond(self, asset, request_headers):
+        headers = {"ETag": asset.etag, "Cache-Control": IMMUTABLE}
+        if asset.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if asset.etag in request_headers.get("if-none-match", ""):
+            STATIC_ASSET_RESPONSES.inc(encoding="not_modified")
+            return Response(status_code=304, headers=headers)
+        if asset.variants:
+            accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for encoding, _ in _ENCODINGS:
+                if encoding in accepted and encoding in asset.variants:
+                    headers["Content-Encoding"] = encoding
+                    STATIC_ASSET_RESPONSES.inc(encoding=encoding)
+                    return FileResponse(
+                        asset.variants[encoding], media_type=asset.media_type, headers=headers)
+        STATIC_ASSET_RESPONSES.inc(encoding="identity")
+        return FileResponse(asset.source, media_type=asset.media_type, headers=headers)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+STATIC_ASSETS = AssetPipeline()
+
+PAGE_CACHE = SnapshotCache("pages")
+
+
+def cached_page(request, templates, name):
+    """
+    Response for a template that needs no request data, rendered once per asset build.
+    """
+    snapshot = PAGE_CACHE.get_or_build(
+        name, STATIC_ASSETS.version,
+        lambda: (templates.get_template(name).render().encode("utf-8"), False))
+    return PAGE_CACHE.respond(request, snapshot, media_type="text/html; charset=utf-8")
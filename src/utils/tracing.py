@@ -0,0 +1,214 @@
+# ========================================================================================
+# File: tracing.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Lightweight per-request tracing for the GPT/TTS and emotion pipelines. A handler opens
+# a trace, wraps each stage in `span(...)`, and on completion the stages are returned as
+# a `Server-Timing` header (visible in browser dev tools) and, optionally, retained in a
+# bounded in-memory ring buffer queryable via GET /admin/traces.
+#
+# Settings:
+# - TRACING_ENABLED   (default true)  → record spans and emit Server-Timing
+# - TRACE_BUFFER_SIZE (default 0)     → keep the last N traces for /admin/traces
+#
+# When tracing is disabled, start_trace() returns None and span() returns a shared no-op
+# context manager, so instrumented code pays a single ContextVar lookup per stage.
+#
+# Usage:
+#   trace = start_trace("generate_response")
+#   with span("bridge_call"):
+#       ...
+#   finish_trace(trace, response)
+# ========================================================================================
+
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from datetime import datetime
+from src.utils.config import get_setting
+
+_current_trace = contextvars.ContextVar("cloelia_trace", default=None)
+
+
+def _flag(name, default):
+    return str(get_setting(name, default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+TRACING_ENABLED = _flag("TRACING_ENABLED", "true")
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        self.trace.spans.append((
+            self.name,
+            (self.start - self.trace.start) * 1000.0,
+            (end - self.start) * 1000.0,
+            exc_type is None,
+        ))
+        return False
+
+
+class Trace:
+    """
+    Spans recorded for a single request.
+    """
+
+    def __init__(self, name):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = datetime.utcnow().isoformat()
+        self.start = time.perf_counter()
+        self.spans = []  # (name, offset_ms, duration_ms, ok)
+        self.duration_ms = None
+        self.status = None
+        self.token = None
+
+    def server_timing(self):
+        """
+        Render spans as a Server-Timing header value (durations in milliseconds).
+        """
+        parts = [f"{name};dur={duration:.1f}" for name, _, duration, _ in self.spans]
+        parts.append(f"total;dur={self.duration_ms:.1f}")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms or 0.0, 2),
+            "status": self.status,
+            "spans": [
+                {
+                    "name": name,
+                    "offset_ms": round(offset, 2),
+                    "duration_ms": round(duration, 2),
+                    "ok": ok,
+                }
+                for name, offset, duration, ok in self.spans
+            ],
+        }
+
+
+class TraceBuffer:
+    """
+    Bounded ring buffer of finished traces (oldest evicted first).
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._traces = deque(maxlen=size) if size > 0 else None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._traces is not None
+
+    def add(self, trace):
+        if self._traces is None:
+            return
+        record = trace.to_dict()
+        with self._lock:
+            self._traces.append(record)
+
+    def query(self, name=None, min_duration_ms=0.0, status=None, limit=50):
+        """
+        Most recent traces first, optionally filtered by handler name, duration and status.
+        """
+        if self._traces is None:
+            return []
+        with self._lock:
+            snapshot = list(self._traces)
+        results = []
+        for record in reversed(snapshot):
+            if name and record["name"] != name:
+                continue
+            if status and record["status"] != status:
+                continue
+            if record["duration_ms"] < min_duration_ms:
+                continue
+            results.append(record)
+            if len(results) >= limit:
+                break
+        return results
+
+    def get(self, trace_id):
+        if self._traces is None:
+            return None
+        with self._lock:
+            for record in self._traces:
+                if record["trace_id"] == trace_id:
+                    return record
+        return None
+
+
+TRACE_BUFFER = TraceBuffer(int(get_setting("TRACE_BUFFER_SIZE", "0")))
+
+
+def start_trace(name):
+    """
+    Open a trace for the current request; returns None when tracing is disabled.
+    """
+    if not TRACING_ENABLED:
+        return None
+    trace = Trace(name)
+    trace.token = _current_trace.set(trace)
+    return trace
+
+
+def span(name):
+    """
+    Time a stage of the current trace (no-op outside a trace or when disabled).
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name)
+
+
+def finish_trace(trace, response=None, status="ok"):
+    """
+    Close a trace, attach Server-Timing / X-Trace-Id to `response`, and retain it in
+    the ring buffer when enabled.
+    """
+    if trace is None:
+        return
+    trace.duration_ms = (time.perf_counter() - trace.start) * 1000.0
+    trace.status = status
+    try:
+        _current_trace.reset(trace.token)
+    except ValueError:
+        # Finished from a different context (e.g. a background task); nothing to reset
+        _current_trace.set(None)
+
+    if response is not None:
+        response.headers["Server-Timing"] = trace.server_timing()
+        response.headers["X-Trace-Id"] = trace.trace_id
+    TRACE_BUFFER.add(trace)
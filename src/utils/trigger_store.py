@@ -0,0 +1,279 @@
+# ========================================================================================
+# File: trigger_store.py
+# Project: CloeliaAI_AgentSystem
+#
+# Purpose:
+# Append-only symbolic trigger log with in-memory secondary indexes, replacing the
+# symbolic_log.json array that was re-read and re-written on every trigger and returned
+# whole by the trigger feed.
+#
+# Layout (<log dir>/):
+#   symbolic_log.jsonl       one compact JSON trigger per line (append order = time order)
+#   symbolic_log.index.json  columnar checkpoint of the indexes for fast startup
+#
+# Every appended line gets a row number. The store keeps per-row columns (timestamp,
+# byte offset, user_id, emotion, virtue) and posting lists { value: [row, ...] } for
+# user_id, emotion and virtue. A query walks the shortest matching posting list from a
+# bisected start row, checks the remaining filters against the columns, and reads only
+# the rows it returns — so latency depends on the page size, not on the log size.
+#
+# Other workers append to the same file; before each query the store indexes whatever
+# was appended since it last looked (a size check when nothing changed).
+# ========================================================================================
+
+import os
+import json
+import bisect
+import threading
+from array import array
+from datetime import datetime
+from src.utils.config import log_path
+from src.utils.metrics import LOG_WRITE_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+INDEXED_FIELDS = ("user_id", "emotion", "virtue")
+
+
+def _normalize_ts(value):
+    if value is None or value == "":
+        return None
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None).isoformat()
+
+
+def _key(value):
+    """
+    Index key for a field value (user ids arrive as int from the API, str from queries).
+    """
+    return None if value is None else str(value)
+
+
+class TriggerLogStore:
+    """
+    JSONL symbolic trigger log with incrementally maintained secondary indexes.
+    """
+
+    def __init__(self, path=None, checkpoint_path=None):
+        self.path = path or log_path("symbolic_log.jsonl")
+        self.checkpoint_path = checkpoint_path or f"{os.path.splitext(self.path)[0]}.index.json"
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._indexed_bytes = 0
+        self._timestamps = []
+        self._offsets = array("q")
+        self._columns = {field: [] for field in INDEXED_FIELDS}
+        self._postings = {field: {} for field in INDEXED_FIELDS}
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    # -------------------------------------------------------------------
+    # Index maintenance
+    # -------------------------------------------------------------------
+    def _add_row(self, entry, offset):
+        row = len(self._timestamps)
+        self._timestamps.append(str(entry.get("timestamp", "")))
+        self._offsets.append(offset)
+        for field in INDEXED_FIELDS:
+            key = _key(entry.get(field))
+            self._columns[field].append(key)
+            if key is not None:
+                self._postings[field].setdefault(key, []).append(row)
+
+    def refresh(self):
+        """
+        Index lines appended since the last call (by this or any other process).
+        """
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return
+            if size < self._indexed_bytes:
+                self._reset()  # log was truncated or replaced
+            if size == self._indexed_bytes:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._indexed_bytes)
+                offset = self._indexed_bytes
+                for raw in iter(f.readline, b""):
+                    if not raw.endswith(b"\n"):
+                        break  # partially written tail; pick it up next time
+                    try:
+                        self._add_row(json.loads(raw), offset)
+                    except ValueError:
+                        pass
+                    offset += len(raw)
+                self._indexed_bytes = offset
+
+    def load_checkpoint(self):
+        """
+        Restore indexes from the checkpoint (if it still matches the log), then catch up.
+        """
+        with self._lock:
+            self._reset()
+            try:
+                with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+                if os.path.getsize(self.path) >= snapshot["indexed_bytes"]:
+                    self._timestamps = snapshot["timestamps"]
+                    self._offsets = array("q", snapshot["offsets"])
+                    for field in INDEXED_FIELDS:
+                        column = snapshot["columns"][field]
+                        self._columns[field] = column
+                        postings = self._postings[field]
+                        for row, key in enumerate(column):
+                            if key is not None:
+                                postings.setdefault(key, []).append(row)
+                    self._indexed_bytes = snapshot["indexed_bytes"]
+            except (OSError, ValueError, KeyError, TypeError):
+                self._reset()
+            self.refresh()
+            return len(self._timestamps)
+
+    def save_checkpoint(self):
+        with self._lock:
+            snapshot = {
+                "indexed_bytes": self._indexed_bytes,
+                "timestamps": self._timestamps,
+                "offsets": self._offsets.tolist(),
+                "columns": self._columns,
+            }
+            tmp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"  # workers save concurrently
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            os.replace(tmp_path, self.checkpoint_path)
+
+    # -------------------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------------------
+    def append(self, entry):
+        """
+        Append one trigger (dict with an ISO "timestamp") and index it.
+        """
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with LOG_WRITE_SECONDS.time(log="symbolic_log"), self._lock:
+            with open(self.path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.write(line)
+                    f.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            # Index our line along with anything other workers appended before it
+            self.refresh()
+
+    def import_legacy(self, legacy_path):
+        """
+        One-time import of the old symbolic_log.json array when the JSONL log is empty.
+        The legacy file itself is left untouched.
+
+        Every worker calls this at startup, so the emptiness check and the import run
+        under the log's exclusive lock: only the first worker imports.
+        """
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            return 0
+        if not os.path.exists(legacy_path):
+            return 0
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not import legacy symbolic log: {e}")
+            return 0
+        lines = b"".join(
+            (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+            for entry in entries if isinstance(entry, dict))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with self._lock:
+            with open(self.path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(f.fileno()).st_size > 0:
+                        return 0  # another worker imported while we read the legacy file
+                    f.write(lines)
+                    f.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            self.refresh()
+        return len(entries)
+
+    # -------------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------------
+    def _candidates(self, filters, start_row):
+        """
+        Ascending row numbers ≥ start_row from the shortest applicable posting list.
+        """
+        lists = [self._postings[field].get(key, []) for field, key in filters.items()]
+        if not lists:
+            return range(start_row, len(self._timestamps))
+        shortest = min(lists, key=len)
+        return (shortest[i] for i in range(bisect.bisect_left(shortest, start_row), len(shortest)))
+
+    def _read_row(self, f, row):
+        f.seek(self._offsets[row])
+        return json.loads(f.readline())
+
+    def query(self, user_id=None, emotion=None, virtue=None, since=None, until=None,
+              cursor=None, limit=100):
+        """
+        Matching triggers oldest → newest.
+
+        Returns (entries, next_cursor); next_cursor is the row to resume from, or None
+        when the result set is exhausted.
+        """
+        self.refresh()
+        since = _normalize_ts(since)
+        until = _normalize_ts(until)
+        filters = {
+            field: _key(value)
+            for field, value in (("user_id", user_id), ("emotion", emotion), ("virtue", virtue))
+            if value is not None and value != ""
+        }
+
+        with self._lock:
+            timestamps = self._timestamps
+            start_row = int(cursor) if cursor else 0
+            if since:
+                start_row = max(start_row, bisect.bisect_left(timestamps, since))
+
+            rows, next_cursor = [], None
+            for row in self._candidates(filters, start_row):
+                if until and timestamps[row] > until:
+                    break
+                if any(self._columns[field][row] != key for field, key in filters.items()):
+                    continue
+                if len(rows) >= limit:
+                    next_cursor = str(row)
+                    break
+                rows.append(row)
+
+            if not rows:
+                return [], next_cursor
+            with open(self.path, "rb") as f:
+                return [self._read_row(f, row) for row in rows], next_cursor
+
+    def version(self):
+        """
+        Cheap change marker: the log size in bytes (changes after every append).
+        """
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+
+TRIGGER_STORE = TriggerLogStore()
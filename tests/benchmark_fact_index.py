@@ -0,0 +1,159 @@
+# =============================================================================
+# File: tests/benchmark_fact_index.py
+# Purpose: Build/load/query benchmark for the TF-IDF fact retrieval index.
+#
+#   Generates a synthetic knowledge_base (default 100k facts over a Zipf-distributed
+#   vocabulary, so posting-list lengths resemble real text), then reports:
+#     • build   – hashing + TF-IDF index construction
+#     • add     – incremental addition of a small batch (into the delta matrix)
+#     • sync    – p50 of single-fact incremental refreshes (FactSampler's path,
+#                 including its save decision)
+#     • save / load (memory-mapped)
+#     • query   – p50 / p99 top-k lookup latency for GPT-style messages
+#   Fails when the p50 query latency exceeds QUERY_BUDGET_MS (default 1.0) or when
+#   a fact is not retrievable by its own distinctive wording (before and after the
+#   delta is folded in).
+#
+# Usage:
+#   python tests/benchmark_fact_index.py [--facts 100000] [--queries 2000]
+# =============================================================================
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from src.utils.fact_index import FactIndex  # noqa: E402
+
+EMOTIONS = ["anger", "fear", "joy", "sadness", "surprise", "disgust", "shame", "envy"]
+VIRTUES = ["patience", "courage", "gratitude", "resilience", "focus", "empathy",
+           "temperance", "humility"]
+SYLLABLES = ["ka", "lo", "mi", "ren", "tha", "vo", "sil", "dra", "pe", "qua", "zor", "nel",
+             "ith", "bar", "cy", "gon", "ul", "fey", "mor", "tes"]
+
+
+def zipf_vocabulary(size, rng):
+    """
+    Pseudo-words with Zipf-like usage weights, so postings lengths look like real text.
+    """
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    weights = [1.0 / (rank + 1) ** 1.05 for rank in range(size)]
+    return words, weights
+
+
+def synthetic_facts(count, seed=11, vocabulary=20000):
+    rng = random.Random(seed)
+    words, weights = zipf_vocabulary(vocabulary, rng)
+    facts = []
+    for i in range(count):
+        body = " ".join(rng.choices(words, weights=weights, k=rng.randint(8, 16)))
+        facts.append((i + 1, f"When {rng.choice(EMOTIONS)} rises, {rng.choice(VIRTUES)} "
+                             f"answers: {body}; lesson token{i} of the archive."))
+    return facts, words, weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TF-IDF fact index benchmark")
+    parser.add_argument("--facts", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=float(os.getenv("QUERY_BUDGET_MS", "1.0")))
+    args = parser.parse_args()
+
+    rows, words, weights = synthetic_facts(args.facts)
+    index = FactIndex(directory=os.path.join(tempfile.mkdtemp(prefix="cloelia_facts_"), "index"))
+
+    t0 = time.perf_counter()
+    index.build(rows)
+    build_s = time.perf_counter() - t0
+
+    extra = [(args.facts + i + 1, f"Newly added harbor wisdom about calm number{i}.")
+             for i in range(100)]
+    t0 = time.perf_counter()
+    index.add(extra)
+    add_ms = (time.perf_counter() - t0) * 1000.0
+
+    in_delta = index.top_k("harbor wisdom number42", 1)
+    found_delta = bool(in_delta) and "number42." in in_delta[0][0]
+
+    sync_samples = []
+    for i in range(50):
+        row = (args.facts + 1000 + i, f"Quiet lighthouse keeper remark serial{i}.")
+        t0 = time.perf_counter()
+        index.sync([row], full=False)
+        sync_samples.append((time.perf_counter() - t0) * 1000.0)
+
+    t0 = time.perf_counter()
+    index.save()
+    save_s = time.perf_counter() - t0
+
+    loaded = FactIndex(directory=index.directory)
+    t0 = time.perf_counter()
+    ok = loaded.load()
+    load_ms = (time.perf_counter() - t0) * 1000.0
+
+    rng = random.Random(3)
+    messages = [
+        f"I keep feeling {rng.choice(EMOTIONS)} and want more {rng.choice(VIRTUES)} about "
+        + " ".join(rng.choices(words, weights=weights, k=rng.randint(3, 8)))
+        for _ in range(args.queries)
+    ]
+    loaded.top_k(messages[0], args.k)  # first call loads scikit-learn's tokenizer
+
+    samples = []
+    for message in messages:
+        t0 = time.perf_counter()
+        loaded.top_k(message, args.k)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    p50 = statistics.median(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+
+    probe = loaded.top_k("token4242 archive", 1)
+    found = bool(probe) and "token4242 " in probe[0][0]
+    added = loaded.top_k("harbor wisdom number42", 1)
+    found_added = bool(added) and "number42." in added[0][0]
+
+    print(json.dumps({
+        "facts": len(loaded),
+        "build_s": round(build_s, 2),
+        "add_100_ms": round(add_ms, 1),
+        "sync_1_p50_ms": round(statistics.median(sync_samples), 2),
+        "save_s": round(save_s, 2),
+        "load_mmap_ms": round(load_ms, 1),
+        "query_p50_ms": round(p50, 3),
+        "query_p99_ms": round(p99, 3),
+        "budget_ms": args.budget_ms,
+    }, indent=2))
+
+    failed = False
+    if not ok:
+        print("❌ Saved index could not be loaded")
+        failed = True
+    if not (found and found_added and found_delta):
+        print("❌ Distinctive facts were not retrieved by their own wording")
+        failed = True
+    if p50 > args.budget_ms:
+        print(f"❌ Median query {p50:.3f} ms exceeds budget {args.budget_ms:.1f} ms")
+        failed = True
+    if not failed:
+        print("✅ Fact retrieval within budget.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
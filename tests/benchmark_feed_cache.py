@@ -0,0 +1,137 @@
+# =============================================================================
+# File: tests/benchmark_feed_cache.py
+# Purpose: Repeated-read benchmark for the cached log read endpoints.
+#
+#   Dashboards poll /trigger/trigger-feed many times a minute. This script fills
+#   a temporary symbolic log, then times (median per request):
+#     • uncached – reads that miss the cache (index lookup + JSON encoding)
+#     • warm     – repeated reads of the unchanged page (served from the snapshot)
+#     • 304      – conditional reads with If-None-Match
+#     • write    – first read after a new trigger is logged (rebuilt exactly once)
+#   The in-process test client's own per-request cost (measured on an empty route)
+#   is subtracted, so the numbers reflect the endpoint itself. It fails when warm
+#   reads are not at least WARM_SPEEDUP_MIN times cheaper than a rebuild, or when a
+#   write does not invalidate the snapshot.
+#
+# Usage:
+#   python tests/benchmark_feed_cache.py [--entries 50000] [--reads 200]
+# =============================================================================
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+WARM_SPEEDUP_MIN = 5.0
+
+
+def fill_logs(log_dir, entries):
+    """
+    Write `entries` triggers directly in the on-disk JSONL format.
+    """
+    start = datetime.utcnow() - timedelta(days=1)
+    with open(os.path.join(log_dir, "symbolic_log.jsonl"), "w", encoding="utf-8") as f:
+        for i in range(entries):
+            f.write(json.dumps({
+                "timestamp": (start + timedelta(milliseconds=i)).isoformat(),
+                "user_id": i % 200,
+                "emotion": ("anger", "joy", "fear", "sadness")[i % 4],
+                "virtue": ("patience", "gratitude", "courage", "hope")[i % 4],
+                "action": "reflection_prompt",
+                "trigger_id": i,
+            }, separators=(",", ":")) + "\n")
+
+
+def timed(client, url, reads, headers=None):
+    samples = []
+    for _ in range(reads):
+        t0 = time.perf_counter()
+        response = client.get(url, headers=headers or {})
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(samples), response
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot cache benchmark for the feeds")
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    log_dir = tempfile.mkdtemp(prefix="cloelia_feed_bench_")
+    os.environ["CLOELIA_LOG_DIR"] = log_dir
+    fill_logs(log_dir, args.entries)
+
+    # Routers only (no ProxyMind): the benchmark must not write to the logs it reads
+    from fastapi import FastAPI, Response
+    from fastapi.testclient import TestClient
+    from src.controllers.trigger_feed_controller import trigger_feed
+    from src.utils.trigger_store import TRIGGER_STORE
+    from src.utils.logger import log_symbolic_trigger
+
+    app = FastAPI()
+    app.include_router(trigger_feed, prefix="/trigger")
+    app.add_api_route("/empty", lambda: Response(b""))
+    client = TestClient(app)
+    TRIGGER_STORE.load_checkpoint()
+
+    # Tail page (not full), so a new matching trigger must invalidate it
+    url = "/trigger/trigger-feed?user_id=1&limit=1000"
+    client.get("/trigger/trigger-feed?limit=1")  # warm up the test client
+    overhead_ms, _ = timed(client, "/empty", args.reads)
+
+    # An unused query parameter makes every read a distinct cache key (always a miss)
+    samples = []
+    for i in range(args.reads):
+        t0 = time.perf_counter()
+        client.get(f"{url}&nocache={i}", headers={"Accept-Encoding": "gzip"})
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    cold_ms = max(statistics.median(samples) - overhead_ms, 0.001)
+
+    first = client.get(url, headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["etag"]
+
+    warm_ms, _ = timed(client, url, args.reads, {"Accept-Encoding": "gzip"})
+    not_modified_ms, conditional = timed(client, url, args.reads, {"If-None-Match": etag})
+    warm_ms = max(warm_ms - overhead_ms, 0.001)
+    not_modified_ms = max(not_modified_ms - overhead_ms, 0.001)
+
+    log_symbolic_trigger({"user_id": 1, "emotion": "joy", "virtue": "gratitude"})
+    t0 = time.perf_counter()
+    after_write = client.get(url, headers={"If-None-Match": etag})
+    rebuild_ms = (time.perf_counter() - t0) * 1000.0 - overhead_ms
+
+    print(json.dumps({
+        "entries": args.entries,
+        "reads": args.reads,
+        "client_overhead_ms": round(overhead_ms, 3),
+        "uncached_median_ms": round(cold_ms, 3),
+        "warm_median_ms": round(warm_ms, 3),
+        "not_modified_median_ms": round(not_modified_ms, 3),
+        "rebuild_after_write_ms": round(rebuild_ms, 2),
+        "page_bytes": len(first.content),
+    }, indent=2))
+
+    failed = False
+    if conditional.status_code != 304:
+        print(f"❌ Conditional read returned {conditional.status_code}, expected 304")
+        failed = True
+    if after_write.status_code != 200 or after_write.headers["etag"] == etag:
+        print("❌ Logging a trigger did not invalidate the cached page")
+        failed = True
+    if cold_ms < warm_ms * WARM_SPEEDUP_MIN:
+        print(f"❌ Warm reads only {cold_ms / warm_ms:.1f}x cheaper than a rebuild")
+        failed = True
+    if not failed:
+        print(f"✅ Repeated reads {cold_ms / warm_ms:.0f}x cheaper than a rebuild.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# =============================================================================
+# File: tests/benchmark_startup.py
+# Purpose: Import-time (cold start) benchmark for `main:app`.
+#
+#   The Render free plan (render.yaml) spins the service down when idle, so every
+#   first request after a sleep pays the full import cost of main.py. This script
+#   imports `main` in fresh interpreters and fails when:
+#     • the median import time exceeds the budget (STARTUP_BUDGET_MS, default 1500)
+#     • a heavy/optional dependency is imported eagerly (networkx, matplotlib, ...)
+#     • importing main fails without optional API keys (e.g. ELEVENLABS_KEY); the
+#       child reads an empty dotenv file (CLOELIA_ENV_FILE), so .env cannot supply them
+#
+# Usage:
+#   python tests/benchmark_startup.py [--runs 5] [--budget-ms 1500]
+# =============================================================================
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Modules that must only load on first use, never at import of main.py
+LAZY_MODULES = [
+    "networkx",
+    "matplotlib",
+    "pandas",
+    "sklearn",
+    "psycopg2",
+    "requests",
+]
+
+# Keys whose absence may only disable a feature, never break startup
+OPTIONAL_KEYS = ["ELEVENLABS_KEY", "OPENAI_KEY"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import main
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({"ms": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def run_probe():
+    """
+    Import main.py in a fresh interpreter without optional keys and report timing.
+    """
+    env = {k: v for k, v in os.environ.items() if k not in OPTIONAL_KEYS}
+    # An empty dotenv file, so load_env() cannot bring the keys back from .env
+    with tempfile.NamedTemporaryFile("w", suffix=".env", delete=False) as empty_env:
+        env["CLOELIA_ENV_FILE"] = empty_env.name
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+    finally:
+        os.remove(empty_env.name)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing main failed:\n{proc.stderr.strip()}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import benchmark for main:app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=float(os.getenv("STARTUP_BUDGET_MS", "1500")))
+    args = parser.parse_args()
+
+    try:
+        samples = [run_probe() for _ in range(args.runs)]
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+
+    timings = [s["ms"] for s in samples]
+    loaded = set(samples[-1]["modules"])
+    eager = [m for m in LAZY_MODULES if m in loaded]
+    median = statistics.median(timings)
+
+    print(json.dumps({
+        "runs": args.runs,
+        "median_ms": round(median, 1),
+        "min_ms": round(min(timings), 1),
+        "max_ms": round(max(timings), 1),
+        "budget_ms": args.budget_ms,
+        "eager_heavy_modules": eager,
+    }, indent=2))
+
+    failed = False
+    if eager:
+        print(f"❌ Heavy modules imported at startup: {', '.join(eager)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"❌ Median import time {median:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("✅ Startup within budget.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# =============================================================================
+# File: tests/check_query_plans.py
+# Purpose: Guard the indexes behind UniversalEngine's hot queries.
+#
+#   Applies the versioned schema (src/utils/schema.py) and EXPLAINs every query
+#   in schema.hot_queries(): the recent-emotions, virtue and latest-trigger
+#   lookups. Fails when any of them scans a table or sorts instead of reading its
+#   index. As a self-check it then drops the EmotionLog index and
+#   expects the check to notice.
+#
+#   By default this runs offline against the SQLite stand-in; --backend sqlite
+#   runs it through the embedded WAL backend (src/utils/sqlite_backend.py), and
+#   --backend postgresql uses the configured database (database.get_connection)
+#   and skips the self-check.
+#
+# Usage:
+#   python tests/check_query_plans.py [--backend standin|sqlite|postgresql]
+# =============================================================================
+
+import os
+import sys
+import argparse
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests", "load"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=("standin", "sqlite", "postgresql"),
+                        default="standin")
+    args = parser.parse_args()
+
+    from src.utils.schema import migrate, check_query_plans
+    from src.utils.sqlite_backend import SQLiteDatabase
+
+    if args.backend == "postgresql":
+        from database import get_connection
+        conn = get_connection()
+        migrate(conn)
+    else:
+        from fake_services import SQLiteStandIn
+        workdir = tempfile.mkdtemp(prefix="cloelia_plans_")
+        db = SQLiteStandIn(os.path.join(workdir, "cloelia.db"), users=200)
+        if args.backend == "sqlite":
+            db = SQLiteDatabase(db.path)
+        conn = db.connect()
+
+    failed = False
+    try:
+        problems = check_query_plans(conn)
+        for problem in problems:
+            print(f"❌ {problem}")
+        failed = bool(problems)
+
+        if args.backend != "postgresql":
+            cur = conn.cursor()
+            cur.execute("DROP INDEX idx_emotionlog_user_ts")
+            cur.close()
+            conn.commit()
+            conn.close()
+            if args.backend == "sqlite":
+                db = SQLiteDatabase(db.path)
+            conn = db.connect()  # a new connection: cached statements keep their old plans
+            if not check_query_plans(conn):
+                print("❌ Dropping idx_emotionlog_user_ts went unnoticed by the plan check")
+                failed = True
+    finally:
+        conn.close()
+
+    if not failed:
+        print("✅ Hot queries use their indexes.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+# =============================================================================
+# File: tests/load/benchmark_login.py
+# Purpose: Login throughput, and whether a login flood slows everything else.
+#
+#   Boots main:app offline exactly like run_load.py, registers --accounts users,
+#   then:
+#     1. probes the other routes alone (baseline latency)
+#     2. floods POST /auth/login with --concurrency clients (a tenth of them
+#        with a wrong password) while the same probe keeps running
+#   and reports login throughput (200 / 401 / 503 counts) plus probe latency
+#   before vs during the flood as JSON. bcrypt runs in the auth process pool,
+#   so probe latency should barely move; excess logins get 503 + Retry-After.
+#
+#   Probed: GET / (health), GET /auth/me (cached session, no bcrypt, no DB),
+#   POST /cloelia/analyze-emotion.
+#
+# Usage:
+#   python tests/load/benchmark_login.py --duration 10 --concurrency 32
+#   python tests/load/benchmark_login.py --backend sqlite --rounds 12
+#
+# Exit code is 1 when any probed route's p95 during the flood exceeds
+# --max-p95-ms (default 100 ms; one bcrypt call on the event loop is ~250 ms), or when
+# any probed request failed (e.g. shed with 503 because of the login flood).
+# =============================================================================
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from run_load import boot_app, _percentile, _round, EMOTIONS  # noqa: E402
+
+PASSWORD = "correct horse battery"
+
+
+def _summary(values, elapsed):
+    values = sorted(values)
+    return {
+        "requests": len(values),
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else None,
+        "p50_ms": _round(_percentile(values, 50)),
+        "p95_ms": _round(_percentile(values, 95)),
+        "p99_ms": _round(_percentile(values, 99)),
+    }
+
+
+def probe(base_url, token, stop, users, interval=0.02):
+    """
+    Hit the probed routes round-robin until `stop` is set; {route: [latency ms]}.
+    """
+    import requests
+
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+    rng = random.Random(1)
+    routes = [
+        ("health", "GET", "/", None),
+        ("auth_me", "GET", "/auth/me", None),
+        ("analyze_emotion", "POST", "/cloelia/analyze-emotion",
+         lambda: {"user_id": rng.randint(1, users), "emotion": rng.choice(EMOTIONS)}),
+    ]
+    samples = defaultdict(list)
+    failures = defaultdict(int)
+    while not stop.is_set():
+        for name, method, path, payload in routes:
+            start = time.perf_counter()
+            resp = session.request(method, base_url + path, json=payload() if payload else None,
+                                   timeout=30)
+            samples[name].append((time.perf_counter() - start) * 1000.0)
+            if resp.status_code >= 400:
+                failures[name] += 1
+        time.sleep(interval)
+    return samples, failures
+
+
+def flood(base_url, accounts, duration, concurrency, seed):
+    """
+    Closed-loop login clients; (status counts, 200-latencies ms, elapsed s).
+    """
+    import requests
+
+    statuses = defaultdict(int)
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(worker_id):
+        rng = random.Random(seed + worker_id)
+        session = requests.Session()
+        local_statuses, local_latencies = defaultdict(int), []
+        while time.perf_counter() < stop_at:
+            password = PASSWORD if rng.random() >= 0.1 else "wrong password"
+            start = time.perf_counter()
+            resp = session.post(base_url + "/auth/login", timeout=30, json={
+                "username": rng.choice(accounts), "password": password})
+            local_statuses[resp.status_code] += 1
+            if resp.status_code == 200:
+                local_latencies.append((time.perf_counter() - start) * 1000.0)
+            elif resp.status_code == 503:
+                time.sleep(min(float(resp.headers.get("Retry-After", "1")), 1.0))
+        with lock:
+            for status, count in local_statuses.items():
+                statuses[status] += count
+            latencies.extend(local_latencies)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return statuses, latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of login flood")
+    parser.add_argument("--baseline-duration", type=float, default=3.0,
+                        help="seconds of probing before the flood")
+    parser.add_argument("--concurrency", type=int, default=32, help="login clients")
+    parser.add_argument("--accounts", type=int, default=8)
+    parser.add_argument("--users", type=int, default=50, help="user_ids for analyze-emotion")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost (AUTH_BCRYPT_ROUNDS)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--backend", choices=("standin", "sqlite"), default="standin")
+    parser.add_argument("--max-p95-ms", type=float, default=100.0,
+                        help="fail when a probed route's p95 during the flood exceeds this")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args()
+
+    import requests
+
+    os.environ["AUTH_BCRYPT_ROUNDS"] = str(args.rounds)
+    workdir = tempfile.mkdtemp(prefix="cloelia_login_")
+    base_url, cleanup = boot_app(workdir, args.users, 0.0, 0.0, backend=args.backend)
+    try:
+        accounts = [f"bench-user-{i}" for i in range(args.accounts)]
+        for username in accounts:
+            resp = requests.post(base_url + "/auth/register", timeout=60,
+                                 json={"username": username, "password": PASSWORD})
+            resp.raise_for_status()
+        token = requests.post(base_url + "/auth/login", timeout=60, json={
+            "username": accounts[0], "password": PASSWORD}).json()["token"]
+
+        stop = threading.Event()
+        timer = threading.Timer(args.baseline_duration, stop.set)
+        timer.start()
+        baseline, baseline_failures = probe(base_url, token, stop, args.users)
+
+        stop = threading.Event()
+        during = {}
+        prober = threading.Thread(
+            target=lambda: during.update(zip(("samples", "failures"),
+                                             probe(base_url, token, stop, args.users))))
+        prober.start()
+        statuses, latencies, elapsed = flood(
+            base_url, accounts, args.duration, args.concurrency, args.seed)
+        stop.set()
+        prober.join()
+    finally:
+        cleanup()
+
+    logins = _summary(latencies, elapsed)
+    logins["statuses"] = {str(status): count for status, count in sorted(statuses.items())}
+    routes = {}
+    slow = []
+    failed = []
+    for name in baseline:
+        before = _summary(baseline[name], args.baseline_duration)
+        after = _summary(during["samples"].get(name, []), elapsed)
+        routes[name] = {"baseline": before, "during_flood": after,
+                        "failures": baseline_failures.get(name, 0) + during["failures"].get(name, 0)}
+        if after["p95_ms"] and after["p95_ms"] > args.max_p95_ms:
+            slow.append(f"{name}: p95 {after['p95_ms']} ms during flood vs {before['p95_ms']} ms")
+        if routes[name]["failures"]:
+            failed.append(f"{name}: {routes[name]['failures']} failed requests")
+
+    result = {
+        "logins": logins,
+        "probes": routes,
+        "slowdowns": slow,
+        "failures": failed,
+        "config": {
+            "duration_s": round(elapsed, 2),
+            "concurrency": args.concurrency,
+            "accounts": args.accounts,
+            "bcrypt_rounds": args.rounds,
+            "backend": args.backend,
+            "workdir": workdir,
+        },
+    }
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return 1 if slow or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
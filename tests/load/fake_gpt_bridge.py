@@ -0,0 +1,34 @@
+# =============================================================================
+# File: tests/load/fake_gpt_bridge.py
+# Purpose: Offline stand-in for node_clients/gpt_bridge.mjs.
+#          Prints the same strict JSON payload ({"role", "content", ...}) after a
+#          configurable delay (FAKE_GPT_DELAY_MS, default 150).
+#
+# Usage (via GPT_BRIDGE_CMD):
+#   GPT_BRIDGE_CMD="python tests/load/fake_gpt_bridge.py" uvicorn main:app
+# =============================================================================
+
+import os
+import sys
+import json
+import time
+
+if __name__ == "__main__":
+    user_input = " ".join(sys.argv[1:]).strip()
+    time.sleep(float(os.getenv("FAKE_GPT_DELAY_MS", "150")) / 1000.0)
+
+    if not user_input:
+        print(json.dumps({
+            "role": "assistant",
+            "content": "",
+            "refusal": "API_ERROR",
+            "annotations": [{"error": "Empty user input."}]
+        }))
+        sys.exit(1)
+
+    print(json.dumps({
+        "role": "assistant",
+        "content": f"In reflecting on '{user_input[:60]}', patience becomes a doorway.",
+        "refusal": None,
+        "annotations": []
+    }))
@@ -0,0 +1,162 @@
+# =============================================================================
+# File: tests/load/fake_services.py
+# Purpose: Local stand-ins for every external dependency of main:app so the load
+#          test runs fully offline:
+#            • FakeElevenLabsServer → HTTP server answering /text-to-speech/{voice}
+#            • SQLiteStandIn        → throwaway SQLite DB speaking the psycopg2
+#                                     subset used by the controllers (%s params,
+#                                     `with conn.cursor()`, RETURNING)
+#            • fake_gpt_bridge.py   → drop-in for node_clients/gpt_bridge.mjs
+# =============================================================================
+
+import os
+import time
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.utils.schema import migrate
+
+# A few bytes that look enough like an MP3 frame header for a browser to try it
+FAKE_MP3 = b"ID3\x03\x00\x00\x00\x00\x00\x00" + b"\xff\xfb\x90\x64" + b"\x00" * 512
+
+EMOTION_VIRTUES = [
+    ("anger", "Patience"),
+    ("fear", "Courage"),
+    ("disgust", "Empathy"),
+    ("sadness", "Resilience"),
+    ("surprise", "Focus"),
+    ("happiness", "Compassion"),
+]
+
+
+# -----------------------------------------------------------------------------
+# Fake ElevenLabs
+# -----------------------------------------------------------------------------
+class FakeElevenLabsServer:
+    """
+    Minimal ElevenLabs text-to-speech stand-in with a configurable service delay.
+    """
+
+    def __init__(self, delay_ms=40.0, host="127.0.0.1", port=0):
+        delay = delay_ms / 1000.0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.rfile.read(length)
+                if not self.headers.get("xi-api-key"):
+                    self.send_response(401)
+                    self.end_headers()
+                    return
+                time.sleep(delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/mpeg")
+                self.send_header("Content-Length", str(len(FAKE_MP3)))
+                self.end_headers()
+                self.wfile.write(FAKE_MP3)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# -----------------------------------------------------------------------------
+# Throwaway SQLite stand-in for PostgreSQL
+# -----------------------------------------------------------------------------
+class _Cursor:
+    """
+    Wraps sqlite3.Cursor with psycopg2-style `%s` placeholders and context management.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        self._cursor.execute(query.replace("%s", "?"), params)
+        return self
+
+    def executemany(self, query, seq):
+        self._cursor.executemany(query.replace("%s", "?"), seq)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Connection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+
+    def cursor(self, name=None):
+        return _Cursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLiteStandIn:
+    """
+    Throwaway database file with the tables main:app expects (src/utils/schema.py),
+    seeded for load tests.
+    """
+
+    def __init__(self, path, users=50, history_per_user=20, facts=200):
+        self.path = path
+        if os.path.exists(path):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        migrate(conn)
+        conn.executemany(
+            "INSERT INTO VirtueEntry (name, emotion_link) VALUES (?, ?)",
+            [(virtue, emotion) for emotion, virtue in EMOTION_VIRTUES])
+        conn.executemany(
+            "INSERT INTO EmotionLog (user_id, emotion) VALUES (?, ?)",
+            [(uid, EMOTION_VIRTUES[(uid + i) % len(EMOTION_VIRTUES)][0])
+             for uid in range(1, users + 1) for i in range(history_per_user)])
+        conn.executemany(
+            "INSERT INTO knowledge_base (key_fact) VALUES (?)",
+            [(f"Symbolic fact #{i}: virtue grows where emotion is named.",)
+             for i in range(facts)])
+        conn.commit()
+        conn.close()
+
+    def connect(self):
+        return _Connection(self.path)
@@ -0,0 +1,285 @@
+# =============================================================================
+# File: tests/load/run_load.py
+# Purpose: Offline end-to-end load test / benchmark for main:app.
+#
+#   Boots the real FastAPI app in-process (uvicorn on a free local port) against
+#   local stand-ins only — no network, no OpenAI, no ElevenLabs, no PostgreSQL:
+#     • FakeElevenLabsServer   (ELEVENLABS_BASE_URL)
+#     • fake_gpt_bridge.py     (GPT_BRIDGE_CMD)
+#     • SQLiteStandIn          (database.get_connection), or with --backend sqlite
+#       the embedded WAL backend itself (DB_BACKEND=sqlite) on the same seeded file
+#     • throwaway log/audio dirs (CLOELIA_LOG_DIR, AUDIO_OUTPUT_DIR)
+#
+#   Drives a weighted mix of traffic across the main routes and reports
+#   throughput plus p50/p95/p99 latency per route as JSON.
+#
+# Usage:
+#   python tests/load/run_load.py --duration 20 --concurrency 16
+#   python tests/load/run_load.py --backend sqlite
+#   python tests/load/run_load.py --output run.json --save-baseline tests/load/baseline.json
+#   python tests/load/run_load.py --baseline tests/load/baseline.json --tolerance 0.2
+#
+# Exit code is 1 when --baseline is given and any route regresses past tolerance.
+# =============================================================================
+
+import os
+import sys
+import json
+import time
+import shlex
+import random
+import socket
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_services import FakeElevenLabsServer, SQLiteStandIn, EMOTION_VIRTUES  # noqa: E402
+
+EMOTIONS = [emotion for emotion, _ in EMOTION_VIRTUES]
+MESSAGES = [
+    "What virtue opposes fear?",
+    "How do I stay patient when I am angry?",
+    "Tell me about resilience after loss.",
+    "Why does surprise sharpen focus?",
+]
+
+# (name, method, path, weight, payload factory)
+ROUTES = [
+    ("analyze_emotion", "POST", "/cloelia/analyze-emotion", 30,
+     lambda rng, users: {"user_id": rng.randint(1, users), "emotion": rng.choice(EMOTIONS)}),
+    ("log_emotion", "POST", "/emotion/log-emotion", 30,
+     lambda rng, users: {"user_id": rng.randint(1, users), "emotion": rng.choice(EMOTIONS),
+                         "context_note": "load-test"}),
+    ("generate_response", "POST", "/gpt/generate-response", 10,
+     lambda rng, users: {"message": rng.choice(MESSAGES)}),
+    ("trigger_feed", "GET", "/trigger/trigger-feed", 20, None),
+    ("firewall_log", "GET", "/firewall-log/firewall-log", 10, None),
+]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def boot_app(workdir, users, tts_delay_ms, gpt_delay_ms, backend="standin"):
+    """
+    Configure the environment for local stand-ins, import main:app and serve it.
+
+    Returns (base_url, cleanup), where cleanup() stops the server and the fake TTS.
+    """
+    tts = FakeElevenLabsServer(delay_ms=tts_delay_ms).start()
+    db = SQLiteStandIn(os.path.join(workdir, "cloelia.db"), users=users)
+
+    os.environ.update({
+        "CLOELIA_LOG_DIR": os.path.join(workdir, "logs"),
+        "AUDIO_OUTPUT_DIR": os.path.join(workdir, "audio"),
+        "ELEVENLABS_KEY": "offline-fake-key",
+        "ELEVENLABS_BASE_URL": tts.base_url,
+        "OPENAI_KEY": "offline-fake-key",
+        "GPT_BRIDGE_CMD": " ".join(shlex.quote(p) for p in [
+            sys.executable, os.path.join(ROOT, "tests", "load", "fake_gpt_bridge.py")]),
+        "FAKE_GPT_DELAY_MS": str(gpt_delay_ms),
+        "PROXYMIND_MAX_REQUESTS_PER_MIN": str(10 ** 9),
+    })
+    os.makedirs(os.environ["CLOELIA_LOG_DIR"], exist_ok=True)
+
+    if backend == "sqlite":
+        os.environ.update({"DB_BACKEND": "sqlite", "SQLITE_PATH": db.path})
+    else:
+        # Swap the PostgreSQL helpers for the SQLite stand-in before main imports them
+        import database
+        from src.utils import config
+        database.get_connection = db.connect
+        config.get_db_connection = db.connect
+
+    os.chdir(ROOT)
+    import uvicorn
+    import main
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        main.app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 15
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("uvicorn did not start within 15s")
+        time.sleep(0.05)
+
+    def cleanup():
+        server.should_exit = True
+        thread.join(timeout=5)
+        tts.stop()
+
+    return f"http://127.0.0.1:{port}", cleanup
+
+
+def drive_traffic(base_url, duration, concurrency, users, seed):
+    """
+    Run `concurrency` closed-loop clients for `duration` seconds over the route mix.
+    """
+    import requests
+
+    names = [r[0] for r in ROUTES]
+    weights = [r[3] for r in ROUTES]
+    by_name = {r[0]: r for r in ROUTES}
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(worker_id):
+        rng = random.Random(seed + worker_id)
+        session = requests.Session()
+        local = defaultdict(list)
+        local_errors = defaultdict(int)
+        while time.perf_counter() < stop_at:
+            name = rng.choices(names, weights)[0]
+            _, method, path, _, payload = by_name[name]
+            body = payload(rng, users) if payload else None
+            start = time.perf_counter()
+            try:
+                resp = session.request(method, base_url + path, json=body, timeout=30)
+                ok = resp.status_code < 400 and "error" not in resp.text[:200]
+            except requests.RequestException:
+                ok = False
+            local[name].append((time.perf_counter() - start) * 1000.0)
+            if not ok:
+                local_errors[name] += 1
+        with lock:
+            for name, values in local.items():
+                samples[name].extend(values)
+            for name, count in local_errors.items():
+                errors[name] += count
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for name in names:
+        values = sorted(samples.get(name, []))
+        routes[name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": _round(_percentile(values, 50)),
+            "p95_ms": _round(_percentile(values, 95)),
+            "p99_ms": _round(_percentile(values, 99)),
+            "mean_ms": _round(sum(values) / len(values) if values else None),
+        }
+    total = sum(r["requests"] for r in routes.values())
+    return {
+        "duration_s": round(elapsed, 2),
+        "concurrency": concurrency,
+        "total_requests": total,
+        "total_errors": sum(r["errors"] for r in routes.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "routes": routes,
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def compare(result, baseline, tolerance):
+    """
+    Compare per-route throughput and tail latency against a saved baseline.
+
+    Returns a list of human-readable regressions (empty when within tolerance).
+    """
+    regressions = []
+    for name, base in baseline.get("routes", {}).items():
+        cur = result["routes"].get(name)
+        if not cur or not cur["requests"] or not base.get("requests"):
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if base.get(metric) and cur[metric] > base[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{name}.{metric}: {cur[metric]} ms vs baseline {base[metric]} ms")
+        if base.get("throughput_rps") and \
+                cur["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}.throughput_rps: {cur['throughput_rps']} vs baseline "
+                f"{base['throughput_rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for main:app")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of traffic")
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop clients")
+    parser.add_argument("--users", type=int, default=50, help="distinct user_ids")
+    parser.add_argument("--tts-delay-ms", type=float, default=40.0)
+    parser.add_argument("--gpt-delay-ms", type=float, default=150.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--backend", choices=("standin", "sqlite"), default="standin",
+                        help="database: the SQLite stand-in or the embedded DB_BACKEND=sqlite")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    parser.add_argument("--baseline", help="compare against this saved result")
+    parser.add_argument("--save-baseline", help="also save the result as a baseline here")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed relative regression (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cloelia_load_")
+    base_url, cleanup = boot_app(workdir, args.users, args.tts_delay_ms, args.gpt_delay_ms,
+                                 backend=args.backend)
+    try:
+        result = drive_traffic(base_url, args.duration, args.concurrency, args.users, args.seed)
+    finally:
+        cleanup()
+
+    result["config"] = {
+        "users": args.users,
+        "tts_delay_ms": args.tts_delay_ms,
+        "gpt_delay_ms": args.gpt_delay_ms,
+        "seed": args.seed,
+        "backend": args.backend,
+        "workdir": workdir,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        result["baseline"] = {
+            "path": args.baseline,
+            "tolerance": args.tolerance,
+            "regressions": regressions,
+        }
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())